@@ -0,0 +1,3 @@
+"""
+性能测试与压测脚本
+"""
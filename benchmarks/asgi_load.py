@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+并发压测脚本
+对比同步（WSGI/gunicorn）与异步（ASGI/uvicorn）部署在上游请求较慢时的并发能力
+
+示例:
+    # 终端1: 模拟每次上游请求耗时1秒，启动同步部署
+    MOCK_DATA_LATENCY=1 gunicorn stock_project.wsgi:application -w 2 -b 127.0.0.1:8000
+    # 终端2: 同样的配置启动异步部署
+    MOCK_DATA_LATENCY=1 uvicorn stock_project.asgi:application --workers 2 --port 8001
+    # 终端3: 分别压测
+    python -m benchmarks.asgi_load --url http://127.0.0.1:8000/api/market/ -c 50 -n 200
+    python -m benchmarks.asgi_load --url http://127.0.0.1:8001/api/async/market/ -c 50 -n 200
+"""
+import argparse
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+
+from benchmarks.harness import percentile
+
+
+def _request(url: str, timeout: float) -> Tuple[float, int]:
+    """发起单个请求，返回（耗时秒, 状态码）"""
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = 0
+    return time.perf_counter() - start, status
+
+
+def run(url: str, concurrency: int, total: int, timeout: float) -> dict:
+    """以固定并发数发起 total 个请求并汇总结果"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda _: _request(url, timeout), range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, status in results if status == 200]
+    return {
+        'url': url,
+        'concurrency': concurrency,
+        'requests': total,
+        'success': len(latencies),
+        'elapsed': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'mean': statistics.mean(latencies) if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API并发压测')
+    parser.add_argument('--url', required=True, help='压测地址')
+    parser.add_argument('-c', '--concurrency', type=int, default=50, help='并发数')
+    parser.add_argument('-n', '--requests', type=int, default=200, help='请求总数')
+    parser.add_argument('--timeout', type=float, default=60, help='单个请求超时（秒）')
+    args = parser.parse_args()
+
+    result = run(args.url, args.concurrency, args.requests, args.timeout)
+
+    print(f"🔍 压测: {result['url']}")
+    print(f"   并发数: {result['concurrency']}  请求数: {result['requests']}  成功: {result['success']}")
+    print(f"   总耗时: {result['elapsed']:.2f}s  吞吐量: {result['throughput']:.1f} req/s")
+    print(f"   延迟 p50/p95/p99: {result['p50'] * 1000:.0f} / {result['p95'] * 1000:.0f} / {result['p99'] * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+基准测试工具
+- measure: 多轮计时并汇总 min/mean/median/p95/stddev/ops（与pytest-benchmark的统计项一致）
+- 结果连同提交号、Python版本保存为JSON，compare_results 对比两次结果找出退化项
+"""
+import gc
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# 对比时使用的指标（越小越好）
+COMPARE_METRIC = 'median'
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """计算百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    """汇总耗时（秒）"""
+    mean = statistics.mean(timings)
+    return {
+        'rounds': len(timings),
+        'min': min(timings),
+        'max': max(timings),
+        'mean': mean,
+        'median': statistics.median(timings),
+        'p95': percentile(timings, 95),
+        'p99': percentile(timings, 99),
+        'stddev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'ops': 1 / mean if mean else 0.0,
+    }
+
+
+def measure(func: Callable, rounds: int = 20, warmup: int = 2, min_time: float = 0.0,
+            setup: Optional[Callable] = None) -> Dict[str, float]:
+    """
+    重复调用 func 并统计耗时
+    min_time: 最少运行时间（秒），耗时很短的函数会自动增加轮数
+    setup: 每轮调用前执行（不计时），用于重置数据库等状态
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        func()
+
+    timings = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        while len(timings) < rounds or time.perf_counter() - started < min_time:
+            if setup:
+                setup()
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return summarize(timings)
+
+
+def rss_bytes() -> int:
+    """当前进程的常驻内存（字节），非Linux平台返回峰值常驻内存"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以KB为单位
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def git_commit() -> Optional[str]:
+    """当前提交号，不在git仓库中时返回None"""
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True
+        )
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class BenchmarkResults:
+    """一次基准测试运行的全部结果，按 分组/名称 保存"""
+
+    def __init__(self):
+        self.metadata = {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        self.benchmarks: Dict[str, Dict] = {}
+
+    def add(self, group: str, name: str, stats: Dict, **extra):
+        self.benchmarks[f"{group}/{name}"] = {'group': group, 'name': name, **stats, **extra}
+
+    def to_dict(self) -> Dict:
+        return {'metadata': self.metadata, 'benchmarks': self.benchmarks}
+
+    def save(self, path):
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2, ensure_ascii=False), encoding='utf-8')
+
+
+def load_results(path) -> Dict:
+    """读取保存的结果JSON"""
+    return json.loads(Path(path).read_text(encoding='utf-8'))
+
+
+def compare_results(baseline: Dict, current: Dict, threshold: float = 0.2,
+                    metric: str = COMPARE_METRIC) -> List[Dict]:
+    """
+    对比两次结果
+    返回两边都有的基准项: [{'key', 'metric', 'baseline', 'current', 'change', 'regressed'}, ...]
+    change 为相对变化（0.25 表示慢了25%），超过 threshold 记为退化
+    单项可用 compare_metric 指定其他指标（如内存项的 rss_bytes）
+    """
+    rows = []
+    for key, current_item in current['benchmarks'].items():
+        baseline_item = baseline['benchmarks'].get(key)
+        item_metric = current_item.get('compare_metric', metric)
+        if not baseline_item or item_metric not in current_item or not baseline_item.get(item_metric):
+            continue
+        change = current_item[item_metric] / baseline_item[item_metric] - 1
+        rows.append({
+            'key': key,
+            'metric': item_metric,
+            'baseline': baseline_item[item_metric],
+            'current': current_item[item_metric],
+            'change': change,
+            'regressed': change > threshold,
+        })
+    return rows
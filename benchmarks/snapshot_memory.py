@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+"""
+全市场快照内存基准
+对比同一份全市场快照的几种保存方式:
+- dataframe: stock_zh_a_spot_em 返回的DataFrame（每个worker各一份）
+- arrays:    转换后的列数组（Unicode代码/名称 + float64，原组合估值使用的格式，每个worker各一份）
+- compact:   紧凑格式（spot_snapshot.CompactSnapshot），每个worker各一份
+- shared:    采集进程写入的共享快照文件，各worker以只读mmap映射同一份数据
+
+先在本进程统计各格式的数据字节数，再启动 --workers 个子进程同时持有快照，统计每个worker
+持有快照占用的堆内存（tracemalloc，numpy数组也计入）和共享快照映射的PSS（共享页按映射进程数分摊，
+只在Linux上可用），两者之和即每个worker为快照付出的内存。
+使用合成市场（AKSHARE_BACKEND=synthetic），不访问网络
+
+示例:
+    python -m benchmarks.snapshot_memory
+    python -m benchmarks.snapshot_memory --size 5000 --workers 8
+    python -m benchmarks.snapshot_memory --json snapshot_memory.json
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from benchmarks.harness import BASE_DIR
+
+MODES = ['dataframe', 'arrays', 'compact', 'shared']
+
+
+def mapped_pss(path: Path) -> Optional[int]:
+    """当前进程中映射指定文件（已解析链接的版本文件）的按比例分摊内存（字节，共享页按映射进程数分摊），非Linux平台返回None"""
+    try:
+        with open('/proc/self/smaps') as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    total = 0
+    current = None
+    for line in lines:
+        fields = line.split()
+        if fields and '-' in fields[0] and not fields[0].endswith(':'):
+            # 映射区域的首行: 地址 权限 偏移 设备 inode [路径]
+            current = fields[5] if len(fields) > 5 else None
+        elif fields and fields[0] == 'Pss:' and current == str(path):
+            total += int(fields[1]) * 1024
+    return total
+
+
+def _env(size: int, snapshot_file: Path) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'stock_project.settings')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(BASE_DIR), env.get('PYTHONPATH')]))
+    env['AKSHARE_BACKEND'] = 'synthetic'
+    env['MOCK_MARKET_SIZE'] = str(size)
+    env['SPOT_SNAPSHOT_FILE'] = str(snapshot_file)
+    return env
+
+
+def _setup():
+    import django
+    django.setup()
+
+
+def _load(mode: str):
+    """按指定方式持有一份快照，返回持有的对象"""
+    import numpy as np
+
+    from stock_app.registry import get_akshare_service
+    from stock_app.spot_snapshot import CompactSnapshot, read_shared_snapshot
+
+    service = get_akshare_service()
+    if mode == 'dataframe':
+        from stock_app.backends import create_fetch_backend
+        return create_fetch_backend().stock_zh_a_spot_em()
+    if mode == 'arrays':
+        arrays = service.get_spot_arrays()
+        order = np.argsort(arrays['code'])
+        return {name: values[order] for name, values in arrays.items()}
+    if mode == 'compact':
+        return CompactSnapshot.from_arrays(service.get_spot_arrays(), time.time())
+
+    snapshot = read_shared_snapshot()
+    if snapshot is None:
+        raise RuntimeError('共享快照文件不存在')
+    # 读一遍所有页，使映射真正驻留
+    np.frombuffer(snapshot.buffer, dtype=np.uint8, count=snapshot.nbytes).sum()
+    return snapshot
+
+
+def run_worker(mode: str):
+    """子进程: 持有快照后输出ready，等待父进程通知后报告内存占用"""
+    _setup()
+    from django.conf import settings
+
+    from stock_app.registry import get_mock_service
+
+    # 合成市场、模块导入和上游调用路径上的缓存不计入：先按同样方式加载一次再开始统计
+    get_mock_service().market
+    _load(mode)
+    gc.collect()
+
+    tracemalloc.start()
+    held = _load(mode)
+    gc.collect()
+    heap = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print('ready', flush=True)
+    sys.stdin.readline()
+    print(json.dumps({'heap': heap, 'mapped': mapped_pss(Path(settings.SPOT_SNAPSHOT_FILE).resolve())}), flush=True)
+    del held
+
+
+def measure_sizes() -> Dict[str, int]:
+    """本进程内各格式的数据字节数"""
+    from stock_app.backends import create_fetch_backend
+    from stock_app.registry import get_akshare_service
+    from stock_app.spot_snapshot import CompactSnapshot
+
+    df = create_fetch_backend().stock_zh_a_spot_em()
+    arrays = get_akshare_service().get_spot_arrays()
+    return {
+        'dataframe': int(df.memory_usage(deep=True).sum()),
+        'arrays': int(sum(values.nbytes for values in arrays.values())),
+        'compact': CompactSnapshot.from_arrays(arrays, time.time()).nbytes,
+    }
+
+
+def measure_workers(mode: str, workers: int, env: Dict[str, str]) -> List[Dict]:
+    """启动 workers 个子进程同时持有快照，返回每个进程的内存增量"""
+    processes = [
+        subprocess.Popen([sys.executable, '-m', 'benchmarks.snapshot_memory', '--worker', mode],
+                         cwd=BASE_DIR, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                         stderr=subprocess.DEVNULL, text=True)
+        for _ in range(workers)
+    ]
+    try:
+        for process in processes:
+            if process.stdout.readline().strip() != 'ready':
+                raise RuntimeError(f"{mode} 子进程启动失败")
+        # 所有进程都持有快照后再统计，PSS才能反映共享页的分摊
+        for process in processes:
+            process.stdin.write('\n')
+            process.stdin.flush()
+        return [json.loads(process.stdout.readline()) for process in processes]
+    finally:
+        for process in processes:
+            process.stdin.close()
+            process.wait()
+
+
+def _mb(value: Optional[float]) -> str:
+    return '-' if value is None else f"{value / 1024 / 1024:.2f}MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='全市场快照内存基准')
+    parser.add_argument('--size', type=int, default=5000, help='合成市场的股票数量')
+    parser.add_argument('--workers', type=int, default=4, help='同时持有快照的子进程数')
+    parser.add_argument('--json', help='结果保存路径')
+    parser.add_argument('--worker', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot_file = Path(directory) / 'spot_snapshot.bin'
+        env = _env(args.size, snapshot_file)
+        os.environ.update(env)
+        _setup()
+        from stock_app.registry import get_akshare_service
+        from stock_app.spot_snapshot import publish_snapshot, read_shared_snapshot
+
+        sizes = measure_sizes()
+        publish_snapshot(get_akshare_service().get_spot_arrays())
+        sizes['shared'] = read_shared_snapshot().nbytes
+
+        results = {'size': args.size, 'workers': args.workers, 'modes': {}}
+        print(f"{args.size} 只股票，{args.workers} 个worker")
+        print(f"{'方式':<10} {'数据':>10} {'堆/worker':>12} {'映射/worker':>12} {'合计':>12}")
+        for mode in MODES:
+            reports = measure_workers(mode, args.workers, env)
+            heap = sum(report['heap'] for report in reports) / len(reports)
+            mapped = sum(report['mapped'] or 0 for report in reports) / len(reports)
+            total = (heap + mapped) * len(reports)
+            results['modes'][mode] = {'bytes': sizes[mode], 'heap_per_worker': heap,
+                                      'mapped_per_worker': mapped, 'total': total}
+            print(f"{mode:<10} {_mb(sizes[mode]):>10} {_mb(heap):>12} {_mb(mapped):>12} {_mb(total):>12}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""
+启动耗时基准与回归检查
+- 基于 python -X importtime 统计模块导入耗时，列出耗时最多的包
+- 测量 manage.py check 和 WSGI应用加载的实际耗时
+- 检查WSGI应用加载后没有导入akshare、pandas等重量级模块
+
+示例:
+    python -m benchmarks.startup                      # 输出报告
+    python -m benchmarks.startup --check              # 超出预算或导入了重量级模块时返回非0
+    python -m benchmarks.startup --json startup.json  # 保存结果
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# WSGI加载后不应出现的模块（应在首次访问上游时才导入）
+HEAVY_MODULES = ['akshare', 'pandas']
+
+# 默认耗时预算（秒）
+DEFAULT_CHECK_BUDGET = 3.0
+DEFAULT_WSGI_BUDGET = 2.0
+
+WSGI_PROBE = (
+    "import json, sys, time\n"
+    "start = time.perf_counter()\n"
+    "import stock_project.wsgi\n"
+    "elapsed = time.perf_counter() - start\n"
+    "print(json.dumps({'elapsed': elapsed, 'modules': sorted(m for m in sys.modules if '.' not in m)}))\n"
+)
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'stock_project.settings')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(BASE_DIR), env.get('PYTHONPATH')]))
+    return env
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """
+    解析 -X importtime 输出
+    返回: [{'module': 'pandas', 'depth': 0, 'self_us': 646, 'cumulative_us': 378933}, ...]
+    """
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            _, timings = line.split(':', 1)
+            self_us, cumulative_us, module = timings.split('|')
+            # 模块名前的缩进表示嵌套层级，顶层导入只有一个空格
+            name = module.rstrip()
+            records.append({
+                'module': name.strip(),
+                'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+                'self_us': int(self_us),
+                'cumulative_us': int(cumulative_us),
+            })
+        except ValueError:
+            continue
+    return records
+
+
+def measure_imports(target: str = 'stock_project.wsgi', top: int = 15) -> Dict:
+    """在子进程中导入目标模块，按顶层包汇总各自的导入耗时"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+        cwd=BASE_DIR, env=_env(), capture_output=True, text=True
+    )
+    records = parse_importtime(result.stderr)
+
+    packages: Dict[str, int] = {}
+    for record in records:
+        package = record['module'].split('.')[0]
+        packages[package] = packages.get(package, 0) + record['self_us']
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+
+    return {
+        'target': target,
+        'total_us': sum(r['self_us'] for r in records),
+        'top': [{'package': name, 'self_us': us} for name, us in ranked[:top]],
+    }
+
+
+def measure_wsgi_load() -> Dict:
+    """测量WSGI应用加载耗时，并记录加载后的顶层模块"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-c', WSGI_PROBE],
+        cwd=BASE_DIR, env=_env(), capture_output=True, text=True, check=True
+    )
+    wall = time.perf_counter() - start
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    return {
+        'wall_seconds': wall,
+        'load_seconds': probe['elapsed'],
+        'heavy_modules_loaded': [m for m in HEAVY_MODULES if m in probe['modules']],
+    }
+
+
+def measure_manage_check() -> Dict:
+    """测量 manage.py check 的总耗时"""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, 'manage.py', 'check'],
+        cwd=BASE_DIR, env=_env(), capture_output=True, text=True, check=True
+    )
+    return {'wall_seconds': time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='启动耗时基准')
+    parser.add_argument('--check', action='store_true', help='执行回归检查，失败时返回非0')
+    parser.add_argument('--check-budget', type=float, default=DEFAULT_CHECK_BUDGET,
+                        help='manage.py check 耗时预算（秒）')
+    parser.add_argument('--wsgi-budget', type=float, default=DEFAULT_WSGI_BUDGET,
+                        help='WSGI应用加载耗时预算（秒）')
+    parser.add_argument('--json', help='结果保存路径')
+    args = parser.parse_args()
+
+    results = {
+        'imports': measure_imports(),
+        'wsgi': measure_wsgi_load(),
+        'manage_check': measure_manage_check(),
+    }
+
+    print("📦 导入耗时最多的包 (stock_project.wsgi):")
+    for record in results['imports']['top']:
+        print(f"   {record['self_us'] / 1000:8.1f} ms  {record['package']}")
+    print(f"   合计: {results['imports']['total_us'] / 1000:.1f} ms")
+    print(f"🚀 WSGI加载: {results['wsgi']['load_seconds']:.2f}s (进程总耗时 {results['wsgi']['wall_seconds']:.2f}s)")
+    print(f"🔧 manage.py check: {results['manage_check']['wall_seconds']:.2f}s")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding='utf-8')
+
+    if args.check:
+        failures = []
+        heavy = results['wsgi']['heavy_modules_loaded']
+        if heavy:
+            failures.append(f"WSGI加载时导入了重量级模块: {', '.join(heavy)}")
+        if results['wsgi']['wall_seconds'] > args.wsgi_budget:
+            failures.append(f"WSGI加载耗时 {results['wsgi']['wall_seconds']:.2f}s 超出预算 {args.wsgi_budget}s")
+        if results['manage_check']['wall_seconds'] > args.check_budget:
+            failures.append(f"manage.py check 耗时 {results['manage_check']['wall_seconds']:.2f}s 超出预算 {args.check_budget}s")
+
+        if failures:
+            for failure in failures:
+                print(f"❌ {failure}")
+            sys.exit(1)
+        print("✅ 启动耗时检查通过")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+"""
+端到端基准测试
+基于合成市场运行（AKSHARE_BACKEND=synthetic，无需网络），分组:
+- service: AKShareService 把上游DataFrame转换为接口数据的耗时
+- orm: 历史/实时数据写入数据库的几种路径
+- api: 进程内调用每个 /api/ 接口的延迟百分位和吞吐量
+- memory: 单个worker进程加载应用并处理请求后的常驻内存
+指定 --live 时，另外用并发压测驱动对运行中的服务逐个接口压测
+
+示例:
+    python -m benchmarks.suite --json bench.json                     # 运行并保存结果
+    python -m benchmarks.suite --compare bench.json --threshold 0.2  # 与之前的结果对比，退化时返回非0
+    python -m benchmarks.suite --only api --live http://127.0.0.1:8000 -c 20 -n 500
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from datetime import date, timedelta
+from decimal import Decimal
+from urllib.parse import quote
+
+from .harness import BASE_DIR, BenchmarkResults, compare_results, load_results, measure, rss_bytes
+
+GROUPS = ['service', 'orm', 'api', 'memory']
+
+SAMPLE_CODE = '000001'
+
+API_ENDPOINTS = [
+    ('market', '/api/market/'),
+    ('list', '/api/list/?page_size=20'),
+    ('list_columnar', '/api/list/?page_size=200&format=columnar'),
+    ('search', '/api/search/?q=银行'),
+    ('detail', f'/api/stocks/{SAMPLE_CODE}/'),
+    ('realtime', f'/api/stocks/{SAMPLE_CODE}/realtime/'),
+    ('history', f'/api/stocks/{SAMPLE_CODE}/history/'),
+    ('history_columnar', f'/api/stocks/{SAMPLE_CODE}/history/?format=columnar'),
+    ('async_market', '/api/async/market/'),
+    ('async_search', '/api/async/search/?q=银行'),
+    ('async_realtime', f'/api/async/stocks/{SAMPLE_CODE}/realtime/'),
+    ('async_history', f'/api/async/stocks/{SAMPLE_CODE}/history/'),
+]
+
+WORKER_PROBE = (
+    "import json, sys\n"
+    "from benchmarks.harness import rss_bytes\n"
+    "import stock_project.wsgi\n"
+    "from django.test import Client\n"
+    "from django.test.utils import setup_test_environment\n"
+    "from django.db import connection\n"
+    "setup_test_environment()\n"
+    "connection.creation.create_test_db(verbosity=0)\n"
+    "loaded = rss_bytes()\n"
+    "client = Client()\n"
+    "for path in json.loads(sys.argv[1]):\n"
+    "    for _ in range(3):\n"
+    "        client.get(path)\n"
+    "print(json.dumps({'loaded': loaded, 'served': rss_bytes()}))\n"
+)
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'stock_project.settings')
+    env.setdefault('AKSHARE_BACKEND', 'synthetic')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(BASE_DIR), env.get('PYTHONPATH')]))
+    return env
+
+
+def setup_django():
+    """使用合成市场和内存测试库初始化Django"""
+    for key, value in _env().items():
+        os.environ.setdefault(key, value)
+    sys.path.insert(0, str(BASE_DIR))
+
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+
+def bench_service(results: BenchmarkResults, rounds: int):
+    """服务层：上游DataFrame到接口数据的转换"""
+    from stock_app.registry import get_akshare_service
+
+    service = get_akshare_service()
+    year_start = (date.today() - timedelta(days=365)).strftime('%Y%m%d')
+    cases = {
+        'stock_list': service.get_stock_list,
+        'realtime': lambda: service.get_stock_realtime(SAMPLE_CODE),
+        'history_30d': lambda: service.get_stock_history(SAMPLE_CODE),
+        'history_1y': lambda: service.get_stock_history(SAMPLE_CODE, start_date=year_start),
+        'search': lambda: service.search_stock('银行'),
+        'market_overview': service.get_market_overview,
+    }
+    for name, func in cases.items():
+        results.add('service', name, measure(func, rounds=rounds))
+
+
+def bench_orm(results: BenchmarkResults, rounds: int):
+    """数据库写入：逐条 get_or_create 与批量写入，以及实时行情更新"""
+    from stock_app.models import Stock, StockPrice, StockRealtime
+    from stock_app.registry import get_akshare_service
+
+    service = get_akshare_service()
+    stock, _ = Stock.objects.get_or_create(code=SAMPLE_CODE, defaults={'name': '平安银行', 'market': 'SZ'})
+    year_start = (date.today() - timedelta(days=365)).strftime('%Y%m%d')
+    history = service.get_stock_history(SAMPLE_CODE, start_date=year_start)
+    realtime = service.get_stock_realtime(SAMPLE_CODE)
+
+    def clear_prices():
+        StockPrice.objects.filter(stock=stock).delete()
+
+    def get_or_create_rows():
+        for data in history:
+            StockPrice.objects.get_or_create(
+                stock=stock, date=data['date'],
+                defaults={key: value for key, value in data.items() if key != 'date'}
+            )
+
+    def bulk_create_rows():
+        StockPrice.objects.bulk_create(
+            [StockPrice(stock=stock, **data) for data in history], ignore_conflicts=True
+        )
+
+    def update_realtime():
+        StockRealtime.objects.update_or_create(
+            stock=stock,
+            defaults={key: Decimal(str(value)) if isinstance(value, float) else value
+                      for key, value in realtime.items()
+                      if key not in ('code', 'name', 'updated_at')}
+        )
+
+    orm_rounds = max(3, rounds // 4)
+    results.add('orm', 'history_get_or_create', measure(get_or_create_rows, rounds=orm_rounds, setup=clear_prices),
+                rows=len(history))
+    results.add('orm', 'history_bulk_create', measure(bulk_create_rows, rounds=orm_rounds, setup=clear_prices),
+                rows=len(history))
+    results.add('orm', 'realtime_update_or_create', measure(update_realtime, rounds=rounds))
+
+
+def bench_api(results: BenchmarkResults, rounds: int):
+    """接口：进程内逐个请求的延迟百分位与吞吐量"""
+    from django.test import Client
+
+    client = Client()
+    for name, path in API_ENDPOINTS:
+        response = client.get(path)
+        if response.status_code != 200:
+            print(f"⚠️  {path} 返回 {response.status_code}，跳过")
+            continue
+        stats = measure(lambda: client.get(path), rounds=rounds)
+        results.add('api', name, stats, path=path, response_bytes=len(response.content))
+
+
+def bench_memory(results: BenchmarkResults):
+    """单个worker：在新进程中加载应用、请求全部接口后的常驻内存"""
+    paths = [path for _, path in API_ENDPOINTS]
+    completed = subprocess.run(
+        [sys.executable, '-c', WORKER_PROBE, json.dumps(paths)],
+        cwd=BASE_DIR, env=_env(), capture_output=True, text=True, check=True
+    )
+    probe = json.loads(completed.stdout.strip().splitlines()[-1])
+    results.add('memory', 'worker_loaded', {'rss_bytes': probe['loaded']}, compare_metric='rss_bytes')
+    results.add('memory', 'worker_served', {'rss_bytes': probe['served']}, compare_metric='rss_bytes')
+    results.add('memory', 'suite_process', {'rss_bytes': rss_bytes()}, compare_metric='rss_bytes')
+
+
+def bench_live(results: BenchmarkResults, base_url: str, concurrency: int, total: int, timeout: float):
+    """对运行中的服务逐个接口并发压测"""
+    from .asgi_load import run
+
+    for name, path in API_ENDPOINTS:
+        result = run(base_url.rstrip('/') + quote(path, safe='/?=&'), concurrency, total, timeout)
+        results.add('live', name, {key: result[key] for key in (
+            'requests', 'success', 'throughput', 'mean', 'p50', 'p95', 'p99'
+        )}, compare_metric='p50', concurrency=concurrency, path=path)
+
+
+def report(results: BenchmarkResults):
+    current_group = None
+    for item in results.benchmarks.values():
+        if item['group'] != current_group:
+            current_group = item['group']
+            print(f"\n📊 {current_group}")
+        if 'rss_bytes' in item:
+            print(f"   {item['name']:<28} {item['rss_bytes'] / 1024 / 1024:8.1f} MB")
+        elif 'median' in item:
+            print(f"   {item['name']:<28} median {item['median'] * 1000:8.2f} ms  "
+                  f"p95 {item['p95'] * 1000:8.2f} ms  {item['ops']:8.1f} ops/s")
+        else:
+            print(f"   {item['name']:<28} p50 {item['p50'] * 1000:8.1f} ms  "
+                  f"p99 {item['p99'] * 1000:8.1f} ms  {item['throughput']:8.1f} req/s  "
+                  f"成功 {item['success']}/{item['requests']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='端到端基准测试')
+    parser.add_argument('--only', help=f"只运行指定分组，逗号分隔（{','.join(GROUPS)}）")
+    parser.add_argument('--rounds', type=int, default=20, help='每项的计时轮数')
+    parser.add_argument('--json', help='结果保存路径')
+    parser.add_argument('--compare', help='与之前保存的结果对比')
+    parser.add_argument('--threshold', type=float, default=0.2, help='判定为退化的相对变化')
+    parser.add_argument('--live', help='同时压测运行中的服务，如 http://127.0.0.1:8000')
+    parser.add_argument('-c', '--concurrency', type=int, default=20, help='--live 压测并发数')
+    parser.add_argument('-n', '--requests', type=int, default=200, help='--live 每个接口的请求数')
+    parser.add_argument('--timeout', type=float, default=30, help='--live 单个请求超时（秒）')
+    args = parser.parse_args()
+
+    groups = args.only.split(',') if args.only else GROUPS
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"未知分组: {', '.join(sorted(unknown))}")
+
+    setup_django()
+    results = BenchmarkResults()
+    results.metadata['backend'] = os.environ['AKSHARE_BACKEND']
+
+    if 'service' in groups:
+        bench_service(results, args.rounds)
+    if 'orm' in groups:
+        bench_orm(results, args.rounds)
+    if 'api' in groups:
+        bench_api(results, args.rounds)
+    if 'memory' in groups:
+        bench_memory(results)
+    if args.live:
+        bench_live(results, args.live, args.concurrency, args.requests, args.timeout)
+
+    report(results)
+
+    if args.json:
+        results.save(args.json)
+        print(f"\n💾 结果已保存: {args.json}")
+
+    if args.compare:
+        rows = compare_results(load_results(args.compare), results.to_dict(), args.threshold)
+        print(f"\n🔍 与 {args.compare} 对比（阈值 {args.threshold:.0%}）:")
+        for row in rows:
+            mark = '❌' if row['regressed'] else '  '
+            print(f" {mark} {row['key']:<36} {row['metric']:<10} {row['change']:+7.1%}")
+        regressed = [row for row in rows if row['regressed']]
+        if regressed:
+            print(f"❌ {len(regressed)} 项性能退化")
+            sys.exit(1)
+        print("✅ 无性能退化")
+
+
+if __name__ == '__main__':
+    main()
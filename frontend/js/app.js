@@ -419,7 +419,8 @@ class StockApp {
             const startDateStr = startDate.toISOString().split('T')[0];
             const endDateStr = endDate.toISOString().split('T')[0];
             
-            const data = await this.apiRequest(`/stocks/${code}/history/?start_date=${startDateStr}&end_date=${endDateStr}`);
+            // 请求列式数据，避免每条记录重复字段名
+            const data = await this.apiRequest(`/stocks/${code}/history/?start_date=${startDateStr}&end_date=${endDateStr}&format=columnar`);
             
             this.updateHistoryTable(data);
             this.updateChart(data);
@@ -429,6 +430,18 @@ class StockApp {
         }
     }
     
+    /**
+     * 列式历史数据按日期升序排列的下标
+     */
+    historyOrder(data) {
+        const dates = data.date || [];
+        const order = dates.map((_, i) => i);
+        if (dates.length > 1 && dates[0] > dates[dates.length - 1]) {
+            order.reverse();
+        }
+        return order;
+    }
+    
     /**
      * 更新历史数据表格
      */
@@ -436,20 +449,22 @@ class StockApp {
         const tableBody = document.getElementById('historyTableBody');
         tableBody.innerHTML = '';
         
-        data.slice(0, 10).forEach(item => {  // 只显示最近10条
+        // 只显示最近10条
+        this.historyOrder(data).reverse().slice(0, 10).forEach(i => {
             const row = document.createElement('tr');
             
-            const changeClass = item.change_rate >= 0 ? 'change-up' : 'change-down';
-            const changeSymbol = item.change_rate >= 0 ? '+' : '';
+            const changeRate = data.change_rate[i];
+            const changeClass = changeRate >= 0 ? 'change-up' : 'change-down';
+            const changeSymbol = changeRate >= 0 ? '+' : '';
             
             row.innerHTML = `
-                <td>${item.date}</td>
-                <td>¥${item.open_price}</td>
-                <td>¥${item.high_price}</td>
-                <td>¥${item.low_price}</td>
-                <td>¥${item.close_price}</td>
-                <td class="${changeClass}">${changeSymbol}${item.change_rate}%</td>
-                <td>${this.formatNumber(item.volume)}</td>
+                <td>${data.date[i]}</td>
+                <td>¥${data.open_price[i]}</td>
+                <td>¥${data.high_price[i]}</td>
+                <td>¥${data.low_price[i]}</td>
+                <td>¥${data.close_price[i]}</td>
+                <td class="${changeClass}">${changeSymbol}${changeRate}%</td>
+                <td>${this.formatNumber(data.volume[i])}</td>
             `;
             
             tableBody.appendChild(row);
@@ -467,9 +482,10 @@ class StockApp {
             this.chart.destroy();
         }
         
-        // 准备数据
-        const labels = data.map(item => item.date).reverse();
-        const prices = data.map(item => parseFloat(item.close_price)).reverse();
+        // 准备数据（列式结构可直接取用日期和收盘价列）
+        const order = this.historyOrder(data);
+        const labels = order.map(i => data.date[i]);
+        const prices = order.map(i => data.close_price[i]);
         
         // 创建新图表
         this.chart = new Chart(ctx, {
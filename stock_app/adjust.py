@@ -0,0 +1,142 @@
+"""
+复权价格计算
+日线只保存一份不复权价格，另存每只股票的后复权因子序列（AdjustFactor，每个除权除息日一条）:
+
+    后复权价 = 不复权价 x 当日因子
+    前复权价 = 不复权价 x 当日因子 / 最新因子
+
+每个交易日的因子用 searchsorted 在因子序列中一次查出，整段日线的价格列整体相乘后四舍五入到分，
+任何复权方式都不需要重新请求上游。因子序列按股票缓存；没有因子的股票在首次请求复权价格时
+从上游获取一次并保存，之后由 sync_adjust_factors 命令定期更新
+"""
+import copy
+import logging
+from datetime import date
+from decimal import Decimal
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import AdjustFactor
+from .registry import get_akshare_service
+
+logger = logging.getLogger(__name__)
+
+ADJUST_NONE = ''
+ADJUST_QFQ = 'qfq'
+ADJUST_HFQ = 'hfq'
+ADJUST_MODES = (ADJUST_NONE, ADJUST_QFQ, ADJUST_HFQ)
+
+PRICE_FIELDS = ['open_price', 'high_price', 'low_price', 'close_price']
+
+
+def _cache_key(code: str) -> str:
+    return f"adjust:factors:{code}"
+
+
+def _to_arrays(rows: Sequence[Tuple]) -> Tuple[np.ndarray, np.ndarray]:
+    days = np.array([day.toordinal() for day, _ in rows], dtype=np.int64)
+    factors = np.array([float(factor) for _, factor in rows], dtype=np.float64)
+    return days, factors
+
+
+def save_factors(stock, rows: List[Dict]) -> int:
+    """用上游返回的因子序列（[{'date', 'factor'}, ...]）替换股票已保存的因子，返回条数"""
+    objects = [
+        AdjustFactor(stock=stock, date=date.fromisoformat(str(row['date'])[:10]),
+                     factor=Decimal(str(row['factor'])).quantize(Decimal('0.00000001')))
+        for row in rows
+    ]
+    with transaction.atomic():
+        AdjustFactor.objects.filter(stock=stock).delete()
+        AdjustFactor.objects.bulk_create(objects)
+    cache.delete(_cache_key(stock.code))
+    return len(objects)
+
+
+def get_factors(stock, fetch_missing: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    股票的后复权因子序列，返回 (生效日序数, 因子)，按日期升序；没有除权记录时为空数组
+    数据库中没有因子且 fetch_missing 为真时从上游获取并保存（结果为空也会缓存，避免反复请求）
+    """
+    key = _cache_key(stock.code)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    rows = list(AdjustFactor.objects.filter(stock=stock).order_by('date').values_list('date', 'factor'))
+    if not rows and fetch_missing:
+        try:
+            fetched = get_akshare_service().get_adjust_factors(stock.code)
+        except Exception as e:
+            logger.warning(f"获取股票 {stock.code} 复权因子失败: {str(e)}")
+            return _to_arrays([])
+        if fetched:
+            save_factors(stock, fetched)
+            rows = list(AdjustFactor.objects.filter(stock=stock).order_by('date').values_list('date', 'factor'))
+
+    factors = _to_arrays(rows)
+    cache.set(key, factors, timeout=getattr(settings, 'ADJUST_FACTOR_CACHE_TTL', 86400))
+    return factors
+
+
+def adjustment_ratios(days: np.ndarray, factor_days: np.ndarray, factors: np.ndarray, mode: str) -> np.ndarray:
+    """
+    每个交易日不复权价格的乘数
+    早于第一条因子的日期沿用第一条因子；没有因子或不复权时全部为1
+    """
+    if mode == ADJUST_NONE or not len(factors):
+        return np.ones(len(days))
+    index = np.maximum(np.searchsorted(factor_days, days, side='right') - 1, 0)
+    ratios = factors[index]
+    if mode == ADJUST_QFQ:
+        ratios = ratios / factors[-1]
+    return ratios
+
+
+def adjust_prices(stock, prices: list, mode: str) -> list:
+    """
+    把 StockPrice 列表（如 load_prices 的结果）换算为复权价格
+    返回价格字段已替换的副本，原实例不变；成交量、成交额、涨跌幅不受复权影响
+    """
+    if mode == ADJUST_NONE or not prices:
+        return prices
+    factor_days, factors = get_factors(stock)
+    if not len(factors):
+        return prices
+
+    days = np.array([price.date.toordinal() for price in prices], dtype=np.int64)
+    ratios = adjustment_ratios(days, factor_days, factors, mode)
+    columns = {
+        field: np.round(np.array([float(getattr(price, field)) for price in prices]) * ratios, 2).tolist()
+        for field in PRICE_FIELDS
+    }
+
+    adjusted = []
+    for i, price in enumerate(prices):
+        price = copy.copy(price)
+        for field in PRICE_FIELDS:
+            setattr(price, field, Decimal(f"{columns[field][i]:.2f}"))
+        adjusted.append(price)
+    return adjusted
+
+
+def adjust_rows(rows: List[Dict], factor_rows: List[Dict], mode: str) -> List[Dict]:
+    """
+    把行式日线（'date' 为 YYYY-MM-DD，价格为浮点数）换算为复权价格，factor_rows 为 get_adjust_factors 的结果
+    直接修改并返回 rows
+    """
+    if mode == ADJUST_NONE or not rows or not factor_rows:
+        return rows
+    factor_days, factors = _to_arrays([(date.fromisoformat(str(row['date'])[:10]), row['factor'])
+                                       for row in factor_rows])
+    days = np.array([date.fromisoformat(str(row['date'])[:10]).toordinal() for row in rows], dtype=np.int64)
+    ratios = adjustment_ratios(days, factor_days, factors, mode)
+    for field in PRICE_FIELDS:
+        values = np.round(np.array([row[field] for row in rows], dtype=np.float64) * ratios, 2).tolist()
+        for row, value in zip(rows, values):
+            row[field] = value
+    return rows
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Stock, StockPrice, StockRealtime
+from .models import (
+    Stock, StockPrice, AdjustFactor, StockRealtime, SectorMember, BackfillCheckpoint, Portfolio, Position, AlertRule,
+    AlertEvent
+)
 
 
 @admin.register(Stock)
@@ -26,3 +29,62 @@ class StockRealtimeAdmin(admin.ModelAdmin):
     search_fields = ['stock__code', 'stock__name']
     ordering = ['-updated_at']
     readonly_fields = ['updated_at']
+
+
+@admin.register(AdjustFactor)
+class AdjustFactorAdmin(admin.ModelAdmin):
+    list_display = ['stock', 'date', 'factor']
+    search_fields = ['stock__code', 'stock__name']
+    ordering = ['stock__code', 'date']
+    raw_id_fields = ['stock']
+
+
+@admin.register(SectorMember)
+class SectorMemberAdmin(admin.ModelAdmin):
+    list_display = ['sector_name', 'sector_code', 'kind', 'stock_code', 'stock_name', 'updated_at']
+    list_filter = ['kind', 'sector_name']
+    search_fields = ['sector_code', 'sector_name', 'stock_code', 'stock_name']
+    ordering = ['kind', 'sector_code', 'stock_code']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(BackfillCheckpoint)
+class BackfillCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['symbol', 'start_date', 'end_date', 'status', 'rows', 'attempts', 'updated_at']
+    list_filter = ['status', 'start_date', 'end_date']
+    search_fields = ['symbol']
+    ordering = ['-updated_at']
+    readonly_fields = ['updated_at']
+
+
+class PositionInline(admin.TabularInline):
+    model = Position
+    extra = 0
+    readonly_fields = ['added_at']
+
+
+@admin.register(Portfolio)
+class PortfolioAdmin(admin.ModelAdmin):
+    list_display = ['name', 'version', 'created_at', 'updated_at']
+    search_fields = ['name']
+    ordering = ['id']
+    readonly_fields = ['version', 'created_at', 'updated_at']
+    inlines = [PositionInline]
+
+
+@admin.register(AlertRule)
+class AlertRuleAdmin(admin.ModelAdmin):
+    list_display = ['stock_code', 'kind', 'threshold', 'once', 'active', 'last_triggered_at', 'updated_at']
+    list_filter = ['kind', 'active', 'once']
+    search_fields = ['stock_code', 'note']
+    ordering = ['-updated_at']
+    readonly_fields = ['last_triggered_at', 'created_at', 'updated_at']
+
+
+@admin.register(AlertEvent)
+class AlertEventAdmin(admin.ModelAdmin):
+    list_display = ['stock_code', 'kind', 'threshold', 'value', 'triggered_at']
+    list_filter = ['kind', 'triggered_at']
+    search_fields = ['stock_code']
+    ordering = ['-id']
+    raw_id_fields = ['rule']
@@ -1,69 +1,146 @@
 """
 AKShare数据获取服务
 提供股票数据的获取和处理功能
-"""
-try:
-    import akshare as ak
-    AKSHARE_AVAILABLE = True
-except ImportError:
-    AKSHARE_AVAILABLE = False
-    ak = None
 
-try:
-    import pandas as pd
-    PANDAS_AVAILABLE = True
-except ImportError:
-    PANDAS_AVAILABLE = False
-    pd = None
-from datetime import datetime, timedelta
+akshare（及其依赖的pandas等）导入耗时较长，这里只检测是否安装，
+真正的导入推迟到第一次请求上游数据时，不访问上游的命令和接口不再承担这部分开销
+"""
+import importlib.util
+import threading
+from datetime import datetime
 from django.conf import settings
 import logging
 from typing import Dict, List, Optional, Union
 import time
 
+from . import metrics
+from .registry import get_fetch_backend, get_mock_service
+from .replay import ReplayMissError
+from .singleflight import SingleFlight
+
 logger = logging.getLogger(__name__)
 
-# 如果AKShare不可用，导入模拟服务
+AKSHARE_AVAILABLE = importlib.util.find_spec('akshare') is not None
+PANDAS_AVAILABLE = importlib.util.find_spec('pandas') is not None
+
+_akshare = None
+_import_lock = threading.Lock()
+
+# 进程内共享的上游请求合并器，所有服务实例共用
+upstream_flight = SingleFlight('akshare')
+
 if not AKSHARE_AVAILABLE:
-    from .mock_service import MockDataService
     logger.warning("AKShare不可用，将使用模拟数据服务")
 
 
+def load_akshare():
+    """
+    导入akshare模块（仅首次调用时真正导入）
+    导入成功后按配置启用上游连接池；不可用时返回None
+    """
+    global _akshare, AKSHARE_AVAILABLE
+    if _akshare is None and AKSHARE_AVAILABLE:
+        with _import_lock:
+            if _akshare is None and AKSHARE_AVAILABLE:
+                try:
+                    import akshare
+                except ImportError as e:
+                    AKSHARE_AVAILABLE = False
+                    logger.warning(f"AKShare导入失败，将使用模拟数据服务: {str(e)}")
+                    return None
+
+                if getattr(settings, 'AKSHARE_POOLED_SESSION', True):
+                    from .http_session import install_pooled_session
+                    install_pooled_session()
+                _akshare = akshare
+                logger.info("AKShare模块已加载")
+    return _akshare
+
+
+def prefixed_symbol(symbol: str) -> str:
+    """带市场前缀的代码（新浪接口使用），如 600000 -> sh600000"""
+    prefix = 'sh' if symbol.startswith(('6', '9')) else 'bj' if symbol.startswith(('4', '8')) else 'sz'
+    return f"{prefix}{symbol}"
+
+
 class AKShareService:
     """AKShare数据服务类"""
     
     def __init__(self):
         self.timeout = getattr(settings, 'AKSHARE_TIMEOUT', 30)
         self.retry_count = getattr(settings, 'AKSHARE_RETRY_COUNT', 3)
-        
-        # 如果AKShare不可用，使用模拟服务
-        if not AKSHARE_AVAILABLE:
-            self.mock_service = MockDataService()
-            logger.info("初始化模拟数据服务")
+        self.retry_delay = getattr(settings, 'AKSHARE_RETRY_DELAY', 1)
     
-    def _retry_request(self, func, *args, **kwargs):
-        """重试机制装饰器"""
+    @property
+    def mock_service(self):
+        """AKShare不可用时使用的模拟服务，与接口共用 registry 中的实例"""
+        return get_mock_service()
+    
+    def _retry_request(self, func, *args, limiter=None, **kwargs):
+        """
+        重试机制装饰器
+        limiter: 每次向上游发起请求（含重试）前调用其 acquire() 的限速器，如 ratelimit.TokenBucket
+        """
+        function = getattr(func, '__name__', 'unknown')
         for attempt in range(self.retry_count):
+            if limiter is not None:
+                limiter.acquire()
+            start = time.perf_counter()
             try:
-                return func(*args, **kwargs)
+                result = func(*args, **kwargs)
+                metrics.record_upstream(function, time.perf_counter() - start, success=True)
+                return result
+            except ReplayMissError:
+                # 没有录制数据是确定性的，不重试，也不计为上游失败
+                raise
             except Exception as e:
+                metrics.record_upstream(function, time.perf_counter() - start, success=False)
                 logger.warning(f"第{attempt + 1}次请求失败: {str(e)}")
                 if attempt == self.retry_count - 1:
+                    metrics.UPSTREAM_FAILURES.inc(function=function)
                     raise e
-                time.sleep(1)  # 等待1秒后重试
+                metrics.UPSTREAM_RETRIES.inc(function=function)
+                time.sleep(self.retry_delay)  # 等待后重试
+    
+    def _fetch(self, func, limiter=None, **kwargs):
+        """
+        获取上游数据
+        按（函数名, 参数）合并并发的相同请求，只向AKShare发起一次调用；limiter 见 _retry_request
+        """
+        key = (func.__name__, tuple(sorted(kwargs.items())))
+        return upstream_flight.do(key, self._retry_request, func, limiter=limiter, **kwargs)
+    
+    @staticmethod
+    def get_fetch_stats() -> Dict[str, Dict[str, int]]:
+        """
+        上游请求合并统计
+        返回: {'stock_zh_a_spot_em': {'calls': 10, 'executions': 2, 'coalesced': 8}, ...}
+        """
+        return upstream_flight.stats()
+    
+    @staticmethod
+    def _shared_spot():
+        """
+        采集进程发布的共享全市场快照（spot_snapshot.CompactSnapshot），不可用时返回None
+        实时行情、搜索、市场统计和股票代码表优先读取共享快照，各worker不再各自请求 stock_zh_a_spot_em
+        """
+        from .spot_snapshot import get_shared_snapshot
+        
+        return get_shared_snapshot()
     
     def get_stock_list(self) -> List[Dict]:
         """
         获取股票列表
         返回: [{'code': '000001', 'name': '平安银行', 'market': 'SZ'}, ...]
         """
-        if not AKSHARE_AVAILABLE:
+        ak = get_fetch_backend()
+        if ak is None:
             return self.mock_service.get_stock_list()
             
         try:
             # 获取沪深A股股票列表
-            df_sh = self._retry_request(ak.stock_info_sh_name_code, symbol="主板A股")
-            df_sz = self._retry_request(ak.stock_zh_a_spot_em)
+            df_sh = self._fetch(ak.stock_info_sh_name_code, symbol="主板A股")
+            df_sz = self._fetch(ak.stock_zh_a_spot_em)
             
             stocks = []
             
@@ -93,18 +170,79 @@ class AKShareService:
             logger.error(f"获取股票列表失败: {str(e)}")
             return []
     
+    def get_stock_universe(self) -> List[Dict]:
+        """
+        获取全部A股代码（不限数量，供批量任务使用）
+        返回: [{'code': '000001', 'name': '平安银行', 'market': 'SZ'}, ...]
+        """
+        ak = get_fetch_backend()
+        if ak is None:
+            return self.mock_service.get_stock_list()
+        
+        snapshot = self._shared_spot()
+        if snapshot is not None:
+            return [
+                {'code': code, 'name': name, 'market': 'SH' if code.startswith('6') else 'SZ'}
+                for code, name in zip(snapshot.codes.astype(str).tolist(), snapshot.all_names().tolist())
+            ]
+        
+        df = self._fetch(ak.stock_zh_a_spot_em)
+        if df is None or df.empty:
+            return []
+        return [
+            {'code': code, 'name': name, 'market': 'SH' if code.startswith('6') else 'SZ'}
+            for code, name in zip(df['代码'], df['名称'])
+        ]
+    
+    def get_spot_arrays(self) -> Optional[Dict]:
+        """
+        全市场实时快照的列数组（供分时数据采集、组合估值使用），总是请求上游
+        返回: {'code', 'name', 'price', 'pre_close', 'change_rate', 'open', 'high', 'low', 'volume', 'amount'}，
+        价格缺失（停牌）为NaN；获取失败返回None
+        """
+        ak = get_fetch_backend()
+        if ak is None:
+            return self.mock_service.get_spot_arrays()
+        
+        try:
+            df = self._fetch(ak.stock_zh_a_spot_em)
+        except Exception as e:
+            logger.error(f"获取全市场快照失败: {str(e)}")
+            return None
+        if df is None or df.empty:
+            return None
+        import pandas as pd
+        
+        return {
+            'code': df['代码'].to_numpy(dtype=str),
+            'name': df['名称'].to_numpy(dtype=str),
+            'price': pd.to_numeric(df['最新价'], errors='coerce').to_numpy(dtype='float64'),
+            'pre_close': pd.to_numeric(df['昨收'], errors='coerce').to_numpy(dtype='float64'),
+            'change_rate': pd.to_numeric(df['涨跌幅'], errors='coerce').to_numpy(dtype='float64'),
+            'open': pd.to_numeric(df['今开'], errors='coerce').to_numpy(dtype='float64'),
+            'high': pd.to_numeric(df['最高'], errors='coerce').to_numpy(dtype='float64'),
+            'low': pd.to_numeric(df['最低'], errors='coerce').to_numpy(dtype='float64'),
+            'volume': pd.to_numeric(df['成交量'], errors='coerce').fillna(0).to_numpy(dtype='int64'),
+            'amount': pd.to_numeric(df['成交额'], errors='coerce').fillna(0).to_numpy(dtype='float64'),
+        }
+    
     def get_stock_realtime(self, symbol: str) -> Optional[Dict]:
         """
         获取股票实时行情
         参数: symbol - 股票代码，如 '000001'
         返回: 实时行情数据字典
         """
-        if not AKSHARE_AVAILABLE:
+        ak = get_fetch_backend()
+        if ak is None:
             return self.mock_service.get_stock_realtime(symbol)
+        
+        snapshot = self._shared_spot()
+        if snapshot is not None:
+            return self._realtime_from_snapshot(snapshot, symbol)
             
         try:
             # 获取实时行情数据
-            df = self._retry_request(ak.stock_zh_a_spot_em)
+            df = self._fetch(ak.stock_zh_a_spot_em)
             
             if df is None or df.empty:
                 return None
@@ -137,6 +275,69 @@ class AKShareService:
             logger.error(f"获取股票 {symbol} 实时行情失败: {str(e)}")
             return None
     
+    @staticmethod
+    def _realtime_from_snapshot(snapshot, symbol: str) -> Optional[Dict]:
+        """从共享快照取单只股票的实时行情，字段与 get_stock_realtime 相同（快照中价格为float32，按两位小数还原）"""
+        quote = snapshot.gather([symbol])
+        if not quote['found'][0]:
+            logger.warning(f"未找到股票 {symbol} 的实时数据")
+            return None
+        
+        def price(field):
+            return round(float(quote[field][0]), 2)
+        
+        return {
+            'code': symbol,
+            'name': str(quote['name'][0]),
+            'current_price': price('price'),
+            'change_rate': price('change_rate'),
+            'change_amount': round(price('price') - price('pre_close'), 2),
+            'volume': int(quote['volume'][0]),
+            'amount': float(quote['amount'][0]),
+            'high_price': price('high'),
+            'low_price': price('low'),
+            'open_price': price('open'),
+            'pre_close': price('pre_close'),
+            'updated_at': datetime.now()
+        }
+    
+    def get_stock_quote(self, symbol: str) -> Optional[Dict]:
+        """
+        获取单只股票的实时行情（只请求该股票的盘口数据，不下载全市场快照，供按股票刷新的调度使用）
+        返回字段与 get_stock_realtime 相同（不含 name）；股票不存在或停牌时返回None，获取失败时抛出异常
+        """
+        ak = get_fetch_backend()
+        if ak is None:
+            return self.mock_service.get_stock_realtime(symbol)
+        
+        df = self._fetch(ak.stock_bid_ask_em, symbol=symbol)
+        if df is None or df.empty:
+            return None
+        
+        values = {}
+        for item, value in zip(df['item'], df['value']):
+            try:
+                values[item] = float(value)
+            except (TypeError, ValueError):
+                pass
+        price = values.get('最新')
+        if not price or price != price:
+            return None
+        
+        return {
+            'code': symbol,
+            'current_price': price,
+            'change_rate': values.get('涨幅', 0.0),
+            'change_amount': values.get('涨跌', 0.0),
+            'volume': int(values.get('总手', 0)),
+            'amount': values.get('金额', 0.0),
+            'high_price': values.get('最高', price),
+            'low_price': values.get('最低', price),
+            'open_price': values.get('今开', price),
+            'pre_close': values.get('昨收', price),
+            'updated_at': datetime.now()
+        }
+    
     def get_stock_history(self, symbol: str, period: str = "daily", 
                          start_date: str = None, end_date: str = None) -> List[Dict]:
         """
@@ -146,63 +347,178 @@ class AKShareService:
             period: 周期 ('daily', 'weekly', 'monthly')
             start_date: 开始日期 'YYYYMMDD'
             end_date: 结束日期 'YYYYMMDD'
-        返回: 历史数据列表
+        返回: 历史数据列表，获取失败时返回空列表
         """
-        if not AKSHARE_AVAILABLE:
-            return self.mock_service.get_stock_history(symbol, period, start_date, end_date)
-            
         try:
-            # 设置默认日期范围（最近30天）
-            if not end_date:
-                end_date = datetime.now().strftime('%Y%m%d')
-            if not start_date:
-                start_date = (datetime.now() - timedelta(days=30)).strftime('%Y%m%d')
-            
-            # 获取历史数据
-            df = self._retry_request(
-                ak.stock_zh_a_hist,
-                symbol=symbol,
-                period=period,
-                start_date=start_date,
-                end_date=end_date,
-                adjust=""
-            )
-            
-            if df is None or df.empty:
-                return []
-            
-            history_data = []
-            for _, row in df.iterrows():
-                history_data.append({
-                    'date': row['日期'],
-                    'open_price': float(row['开盘']),
-                    'high_price': float(row['最高']),
-                    'low_price': float(row['最低']),
-                    'close_price': float(row['收盘']),
-                    'volume': int(row['成交量']),
-                    'amount': float(row['成交额']),
-                    'change_rate': float(row['涨跌幅']) if '涨跌幅' in row else 0
-                })
-            
-            logger.info(f"成功获取股票 {symbol} 历史数据 {len(history_data)} 条")
-            return history_data
-            
+            return self.fetch_stock_history(symbol, period, start_date, end_date)
         except Exception as e:
             logger.error(f"获取股票 {symbol} 历史数据失败: {str(e)}")
             return []
     
+    def fetch_stock_history(self, symbol: str, period: str = "daily", 
+                            start_date: str = None, end_date: str = None, limiter=None) -> List[Dict]:
+        """
+        获取股票历史数据，参数同 get_stock_history
+        重试后仍失败时抛出异常，供需要区分"没有数据"和"获取失败"的调用方（如批量回填）使用
+        limiter: 每次上游请求（含重试）前调用其 acquire() 的限速器，如批量回填的全局令牌桶
+        """
+        ak = get_fetch_backend()
+        if ak is None:
+            return self.mock_service.get_stock_history(symbol, period, start_date, end_date)
+        
+        # 设置默认日期范围（截至结束日期的最近 HISTORY_DEFAULT_SESSIONS 个交易日）
+        if not end_date:
+            end_date = datetime.now().strftime('%Y%m%d')
+        if not start_date:
+            from .trading_calendar import default_history_start
+            start_date = default_history_start(datetime.strptime(end_date, '%Y%m%d').date()).strftime('%Y%m%d')
+        
+        # 获取历史数据
+        df = self._fetch(
+            ak.stock_zh_a_hist,
+            symbol=symbol,
+            period=period,
+            start_date=start_date,
+            end_date=end_date,
+            adjust="",
+            limiter=limiter
+        )
+        
+        if df is None or df.empty:
+            return []
+        
+        history_data = []
+        for _, row in df.iterrows():
+            history_data.append({
+                'date': row['日期'],
+                'open_price': float(row['开盘']),
+                'high_price': float(row['最高']),
+                'low_price': float(row['最低']),
+                'close_price': float(row['收盘']),
+                'volume': int(row['成交量']),
+                'amount': float(row['成交额']),
+                'change_rate': float(row['涨跌幅']) if '涨跌幅' in row else 0
+            })
+        
+        logger.info(f"成功获取股票 {symbol} 历史数据 {len(history_data)} 条")
+        return history_data
+    
+    def get_adjust_factors(self, symbol: str) -> List[Dict]:
+        """
+        获取后复权因子序列（后复权价 = 不复权价 x 因子，前复权价 = 不复权价 x 因子 / 最新因子）
+        返回: [{'date': '2024-06-12', 'factor': 1.0213}, ...]，按日期升序，每个除权日一条
+        获取失败时抛出异常，由调用方决定是否重试
+        """
+        ak = get_fetch_backend()
+        if ak is None:
+            return self.mock_service.get_adjust_factors(symbol)
+        
+        df = self._fetch(ak.stock_zh_a_daily, symbol=prefixed_symbol(symbol), adjust='hfq-factor')
+        if df is None or df.empty:
+            return []
+        
+        import pandas as pd
+        
+        dates = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+        factors = pd.to_numeric(df['hfq_factor'], errors='coerce')
+        rows = [
+            {'date': day, 'factor': float(factor)}
+            for day, factor in zip(dates, factors) if factor == factor and factor > 0
+        ]
+        rows.sort(key=lambda row: row['date'])
+        logger.info(f"成功获取股票 {symbol} 复权因子 {len(rows)} 条")
+        return rows
+    
+    def get_trade_dates(self) -> List[str]:
+        """
+        获取交易日历（上交所开市以来至今年年底）
+        返回: ['1990-12-19', ...]，按日期升序
+        获取失败时抛出异常，由调用方决定是否使用近似日历
+        """
+        ak = get_fetch_backend()
+        if ak is None:
+            return self.mock_service.get_trade_dates()
+        
+        df = self._fetch(ak.tool_trade_date_hist_sina)
+        if df is None or df.empty:
+            return []
+        
+        import pandas as pd
+        
+        dates = sorted(set(pd.to_datetime(df['trade_date']).dt.strftime('%Y-%m-%d')))
+        logger.info(f"成功获取交易日历 {len(dates)} 天")
+        return dates
+    
+    def get_industry_boards(self) -> List[Dict]:
+        """
+        获取行业板块列表（东方财富行业分类）
+        返回: [{'code': 'BK0475', 'name': '银行'}, ...]
+        获取失败时抛出异常
+        """
+        ak = get_fetch_backend()
+        if ak is None:
+            return self.mock_service.get_industry_boards()
+    
+        df = self._fetch(ak.stock_board_industry_name_em)
+        if df is None or df.empty:
+            return []
+        return [
+            {'code': str(code), 'name': str(name)}
+            for code, name in zip(df['板块代码'], df['板块名称'])
+        ]
+    
+    def get_industry_constituents(self, board: str) -> List[Dict]:
+        """
+        获取行业板块的成分股（board 为板块名称）
+        返回: [{'code': '000001', 'name': '平安银行'}, ...]
+        获取失败时抛出异常
+        """
+        ak = get_fetch_backend()
+        if ak is None:
+            return self.mock_service.get_industry_constituents(board)
+    
+        df = self._fetch(ak.stock_board_industry_cons_em, symbol=board)
+        if df is None or df.empty:
+            return []
+        return [{'code': str(code), 'name': str(name)} for code, name in zip(df['代码'], df['名称'])]
+    
+    def get_index_constituents(self, symbol: str) -> Dict:
+        """
+        获取中证指数的成分股（symbol 为指数代码，如 000300）
+        返回: {'code': '000300', 'name': '沪深300', 'stocks': [{'code': '600519', 'name': '贵州茅台'}, ...]}
+        获取失败时抛出异常
+        """
+        ak = get_fetch_backend()
+        if ak is None:
+            return self.mock_service.get_index_constituents(symbol)
+    
+        df = self._fetch(ak.index_stock_cons_csindex, symbol=symbol)
+        if df is None or df.empty:
+            return {'code': symbol, 'name': '', 'stocks': []}
+        stocks = [
+            {'code': str(code).zfill(6), 'name': str(name)}
+            for code, name in zip(df['成分券代码'], df['成分券名称'])
+        ]
+        logger.info(f"成功获取指数 {symbol} 成分股 {len(stocks)} 只")
+        return {'code': symbol, 'name': str(df['指数名称'].iloc[0]), 'stocks': stocks}
+    
     def search_stock(self, keyword: str) -> List[Dict]:
         """
         搜索股票
         参数: keyword - 搜索关键词（股票代码或名称）
         返回: 匹配的股票列表
         """
-        if not AKSHARE_AVAILABLE:
+        ak = get_fetch_backend()
+        if ak is None:
             return self.mock_service.search_stock(keyword)
+        
+        snapshot = self._shared_spot()
+        if snapshot is not None:
+            return self._search_snapshot(snapshot, keyword.upper())
             
         try:
             # 获取实时数据进行搜索
-            df = self._retry_request(ak.stock_zh_a_spot_em)
+            df = self._fetch(ak.stock_zh_a_spot_em)
             
             if df is None or df.empty:
                 return []
@@ -231,19 +547,43 @@ class AKShareService:
             logger.error(f"搜索股票失败: {str(e)}")
             return []
     
+    @staticmethod
+    def _search_snapshot(snapshot, keyword: str) -> List[Dict]:
+        """在共享快照中按代码或名称子串搜索，按代码顺序最多返回20条"""
+        import numpy as np
+        
+        codes = snapshot.codes.astype(str)
+        matched = (np.char.find(codes, keyword) >= 0) | (np.char.find(snapshot.all_names(), keyword) >= 0)
+        index = np.flatnonzero(matched)[:20]
+        results = [
+            {
+                'code': code,
+                'name': name,
+                'current_price': round(price, 2),
+                'change_rate': round(change_rate, 2),
+                'market': 'SH' if code.startswith('6') else 'SZ'
+            }
+            for code, name, price, change_rate in zip(
+                codes[index].tolist(), snapshot.names(index).tolist(),
+                snapshot.columns['price'][index].tolist(), snapshot.columns['change_rate'][index].tolist())
+        ]
+        logger.info(f"搜索关键词 '{keyword}' 找到 {len(results)} 条结果")
+        return results
+    
     def get_market_overview(self) -> Dict:
         """
         获取市场概览数据
         返回: 市场统计信息
         """
-        if not AKSHARE_AVAILABLE:
+        ak = get_fetch_backend()
+        if ak is None:
             return self.mock_service.get_market_overview()
             
         try:
             # 获取上证指数
-            sh_index = self._retry_request(ak.stock_zh_index_spot_em, symbol="sh000001")
+            sh_index = self._fetch(ak.stock_zh_index_spot_em, symbol="sh000001")
             # 获取深证成指
-            sz_index = self._retry_request(ak.stock_zh_index_spot_em, symbol="sz399001")
+            sz_index = self._fetch(ak.stock_zh_index_spot_em, symbol="sz399001")
             
             overview = {
                 'sh_index': None,
@@ -275,7 +615,16 @@ class AKShareService:
                 }
             
             # 获取市场统计
-            market_data = self._retry_request(ak.stock_zh_a_spot_em)
+            snapshot = self._shared_spot()
+            if snapshot is not None:
+                change_rate = snapshot.columns['change_rate']
+                overview['total_stocks'] = len(snapshot)
+                overview['up_count'] = int((change_rate > 0).sum())
+                overview['down_count'] = int((change_rate < 0).sum())
+                overview['flat_count'] = int((change_rate == 0).sum())
+                return overview
+            
+            market_data = self._fetch(ak.stock_zh_a_spot_em)
             if market_data is not None and not market_data.empty:
                 overview['total_stocks'] = len(market_data)
                 overview['up_count'] = len(market_data[market_data['涨跌幅'] > 0])
@@ -0,0 +1,178 @@
+"""
+价格提醒引擎
+每次全市场快照刷新时，找出本次价格/涨跌幅跨过阈值的规则:
+
+- 启用的规则按方向建成阈值索引：键为 (股票下标 << 32 | 阈值)，整体排序后存为数组
+- 对本次数值有变化的股票，(上次值, 本次值] 区间内的阈值即被跨过的阈值，用 searchsorted 一次求出
+  所有股票的区间，再展开为规则下标
+
+每次检查的开销与有变化的股票数和触发的规则数有关，与规则总数只是对数关系。
+只在跨过阈值时触发：刚创建的规则在价格已经高于阈值时不会立即触发，需等下一次跨越
+"""
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import AlertEvent, AlertRule
+
+logger = logging.getLogger(__name__)
+
+# 价格和涨跌幅都以0.01为单位转换为整数比较；阈值加上偏移后为非负，放在键的低32位
+_OFFSET = 1 << 31
+_MISSING = np.iinfo(np.int64).min
+
+
+def _to_units(values) -> np.ndarray:
+    """转换为以0.01为单位的整数，NaN等无效值为 _MISSING"""
+    values = np.asarray(values, dtype=np.float64)
+    units = np.full(len(values), _MISSING, dtype=np.int64)
+    valid = np.isfinite(values)
+    units[valid] = np.clip(np.round(values[valid] * 100), -_OFFSET, _OFFSET - 1).astype(np.int64)
+    return units
+
+
+def _keys(symbols: np.ndarray, units: np.ndarray) -> np.ndarray:
+    return (symbols.astype(np.int64) << 32) | (units + _OFFSET)
+
+
+def _expand(lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """把多个 [lo, hi) 区间展开为下标数组"""
+    counts = np.maximum(hi - lo, 0)
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    starts = np.repeat(lo, counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return starts + offsets
+
+
+class ThresholdIndex:
+    """按 (股票, 阈值) 排序的规则索引"""
+
+    def __init__(self, symbols: np.ndarray, thresholds: np.ndarray, rule_ids: np.ndarray):
+        keys = _keys(symbols, thresholds)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.rule_ids = rule_ids[order]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def crossed_up(self, symbols: np.ndarray, prev: np.ndarray, cur: np.ndarray) -> np.ndarray:
+        """阈值在 (prev, cur] 内的规则"""
+        lo = np.searchsorted(self.keys, _keys(symbols, prev), side='right')
+        hi = np.searchsorted(self.keys, _keys(symbols, cur), side='right')
+        return self.rule_ids[_expand(lo, hi)]
+
+    def crossed_down(self, symbols: np.ndarray, prev: np.ndarray, cur: np.ndarray) -> np.ndarray:
+        """阈值在 [cur, prev) 内的规则"""
+        lo = np.searchsorted(self.keys, _keys(symbols, cur), side='left')
+        hi = np.searchsorted(self.keys, _keys(symbols, prev), side='left')
+        return self.rule_ids[_expand(lo, hi)]
+
+
+# 每个数值序列向上、向下跨越时检查的规则类型，move 规则同时以 +阈值 和 -阈值 加入涨跌幅索引
+_SERIES = {
+    'price': ([AlertRule.KIND_PRICE_ABOVE], [AlertRule.KIND_PRICE_BELOW]),
+    'change_rate': ([AlertRule.KIND_CHANGE_ABOVE, AlertRule.KIND_MOVE],
+                    [AlertRule.KIND_CHANGE_BELOW, AlertRule.KIND_MOVE]),
+}
+
+
+class AlertEngine:
+    """在连续的全市场快照之间检查提醒规则，规则变化时自动重建索引"""
+
+    def __init__(self):
+        self.codes: Optional[np.ndarray] = None
+        self.prev: Dict[str, np.ndarray] = {}
+        self.indexes: Dict[Tuple[str, str], ThresholdIndex] = {}
+        self.rules: Dict[int, Tuple[str, str, float, int]] = {}  # 规则id -> (代码, 类型, 阈值, 股票下标)
+        self._rules_version = None
+
+    def _rules_changed(self) -> bool:
+        active = AlertRule.objects.filter(active=True)
+        version = tuple(active.aggregate(n=Count('id'), last=Max('updated_at')).values())
+        if version == self._rules_version:
+            return False
+        self._rules_version = version
+        return True
+
+    def _build(self, codes: np.ndarray):
+        """按当前快照的股票顺序重建阈值索引"""
+        position = {code: i for i, code in enumerate(codes.tolist())}
+        rows = [
+            (rule_id, code, kind, float(threshold))
+            for rule_id, code, kind, threshold in AlertRule.objects.filter(active=True).values_list(
+                'id', 'stock_code', 'kind', 'threshold')
+            if code in position
+        ]
+        self.rules = {rule_id: (code, kind, threshold, position[code]) for rule_id, code, kind, threshold in rows}
+
+        self.indexes = {}
+        for series, kind_groups in _SERIES.items():
+            for direction, kinds in zip(('up', 'down'), kind_groups):
+                selected = [row for row in rows if row[2] in kinds]
+                sign = 1 if direction == 'up' else -1
+                self.indexes[(series, direction)] = ThresholdIndex(
+                    np.array([position[row[1]] for row in selected], dtype=np.int64),
+                    _to_units([sign * row[3] if row[2] == AlertRule.KIND_MOVE else row[3] for row in selected]),
+                    np.array([row[0] for row in selected], dtype=np.int64),
+                )
+        logger.info(f"提醒规则索引重建: {len(self.rules)} 条规则")
+
+    def evaluate(self, arrays: Dict[str, np.ndarray]) -> List[Tuple[int, float]]:
+        """
+        检查一份快照（{'code', 'price', 'change_rate', ...}），返回触发的 (规则id, 触发时的值)
+        第一份快照以及股票列表变化后的第一份快照只记录数值，不触发
+        """
+        codes = np.asarray(arrays['code'])
+        if self.codes is None or not np.array_equal(codes, self.codes):
+            self.codes = codes
+            self.prev = {}
+            self._rules_version = None
+        if self._rules_changed():
+            self._build(codes)
+
+        fired = []
+        for series in _SERIES:
+            cur = _to_units(arrays[series])
+            prev = self.prev.get(series)
+            self.prev[series] = cur
+            if prev is None:
+                continue
+
+            valid = (cur != _MISSING) & (prev != _MISSING)
+            for direction, mask in (('up', valid & (cur > prev)), ('down', valid & (cur < prev))):
+                index = self.indexes.get((series, direction))
+                symbols = np.flatnonzero(mask)
+                if index is None or not len(index) or not len(symbols):
+                    continue
+                cross = index.crossed_up if direction == 'up' else index.crossed_down
+                values = arrays[series]
+                for rule_id in cross(symbols, prev[symbols], cur[symbols]).tolist():
+                    fired.append((rule_id, float(values[self.rules[rule_id][3]])))
+        return fired
+
+    def process(self, arrays: Dict[str, np.ndarray], now: Optional[datetime] = None) -> List[AlertEvent]:
+        """检查快照并记录触发的提醒，只提醒一次的规则触发后停用"""
+        fired = self.evaluate(arrays)
+        if not fired:
+            return []
+
+        now = now or timezone.now()
+        events = [
+            AlertEvent(rule_id=rule_id, stock_code=self.rules[rule_id][0], kind=self.rules[rule_id][1],
+                       threshold=self.rules[rule_id][2], value=round(value, 2), triggered_at=now)
+            for rule_id, value in fired
+        ]
+        AlertEvent.objects.bulk_create(events)
+
+        rule_ids = [rule_id for rule_id, _ in fired]
+        AlertRule.objects.filter(id__in=rule_ids, once=True).update(active=False, last_triggered_at=now, updated_at=now)
+        AlertRule.objects.filter(id__in=rule_ids, once=False).update(last_triggered_at=now)
+        logger.info(f"触发 {len(events)} 条价格提醒")
+        return events
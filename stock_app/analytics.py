@@ -0,0 +1,294 @@
+"""
+横截面分析
+从日线中取出一组股票最近 window 个交易日的收盘价，对齐为 日期 x 股票 的收益率矩阵，
+再用矩阵乘法一次算出全部股票两两之间的协方差、相关系数以及相对基准的贝塔:
+
+- 交易日取这组股票有数据的日期并集；某只股票当天没有数据（停牌、未上市）时收益率为NaN，
+  复牌后第一天的收益率相对停牌前最后一个收盘价计算
+- 协方差、相关系数按成对完整样本计算（只用两只股票都有收益率的日期）：把NaN置0并配合
+  有效值掩码做几次矩阵乘法得到各对的样本数、和、平方和、乘积和，不逐对循环
+- 收益率矩阵和分析结果按（股票集合, 窗口, 截止日期）缓存 ANALYTICS_CACHE_TTL 秒
+"""
+import hashlib
+import logging
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import CharField, FloatField
+from django.db.models.functions import Cast
+
+from .cold_storage import hot_cutoff
+from .models import Stock, StockPrice
+from .registry import get_cold_store
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS_PER_YEAR = 252
+MIN_PERIODS = 20  # 成对样本少于该数量时结果为NaN
+BENCHMARK_EQUAL_WEIGHT = 'equal_weight'
+_EPOCH = date(1970, 1, 1).toordinal()
+
+
+class ReturnsMatrix:
+    """对齐后的日收益率矩阵，行为交易日（升序），列为股票"""
+
+    def __init__(self, dates: np.ndarray, codes: List[str], returns: np.ndarray):
+        self.dates = dates          # 序数日
+        self.codes = codes
+        self.returns = returns      # float64, shape (len(dates), len(codes))
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def start(self) -> Optional[date]:
+        return date.fromordinal(int(self.dates[0])) if len(self.dates) else None
+
+    @property
+    def end(self) -> Optional[date]:
+        return date.fromordinal(int(self.dates[-1])) if len(self.dates) else None
+
+    def column(self, code: str) -> np.ndarray:
+        return self.returns[:, self.codes.index(code)]
+
+
+def _load_closes(codes: List[str], start: date, end: date):
+    """
+    取出 [start, end] 内的收盘价，返回 (股票下标, 序数日, 收盘价) 三个数组
+    热数据一次查询取出；早于 hot_cutoff 的部分从冷存储补齐，同一日期以数据库为准
+    """
+    position = {code: i for i, code in enumerate(codes)}
+    stock_ids = dict(Stock.objects.filter(code__in=codes).values_list('id', 'code'))
+
+    # 日期和价格在SQL中转换为文本和浮点数，跳过逐行的 date/Decimal 转换，日期再整体转为序数日
+    rows = list(
+        StockPrice.objects.filter(stock_id__in=stock_ids, date__gte=start, date__lte=end)
+        .order_by()
+        .annotate(day=Cast('date', CharField()), close=Cast('close_price', FloatField()))
+        .values_list('stock_id', 'day', 'close')
+    )
+    symbol_of = {stock_id: position[code] for stock_id, code in stock_ids.items()}
+    symbols = np.array([symbol_of[stock_id] for stock_id, _, _ in rows], dtype=np.int64)
+    days = np.array([day for _, day, _ in rows], dtype='datetime64[D]').astype(np.int64) + _EPOCH
+    closes = np.array([close for _, _, close in rows], dtype=np.float64)
+
+    if start < hot_cutoff():
+        # 每只股票只补数据库中最早一天之前的冷数据
+        first_hot = np.full(len(codes), np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(first_hot, symbols, days)
+        store = get_cold_store()
+        parts = [(symbols, days, closes)]
+        for i, code in enumerate(codes):
+            arrays = store.read_arrays(code)
+            if arrays is None:
+                continue
+            cold_days = arrays['date'].astype(np.int64)
+            mask = (cold_days >= start.toordinal()) & (cold_days <= end.toordinal()) & (cold_days < first_hot[i])
+            if mask.any():
+                parts.append((np.full(int(mask.sum()), i, dtype=np.int64), cold_days[mask],
+                              arrays['close_price'][mask] / 100.0))
+        symbols, days, closes = (np.concatenate(column) for column in zip(*parts))
+
+    return symbols, days, closes
+
+
+def build_close_matrix(codes: List[str], start: date, end: date) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    [start, end] 内对齐的收盘价矩阵，返回 (交易日序数, 收盘价)
+    收盘价矩阵的行为交易日（升序）、列与 codes 对应，当天没有数据为NaN
+    """
+    symbols, days, closes = _load_closes(codes, start, end)
+    valid = np.isfinite(closes) & (closes > 0)
+    symbols, days, closes = symbols[valid], days[valid], closes[valid]
+
+    trading_days = np.unique(days)
+    grid = np.full((len(trading_days), len(codes)), np.nan)
+    grid[np.searchsorted(trading_days, days), symbols] = closes
+    return trading_days, grid
+
+
+def get_close_matrix(codes: List[str], start: date, end: date) -> Tuple[np.ndarray, np.ndarray]:
+    """带缓存的收盘价矩阵"""
+    key = f"analytics:closes:{_universe_key(codes)}:{start.isoformat()}:{end.isoformat()}"
+    cached = cache.get(key)
+    if cached is None or cached[0] != codes:
+        cached = (codes, *build_close_matrix(codes, start, end))
+        cache.set(key, cached, timeout=getattr(settings, 'ANALYTICS_CACHE_TTL', 600))
+    return cached[1], cached[2]
+
+
+def forward_fill(grid: np.ndarray) -> np.ndarray:
+    """按列用前一个有效值填充NaN（停牌期间沿用停牌前的价格），第一个有效值之前仍为NaN"""
+    last = np.where(~np.isnan(grid), np.arange(len(grid))[:, None], 0)
+    np.maximum.accumulate(last, axis=0, out=last)
+    return np.take_along_axis(grid, last, axis=0)
+
+
+def build_returns_matrix(codes: List[str], window: int, end: date) -> ReturnsMatrix:
+    """构造截至 end 的最近 window 个交易日的收益率矩阵（需要 window+1 个收盘价）"""
+    # 按自然日估算取数范围：每年约242个交易日，另留出长假的余量
+    start = end - timedelta(days=int(window * 1.6) + 20)
+    trading_days, grid = build_close_matrix(codes, start, end)
+    trading_days, grid = trading_days[-(window + 1):], grid[-(window + 1):]
+    if len(trading_days) < 2:
+        return ReturnsMatrix(trading_days[:0], codes, np.empty((0, len(codes))))
+
+    with np.errstate(invalid='ignore'):
+        returns = grid[1:] / forward_fill(grid)[:-1] - 1.0
+    return ReturnsMatrix(trading_days[1:], codes, returns)
+
+
+def _universe_key(codes: List[str]) -> str:
+    return hashlib.sha1(','.join(sorted(codes)).encode()).hexdigest()[:16]
+
+
+def get_returns_matrix(codes: List[str], window: int, end: date) -> ReturnsMatrix:
+    """带缓存的收益率矩阵"""
+    key = f"analytics:returns:{_universe_key(codes)}:{window}:{end.isoformat()}"
+    matrix = cache.get(key)
+    if matrix is None or matrix.codes != codes:
+        matrix = build_returns_matrix(codes, window, end)
+        cache.set(key, matrix, timeout=getattr(settings, 'ANALYTICS_CACHE_TTL', 600))
+    return matrix
+
+
+def pairwise_moments(returns: np.ndarray, min_periods: int = MIN_PERIODS) -> Dict[str, np.ndarray]:
+    """
+    成对完整样本的协方差和相关系数
+    x 为置0后的收益率、m 为有效值掩码时，各对的样本数为 m'm，i 在 (i, j) 都有效日期上的和为 x'm，
+    乘积和为 x'x，据此一次得到所有股票对的统计量
+    """
+    mask = ~np.isnan(returns)
+    x = np.where(mask, returns, 0.0)
+    m = mask.astype(np.float64)
+
+    n = m.T @ m
+    sum_x = x.T @ m
+    sum_xx = (x * x).T @ m
+    sum_xy = x.T @ x
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = (sum_xy - sum_x * sum_x.T / n) / (n - 1)
+        var = (sum_xx - sum_x * sum_x / n) / (n - 1)   # var[i, j]: i 在与 j 成对的日期上的方差
+        corr = cov / np.sqrt(var * var.T)
+    too_few = n < max(min_periods, 2)
+    cov[too_few] = np.nan
+    corr[too_few] = np.nan
+    np.clip(corr, -1.0, 1.0, out=corr)
+    return {'n': n, 'covariance': cov, 'correlation': corr}
+
+
+def beta(returns: np.ndarray, benchmark: np.ndarray, min_periods: int = MIN_PERIODS) -> np.ndarray:
+    """各股票相对基准收益率序列的贝塔，同样按成对完整样本计算"""
+    mask = ~np.isnan(returns)
+    bench_mask = ~np.isnan(benchmark)
+    x = np.where(mask, returns, 0.0)
+    m = mask.astype(np.float64)
+    b = np.where(bench_mask, benchmark, 0.0)
+    mb = bench_mask.astype(np.float64)
+
+    n = m.T @ mb
+    sum_x = x.T @ mb
+    sum_b = m.T @ b
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = (x.T @ b - sum_x * sum_b / n) / (n - 1)
+        var_b = (m.T @ (b * b) - sum_b * sum_b / n) / (n - 1)
+        result = cov / var_b
+    result[n < max(min_periods, 2)] = np.nan
+    return result
+
+
+def rolling_volatility(returns: np.ndarray, span: int, min_periods: Optional[int] = None) -> np.ndarray:
+    """滚动 span 日的年化波动率矩阵，用累计和计算，与行数、列数呈线性关系"""
+    min_periods = max(2, span // 2) if min_periods is None else min_periods
+    mask = ~np.isnan(returns)
+    x = np.where(mask, returns, 0.0)
+
+    def window_sum(values):
+        total = np.cumsum(values, axis=0)
+        total[span:] = total[span:] - total[:-span]
+        return total
+
+    n = window_sum(mask.astype(np.float64))
+    s = window_sum(x)
+    ss = window_sum(x * x)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var = (ss - s * s / n) / (n - 1)
+    vol = np.sqrt(np.maximum(var, 0.0)) * np.sqrt(TRADING_DAYS_PER_YEAR)
+    vol[n < max(min_periods, 2)] = np.nan
+    return vol
+
+
+def _nanmean(values: np.ndarray, axis: int) -> np.ndarray:
+    """忽略NaN的均值，全为NaN时为NaN（不产生警告）"""
+    counts = (~np.isnan(values)).sum(axis=axis)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.nansum(values, axis=axis) / np.where(counts > 0, counts, np.nan)
+
+
+def to_nested_list(values: np.ndarray, digits: int) -> list:
+    """数组四舍五入后转为（嵌套）列表，NaN转为None"""
+    rounded = np.round(np.asarray(values, dtype=np.float64), digits)
+    return np.where(np.isnan(rounded), None, rounded).tolist()
+
+
+def analyze(codes: List[str], window: int, end: date, benchmark: str = BENCHMARK_EQUAL_WEIGHT,
+            rolling: int = 20, include_covariance: bool = False) -> Dict:
+    """
+    一组股票的相关系数矩阵、贝塔和波动率（带缓存）
+    benchmark 为股票代码时以该股票为基准，默认以这组股票的等权平均收益为基准
+    """
+    key = (f"analytics:analysis:{_universe_key(codes)}:{window}:{end.isoformat()}:"
+           f"{benchmark}:{rolling}:{int(include_covariance)}")
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    universe = codes if benchmark in (BENCHMARK_EQUAL_WEIGHT, *codes) else codes + [benchmark]
+    matrix = get_returns_matrix(universe, window, end)
+    returns = matrix.returns[:, :len(codes)]
+
+    if benchmark == BENCHMARK_EQUAL_WEIGHT:
+        bench = _nanmean(returns, axis=1)
+    else:
+        bench = matrix.column(benchmark)
+
+    moments = pairwise_moments(returns)
+    observations = (~np.isnan(returns)).sum(axis=0)
+    mean = _nanmean(returns, axis=0)
+    volatility = np.sqrt(np.diagonal(moments['covariance'])) * np.sqrt(TRADING_DAYS_PER_YEAR)
+    recent = rolling_volatility(returns, rolling)[-1] if len(matrix) else np.full(len(codes), np.nan)
+    betas = beta(returns, bench)
+
+    result = {
+        'codes': codes,
+        'window': window,
+        'start': matrix.start.isoformat() if matrix.start else None,
+        'end': matrix.end.isoformat() if matrix.end else None,
+        'observations': len(matrix),
+        'benchmark': benchmark,
+        'missing': [code for code, count in zip(codes, observations.tolist()) if count == 0],
+        'correlation': to_nested_list(moments['correlation'], 4),
+        'results': [
+            {
+                'stock_code': code,
+                'observations': count,
+                'mean_return': mean_value,
+                'volatility': vol_value,
+                'rolling_volatility': recent_value,
+                'beta': beta_value,
+            }
+            for code, count, mean_value, vol_value, recent_value, beta_value in zip(
+                codes, observations.tolist(), to_nested_list(mean * 100, 4), to_nested_list(volatility * 100, 2),
+                to_nested_list(recent * 100, 2), to_nested_list(betas, 3)
+            )
+        ],
+    }
+    if include_covariance:
+        result['covariance'] = to_nested_list(moments['covariance'], 8)
+
+    cache.set(key, result, timeout=getattr(settings, 'ANALYTICS_CACHE_TTL', 600))
+    return result
+
@@ -1,7 +1,23 @@
+import atexit
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class StockAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'stock_app'
     verbose_name = '股票行情应用'
+
+    def ready(self):
+        """应用启动时预热共享服务，进程退出时释放上游连接；开启指标时为数据库连接安装查询计时"""
+        from . import registry
+
+        if getattr(settings, 'METRICS_ENABLED', True):
+            from django.db.backends.signals import connection_created
+            from .metrics import install_query_timer
+            connection_created.connect(install_query_timer, dispatch_uid='stock_app.metrics.query_timer')
+
+        if getattr(settings, 'STOCK_SERVICE_WARMUP', True):
+            registry.warm_up()
+        atexit.register(registry.shutdown)
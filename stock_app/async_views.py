@@ -0,0 +1,300 @@
+"""
+异步视图 - 用于ASGI部署
+上游数据获取放到线程池中执行，不占用事件循环；相同的并发请求只发起一次上游调用；
+数据库访问使用Django异步ORM
+"""
+import asyncio
+import logging
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import models
+from django.db.models import Max
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views import View
+
+from . import metrics
+from .registry import get_akshare_service, get_trading_calendar
+from .models import AlertEvent, Stock, StockPrice, StockRealtime
+from .singleflight import SingleFlight
+from .serializers import (
+    AlertEventSerializer, StockPriceSerializer, StockRealtimeSerializer,
+    StockSearchSerializer, MarketOverviewSerializer
+)
+from .wire_format import build_response
+
+logger = logging.getLogger(__name__)
+
+# 视图层的服务调用合并器，与服务内部的上游请求合并互为补充
+service_flight = SingleFlight('service')
+
+
+async def fetch_upstream(method: str, *args):
+    """
+    在线程池中调用 AKShareService 的方法
+    参数相同的并发调用（跨线程及异步任务）共享同一次调用结果
+    """
+    service = get_akshare_service()
+    timeout = getattr(settings, 'AKSHARE_TIMEOUT', 30)
+    # ado 内部的等待已被 shield 保护，单个请求超时不会取消其他请求共享的上游调用
+    return await asyncio.wait_for(service_flight.ado((method, args), getattr(service, method), *args), timeout)
+
+
+async def _get_trading_calendar():
+    """交易日历，首次加载可能读取文件或请求上游，放到线程池执行"""
+    return await sync_to_async(get_trading_calendar, thread_sensitive=False)()
+
+
+async def _get_stock(code: str):
+    """异步获取股票，不存在时返回None"""
+    try:
+        return await Stock.objects.aget(code=code)
+    except Stock.DoesNotExist:
+        return None
+
+
+class AsyncRealtimeView(View):
+    """异步实时行情视图"""
+
+    async def get(self, request, code):
+        try:
+            stock = await _get_stock(code)
+            if stock is None:
+                return JsonResponse({'error': '股票不存在'}, status=404)
+
+            # 尝试从数据库获取未过期的实时数据（开市时 REALTIME_MAX_AGE 秒内，休市时最近一次收市之后）
+            calendar = await _get_trading_calendar()
+            realtime_data = await StockRealtime.objects.filter(
+                stock=stock,
+                updated_at__gte=calendar.fresh_since(timezone.now(), settings.REALTIME_MAX_AGE)
+            ).select_related('stock').afirst()
+
+            metrics.record_cache('realtime_db', hit=realtime_data is not None)
+            if realtime_data is None:
+                realtime_info = await fetch_upstream('get_stock_realtime', code)
+
+                if not realtime_info:
+                    return JsonResponse({'error': f'无法获取股票 {code} 的实时数据'}, status=404)
+
+                realtime_data, created = await StockRealtime.objects.aupdate_or_create(
+                    stock=stock,
+                    defaults={
+                        'current_price': realtime_info['current_price'],
+                        'change_rate': realtime_info['change_rate'],
+                        'change_amount': realtime_info['change_amount'],
+                        'volume': realtime_info['volume'],
+                        'amount': realtime_info['amount'],
+                        'high_price': realtime_info['high_price'],
+                        'low_price': realtime_info['low_price'],
+                        'open_price': realtime_info['open_price'],
+                        'pre_close': realtime_info['pre_close'],
+                    }
+                )
+                # 更新已有记录时关联的股票未被缓存，序列化前补上，避免在异步上下文中触发同步查询
+                realtime_data.stock = stock
+
+            return JsonResponse(StockRealtimeSerializer(realtime_data).data)
+
+        except asyncio.TimeoutError:
+            logger.error(f"获取股票 {code} 实时数据超时")
+            return JsonResponse({'error': '获取实时数据超时'}, status=504)
+        except Exception as e:
+            logger.error(f"获取股票 {code} 实时数据失败: {str(e)}")
+            return JsonResponse({'error': '获取实时数据失败'}, status=500)
+
+
+class AsyncHistoryView(View):
+    """异步历史数据视图"""
+
+    @staticmethod
+    def _parse_date(value):
+        """解析日期参数，格式错误的日期忽略"""
+        if value:
+            try:
+                return datetime.strptime(value, '%Y-%m-%d').date()
+            except ValueError:
+                pass
+        return None
+
+    async def get(self, request, code):
+        from .adjust import ADJUST_MODES, adjust_prices
+        from .cold_storage import load_prices
+        from .trading_calendar import history_gaps, mark_gaps_checked
+
+        adjust = request.GET.get('adjust', '')
+        if adjust not in ADJUST_MODES:
+            return JsonResponse({'error': 'adjust 只支持 qfq、hfq 或留空'}, status=400)
+
+        try:
+            stock = await _get_stock(code)
+            if stock is None:
+                return JsonResponse({'error': '股票不存在'}, status=404)
+
+            period = request.GET.get('period', 'daily')
+            start_date = request.GET.get('start_date')
+            end_date = request.GET.get('end_date')
+
+            start, end = self._parse_date(start_date), self._parse_date(end_date)
+
+            # 数据库中的近期数据与冷存储中的早期数据合并（读取冷数据文件，放到线程池执行）
+            load = sync_to_async(load_prices)
+            prices = await load(stock, start, end, limit=100)  # 限制返回100条
+
+            # 按交易日历检查本地缺少的日线（当天收市前、已确认停牌的交易日不算缺口），只从AKShare补取缺口
+            calendar = await _get_trading_calendar()
+            expected = calendar.expected_sessions(
+                start, end, timezone.now(), settings.HISTORY_DEFAULT_SESSIONS
+            )[-100:]
+            missing = await sync_to_async(history_gaps)(code, expected, [price.date for price in prices])
+            metrics.record_cache('history_db', hit=not missing)
+            if missing:
+                try:
+                    history_data = await fetch_upstream(
+                        'fetch_stock_history', code, period,
+                        missing[0].strftime('%Y%m%d'), missing[-1].strftime('%Y%m%d')
+                    )
+                except asyncio.TimeoutError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"补取股票 {code} 历史数据失败，返回本地数据: {str(e)}")
+                    history_data = []
+                else:
+                    await sync_to_async(mark_gaps_checked)(code, missing, [data['date'] for data in history_data])
+
+                price_objects = [
+                    StockPrice(
+                        stock=stock,
+                        date=data['date'],
+                        open_price=data['open_price'],
+                        high_price=data['high_price'],
+                        low_price=data['low_price'],
+                        close_price=data['close_price'],
+                        volume=data['volume'],
+                        amount=data['amount'],
+                        change_rate=data['change_rate'],
+                    )
+                    for data in history_data
+                ]
+                await StockPrice.objects.abulk_create(price_objects, ignore_conflicts=True)
+                logger.info(f"为股票 {code} 写入了 {len(price_objects)} 条历史数据")
+                prices = await load(stock, start, end, limit=100)
+
+            # 数据库中只有不复权价格，复权价格按复权因子即时换算（可能需要首次获取因子）
+            if adjust:
+                prices = await sync_to_async(adjust_prices)(stock, prices, adjust)
+            data = StockPriceSerializer(prices, many=True).data
+            return build_response(request, data, constant_fields=['stock_code', 'stock_name'])
+
+        except asyncio.TimeoutError:
+            logger.error(f"获取股票 {code} 历史数据超时")
+            return JsonResponse({'error': '获取历史数据超时'}, status=504)
+        except Exception as e:
+            logger.error(f"获取股票 {code} 历史数据失败: {str(e)}")
+            return JsonResponse({'error': '获取历史数据失败'}, status=500)
+
+
+class AsyncSearchView(View):
+    """异步股票搜索视图"""
+
+    async def get(self, request):
+        keyword = request.GET.get('q', '').strip()
+
+        if not keyword:
+            return JsonResponse({'error': '请提供搜索关键词'}, status=400)
+
+        try:
+            # 首先在数据库中搜索
+            db_results = [
+                stock async for stock in Stock.objects.filter(
+                    models.Q(code__icontains=keyword) |
+                    models.Q(name__icontains=keyword)
+                ).select_related('realtime')[:10]
+            ]
+
+            results = []
+            if db_results:
+                for stock in db_results:
+                    realtime = getattr(stock, 'realtime', None)
+                    results.append({
+                        'code': stock.code,
+                        'name': stock.name,
+                        'current_price': float(realtime.current_price) if realtime else 0.0,
+                        'change_rate': float(realtime.change_rate) if realtime else 0.0,
+                        'market': stock.market
+                    })
+            else:
+                # 从AKShare搜索，并把结果保存到数据库
+                results = await fetch_upstream('search_stock', keyword)
+                await Stock.objects.abulk_create(
+                    [Stock(code=r['code'], name=r['name'], market=r['market']) for r in results],
+                    ignore_conflicts=True
+                )
+
+            serializer = StockSearchSerializer(results, many=True)
+            return JsonResponse(serializer.data, safe=False)
+
+        except asyncio.TimeoutError:
+            logger.error("搜索股票超时")
+            return JsonResponse({'error': '搜索超时'}, status=504)
+        except Exception as e:
+            logger.error(f"搜索股票失败: {str(e)}")
+            return JsonResponse({'error': '搜索失败'}, status=500)
+
+
+class AsyncMarketOverviewView(View):
+    """异步市场概览视图"""
+
+    async def get(self, request):
+        try:
+            overview_data = await fetch_upstream('get_market_overview')
+            serializer = MarketOverviewSerializer(overview_data)
+            return JsonResponse(serializer.data)
+
+        except asyncio.TimeoutError:
+            logger.error("获取市场概览超时")
+            return JsonResponse({'error': '获取市场概览超时'}, status=504)
+        except Exception as e:
+            logger.error(f"获取市场概览失败: {str(e)}")
+            return JsonResponse({'error': '获取市场概览失败'}, status=500)
+
+
+class AsyncAlertEventsView(View):
+    """
+    价格提醒事件流（长轮询）
+    参数: after - 已收到的最大事件id，不传时只返回之后新触发的事件；
+          wait - 没有新事件时最多等待的秒数（不超过 ALERT_STREAM_MAX_WAIT）；stock_code - 只看某只股票
+    返回: {'events': [...], 'last_id': 123}，下次请求带上 after=last_id
+    等待期间不占用工作线程，适合ASGI部署
+    """
+    poll_interval = 0.5
+    batch_size = 100
+
+    async def get(self, request):
+        try:
+            after = int(request.GET['after']) if 'after' in request.GET else None
+            wait = float(request.GET.get('wait', 0))
+        except ValueError:
+            return JsonResponse({'error': 'after 和 wait 必须是数字'}, status=400)
+        wait = min(max(wait, 0), getattr(settings, 'ALERT_STREAM_MAX_WAIT', 30))
+
+        queryset = AlertEvent.objects.select_related('rule')
+        code = request.GET.get('stock_code')
+        if code:
+            queryset = queryset.filter(stock_code=code)
+        if after is None:
+            after = (await AlertEvent.objects.aaggregate(last=Max('id')))['last'] or 0
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        while True:
+            events = [event async for event in queryset.filter(id__gt=after)[:self.batch_size]]
+            if events or loop.time() >= deadline:
+                break
+            await asyncio.sleep(self.poll_interval)
+
+        return JsonResponse({
+            'events': AlertEventSerializer(events, many=True).data,
+            'last_id': events[-1].id if events else after,
+        })
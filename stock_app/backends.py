@@ -0,0 +1,187 @@
+"""
+上游数据获取后端
+AKShareService 通过后端调用 stock_zh_a_spot_em、stock_zh_a_hist 等函数，
+后端与akshare模块提供同名、同参数、同返回结构的函数，可按配置替换:
+
+- akshare: 真实的akshare模块（默认）
+- synthetic: 合成市场生成的DataFrame，无需网络
+- record: 调用akshare并把返回的DataFrame录制到本地
+- replay: 回放录制的数据，可注入延迟、错误和限流
+"""
+import logging
+from datetime import datetime
+from typing import Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+BACKEND_AKSHARE = 'akshare'
+BACKEND_SYNTHETIC = 'synthetic'
+BACKEND_RECORD = 'record'
+BACKEND_REPLAY = 'replay'
+
+
+class SyntheticBackend:
+    """基于合成市场的后端，函数签名与akshare一致"""
+
+    def __init__(self, market):
+        self.market = market
+
+    @staticmethod
+    def _parse_date(value: Optional[str]):
+        return datetime.strptime(value, '%Y%m%d').date() if value else None
+
+    def stock_zh_a_spot_em(self):
+        return self.market.spot_dataframe()
+
+    def stock_zh_a_hist(self, symbol: str, period: str = 'daily', start_date: str = None,
+                        end_date: str = None, adjust: str = ''):
+        return self.market.hist_dataframe(symbol, self._parse_date(start_date), self._parse_date(end_date))
+
+    def stock_bid_ask_em(self, symbol: str):
+        """单只股票的盘口数据（item/value 两列），只提供行情字段，不含五档报价"""
+        import pandas as pd
+
+        quote = self.market.quote(symbol)
+        if quote is None:
+            return pd.DataFrame(columns=['item', 'value'])
+        fields = {'最新': 'current_price', '涨幅': 'change_rate', '涨跌': 'change_amount', '总手': 'volume',
+                  '金额': 'amount', '最高': 'high_price', '最低': 'low_price', '今开': 'open_price', '昨收': 'pre_close'}
+        return pd.DataFrame({'item': list(fields), 'value': [quote[field] for field in fields.values()]})
+
+    def stock_zh_a_daily(self, symbol: str, start_date: str = None, end_date: str = None, adjust: str = ''):
+        """
+        新浪日线，symbol 带市场前缀，如 sh600000
+        adjust: ''（不复权）、'qfq'、'hfq' 返回日线；'hfq-factor' 返回除权日的后复权因子
+        """
+        import pandas as pd
+
+        if adjust not in ('', 'qfq', 'hfq', 'hfq-factor'):
+            raise ValueError(f"合成后端不支持 adjust={adjust!r}")
+        index = self.market.index_of.get(symbol[2:])
+        if adjust == 'hfq-factor':
+            if index is None:
+                return pd.DataFrame(columns=['date', 'hfq_factor'])
+            factors = self.market.adjust_factors(index)
+            return pd.DataFrame({'date': factors['date'].astype(object), 'hfq_factor': factors['factor']})
+
+        columns = ['date', 'open', 'high', 'low', 'close', 'volume', 'amount', 'outstanding_share', 'turnover']
+        if index is None:
+            return pd.DataFrame(columns=columns)
+        start, end = self._parse_date(start_date), self._parse_date(end_date)
+        bars = self.market.history_arrays(index, start, end)
+        scale = 1.0
+        if adjust:
+            factor = self.market.session_adjust_factors(index, start, end)
+            # 前复权以最新交易日为基准，与后复权只差一个常数
+            scale = factor if adjust == 'hfq' else factor / self.market.session_adjust_factors(index)[-1]
+        volume = bars['volume'] * 100  # 新浪日线成交量单位为股
+        shares = float(self.market.float_shares[index])
+        return pd.DataFrame({
+            'date': bars['date'].astype(object),
+            **{field: (bars[field] * scale).round(2) for field in ('open', 'high', 'low', 'close')},
+            'volume': volume,
+            'amount': bars['amount'],
+            'outstanding_share': shares,
+            'turnover': volume / shares,
+        }, columns=columns)
+
+    def tool_trade_date_hist_sina(self):
+        import pandas as pd
+
+        return pd.DataFrame({'trade_date': self.market.trade_dates().astype(object)})
+
+    def stock_zh_index_spot_em(self, symbol: str):
+        return self.market.index_dataframe(symbol)
+
+    def stock_board_industry_name_em(self):
+        """行业板块列表，只提供板块名称和代码"""
+        import pandas as pd
+
+        from .synthetic_market import INDUSTRIES
+
+        return pd.DataFrame({
+            '排名': list(range(1, len(INDUSTRIES) + 1)),
+            '板块名称': [name for _, name in INDUSTRIES],
+            '板块代码': [code for code, _ in INDUSTRIES],
+        })
+
+    def stock_board_industry_cons_em(self, symbol: str):
+        """行业板块成分股（symbol 为板块名称），只提供代码和名称"""
+        import pandas as pd
+
+        members = self.market.industry_members(symbol)
+        return pd.DataFrame({
+            '序号': list(range(1, len(members) + 1)),
+            '代码': self.market.codes[members].astype(object),
+            '名称': self.market.names[members].astype(object),
+        })
+
+    def index_stock_cons_csindex(self, symbol: str):
+        """中证指数成分股（symbol 为指数代码，如 000300）"""
+        import pandas as pd
+
+        from .synthetic_market import CONSTITUENT_INDICES
+
+        members = self.market.index_members(symbol)
+        name = CONSTITUENT_INDICES[symbol][0] if symbol in CONSTITUENT_INDICES else ''
+        return pd.DataFrame({
+            '日期': [self.market.as_of.isoformat()] * len(members),
+            '指数代码': [symbol] * len(members),
+            '指数名称': [name] * len(members),
+            '成分券代码': self.market.codes[members].astype(object),
+            '成分券名称': self.market.names[members].astype(object),
+            '交易所': ['上海证券交易所' if market == 'SH' else '深圳证券交易所'
+                    for market in self.market.markets[members].tolist()],
+        })
+
+    def stock_info_sh_name_code(self, symbol: str = '主板A股'):
+        import pandas as pd
+
+        market = self.market
+        mask = market.markets == 'SH'
+        return pd.DataFrame({
+            'SECURITY_CODE_A': market.codes[mask].astype(object),
+            'SECURITY_ABBR_A': market.names[mask].astype(object),
+        })
+
+
+def create_fetch_backend(name: str = None):
+    """
+    按名称创建后端，名称默认取 settings.AKSHARE_BACKEND
+    akshare不可用时返回None（由调用方退回模拟数据服务）
+    """
+    from .akshare_service import load_akshare
+
+    name = name or getattr(settings, 'AKSHARE_BACKEND', BACKEND_AKSHARE)
+
+    if name == BACKEND_AKSHARE:
+        return load_akshare()
+
+    if name == BACKEND_SYNTHETIC:
+        from .registry import get_mock_service
+        return SyntheticBackend(get_mock_service().market)
+
+    from .replay import RecordingBackend, ReplayBackend
+    directory = getattr(settings, 'AKSHARE_REPLAY_DIR', settings.BASE_DIR / 'replay_data')
+
+    if name == BACKEND_RECORD:
+        upstream = load_akshare()
+        if upstream is None:
+            logger.warning("AKShare不可用，无法录制上游数据")
+            return None
+        return RecordingBackend(upstream, directory)
+
+    if name == BACKEND_REPLAY:
+        return ReplayBackend(
+            directory,
+            latency=getattr(settings, 'AKSHARE_REPLAY_LATENCY', 0.0),
+            jitter=getattr(settings, 'AKSHARE_REPLAY_JITTER', 0.0),
+            error_rate=getattr(settings, 'AKSHARE_REPLAY_ERROR_RATE', 0.0),
+            throttle_rate=getattr(settings, 'AKSHARE_REPLAY_THROTTLE', 0.0),
+            throttle_mode=getattr(settings, 'AKSHARE_REPLAY_THROTTLE_MODE', 'delay'),
+            seed=getattr(settings, 'AKSHARE_REPLAY_SEED', 0),
+        )
+
+    raise ValueError(f"未知的数据获取后端: {name}")
@@ -0,0 +1,190 @@
+"""
+向量化回测
+收盘价矩阵（交易日 x 股票，见 analytics.build_close_matrix）上一次算出全部日期、全部股票的信号，
+再整体计算组合收益，不逐日循环:
+
+- 策略函数接收前向填充后的收盘价矩阵和参数，返回同形状的持仓信号（布尔值为等权持有，浮点数为权重）
+- 第 t 日收盘产生的目标权重从第 t+1 日起生效，每日调整到目标权重，换手按 cost 扣除交易成本
+- 参数扫描在进程池中并行执行：收盘价矩阵通过进程初始化函数只传给每个子进程一次
+
+本模块的计算部分不依赖Django，子进程只导入numpy
+"""
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+TRADING_DAYS_PER_YEAR = 252
+
+# 策略名 -> (函数, 默认参数)
+STRATEGIES: Dict[str, tuple] = {}
+
+
+def strategy(name: str, **defaults):
+    """注册策略，参数均为整数"""
+    def register(func: Callable):
+        STRATEGIES[name] = (func, defaults)
+        return func
+    return register
+
+
+def _shift(values: np.ndarray, periods: int) -> np.ndarray:
+    """沿日期方向后移 periods 行，前面补NaN"""
+    shifted = np.full_like(values, np.nan)
+    if periods < len(values):
+        shifted[periods:] = values[:len(values) - periods]
+    return shifted
+
+
+def moving_average(closes: np.ndarray, span: int) -> np.ndarray:
+    """span 日简单移动平均，窗口内有NaN时为NaN"""
+    valid = ~np.isnan(closes)
+    total = np.cumsum(np.where(valid, closes, 0.0), axis=0)
+    count = np.cumsum(valid, axis=0)
+    total[span:] = total[span:] - total[:-span]
+    count[span:] = count[span:] - count[:-span]
+    with np.errstate(invalid='ignore'):
+        return np.where(count == span, total / span, np.nan)
+
+
+@strategy('ma_cross', fast=5, slow=20)
+def ma_cross(closes: np.ndarray, fast: int, slow: int) -> np.ndarray:
+    """均线交叉：快线在慢线之上时持有，持有的股票等权"""
+    if fast >= slow:
+        raise ValueError('fast 应小于 slow')
+    fast_ma = moving_average(closes, fast)
+    slow_ma = moving_average(closes, slow)
+    # 价格只有两位小数，两条均线经常恰好相等，比较时忽略累计和的舍入误差
+    with np.errstate(invalid='ignore'):
+        return fast_ma - slow_ma > 1e-9 * slow_ma
+
+
+@strategy('momentum', lookback=20, top=10, rebalance=5)
+def momentum(closes: np.ndarray, lookback: int, top: int, rebalance: int) -> np.ndarray:
+    """动量排名：每 rebalance 天按过去 lookback 天的涨幅排名，等权持有前 top 只"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        past_return = closes / _shift(closes, lookback) - 1.0
+    score = np.where(np.isfinite(past_return), past_return, -np.inf)
+    top = min(top, closes.shape[1])
+    leaders = np.argpartition(-score, top - 1, axis=1)[:, :top] if top > 0 else np.empty((len(closes), 0), int)
+
+    signal = np.zeros(closes.shape, dtype=bool)
+    np.put_along_axis(signal, leaders, True, axis=1)
+    signal &= np.isfinite(score)
+    # 调仓日之间沿用上一个调仓日的持仓
+    rebalance_rows = (np.arange(len(closes)) // max(rebalance, 1)) * max(rebalance, 1)
+    return signal[rebalance_rows]
+
+
+def to_weights(signal: np.ndarray) -> np.ndarray:
+    """布尔信号转换为等权权重；浮点权重中的NaN视为0"""
+    if signal.dtype == bool:
+        counts = signal.sum(axis=1, keepdims=True)
+        return np.divide(signal, counts, out=np.zeros(signal.shape), where=counts > 0)
+    return np.nan_to_num(signal.astype(np.float64), nan=0.0)
+
+
+def simulate(closes: np.ndarray, weights: np.ndarray, cost: float = 0.0) -> Dict[str, np.ndarray]:
+    """
+    按目标权重计算每日组合收益
+    closes 为前向填充后的收盘价；停牌期间价格不变，收益为0
+    返回 returns（每日净收益）、equity（净值，首日为1）、turnover、exposure（持仓总权重）
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        asset_returns = np.nan_to_num(closes[1:] / closes[:-1] - 1.0, nan=0.0, posinf=0.0, neginf=0.0)
+    turnover = np.abs(np.diff(weights, axis=0, prepend=0.0)).sum(axis=1)
+
+    returns = np.zeros(len(closes))
+    returns[1:] = (weights[:-1] * asset_returns).sum(axis=1) - turnover[:-1] * cost
+    return {
+        'returns': returns,
+        'equity': np.cumprod(1.0 + returns),
+        'turnover': turnover,
+        'exposure': weights.sum(axis=1),
+    }
+
+
+def performance(returns: np.ndarray, equity: np.ndarray, turnover: np.ndarray, exposure: np.ndarray) -> Dict:
+    """净值曲线的统计指标（收益、波动率、回撤为%）"""
+    days = max(len(returns) - 1, 1)
+    daily = returns[1:]
+    std = daily.std(ddof=1) if len(daily) > 1 else 0.0
+    drawdown = equity / np.maximum.accumulate(equity) - 1.0
+    invested = exposure[:-1] > 0
+
+    return {
+        'total_return': round(float(equity[-1] - 1.0) * 100, 2),
+        'annual_return': round(float(equity[-1] ** (TRADING_DAYS_PER_YEAR / days) - 1.0) * 100, 2),
+        'annual_volatility': round(float(std * np.sqrt(TRADING_DAYS_PER_YEAR)) * 100, 2),
+        'sharpe': round(float(daily.mean() / std * np.sqrt(TRADING_DAYS_PER_YEAR)), 3) if std > 0 else None,
+        'max_drawdown': round(float(drawdown.min()) * 100, 2),
+        'win_rate': round(float((daily[invested] > 0).mean()) * 100, 2) if invested.any() else None,
+        'avg_turnover': round(float(turnover.mean()), 4),
+        'avg_exposure': round(float(exposure.mean()), 4),
+        'days': int(days),
+    }
+
+
+def run_backtest(closes: np.ndarray, name: str, params: Optional[Dict] = None, cost: float = 0.0) -> Dict:
+    """
+    单次回测
+    closes 为前向填充后的收盘价矩阵，返回 {'params', 'stats', 'returns', 'equity', 'turnover', 'exposure'}
+    """
+    func, defaults = STRATEGIES[name]
+    params = {**defaults, **(params or {})}
+    weights = to_weights(func(closes, **params))
+    result = simulate(closes, weights, cost)
+    result['stats'] = performance(result['returns'], result['equity'], result['turnover'], result['exposure'])
+    result['params'] = params
+    return result
+
+
+def expand_grid(grid: Dict[str, List[int]]) -> List[Dict[str, int]]:
+    """{'fast': [5, 10], 'slow': [20, 60]} -> 全部参数组合"""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+_worker_closes: Optional[np.ndarray] = None
+
+
+def _init_worker(closes: np.ndarray):
+    global _worker_closes
+    _worker_closes = closes
+
+
+def _sweep_one(task) -> Dict:
+    name, params, cost = task
+    params = {**STRATEGIES[name][1], **params}
+    try:
+        stats = run_backtest(_worker_closes, name, params, cost)['stats']
+    except ValueError as e:
+        return {'params': params, 'stats': None, 'error': str(e)}
+    return {'params': params, 'stats': stats}
+
+
+def run_sweep(closes: np.ndarray, name: str, grid: List[Dict], cost: float = 0.0, workers: int = 1) -> List[Dict]:
+    """
+    参数扫描，返回每组参数的统计指标（不含净值曲线），按夏普比率从高到低排序
+    workers > 1 时在进程池中并行（spawn 方式启动子进程，不继承Web进程的线程和数据库连接）
+    """
+    tasks = [(name, params, cost) for params in grid]
+    if workers <= 1 or len(tasks) <= 1:
+        _init_worker(closes)
+        try:
+            results = [_sweep_one(task) for task in tasks]
+        finally:
+            _init_worker(None)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)),
+                                 mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(closes,)) as executor:
+            chunksize = max(1, len(tasks) // (workers * 4))
+            results = list(executor.map(_sweep_one, tasks, chunksize=chunksize))
+
+    def sort_key(item):
+        sharpe = item['stats']['sharpe'] if item['stats'] else None
+        return (sharpe is None, -(sharpe or 0.0))
+    return sorted(results, key=sort_key)
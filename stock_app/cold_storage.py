@@ -0,0 +1,163 @@
+"""
+历史价格冷热分层
+近期日线（热数据）保存在 StockPrice 表中；早于 PRICE_HOT_DAYS 的日线由 compact_prices 命令
+压缩为每只股票一个列式文件（冷数据），并从数据库删除，使表的大小不随年份增长:
+
+    <PRICE_COLD_DIR>/<code>.npz   date(序数日), open/high/low/close/amount(分), volume, change_rate(0.01%)
+
+价格、金额以整数保存，读回的 Decimal 与数据库中的值完全一致。
+历史查询通过 load_prices 合并两层数据，同一日期两层都有时以数据库为准
+"""
+import logging
+import os
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 以分为单位保存的字段
+CENT_FIELDS = ['open_price', 'high_price', 'low_price', 'close_price', 'amount']
+NULL_RATE = np.iinfo(np.int32).min  # change_rate 为空时的取值
+
+
+def hot_cutoff(today: Optional[date] = None) -> date:
+    """热数据的起始日期，早于该日期的日线可以压缩到冷存储"""
+    hot_days = getattr(settings, 'PRICE_HOT_DAYS', 730)
+    return (today or date.today()) - timedelta(days=hot_days)
+
+
+def _to_cents(values) -> np.ndarray:
+    return np.array([int(Decimal(value).scaleb(2).to_integral_value()) for value in values], dtype=np.int64)
+
+
+def _from_cents(value: int) -> Decimal:
+    return Decimal(value).scaleb(-2)
+
+
+class ColdPriceStore:
+    """每只股票一个压缩列式文件的冷数据存储"""
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory or getattr(settings, 'PRICE_COLD_DIR', settings.BASE_DIR / 'price_cold'))
+        self._write_lock = threading.Lock()
+
+    def path(self, code: str) -> Path:
+        return self.directory / f"{code}.npz"
+
+    def symbols(self) -> List[str]:
+        if not self.directory.exists():
+            return []
+        return sorted(path.stem for path in self.directory.glob('*.npz'))
+
+    def read_arrays(self, code: str) -> Optional[dict]:
+        """读取某只股票的全部冷数据列（按日期升序），没有冷数据返回None"""
+        try:
+            with np.load(self.path(code)) as data:
+                return {name: data[name] for name in data.files}
+        except FileNotFoundError:
+            return None
+
+    def write(self, code: str, rows: Sequence[tuple]) -> int:
+        """
+        把日线合并写入某只股票的冷数据文件，返回文件中的总行数
+        参数: rows - (date, open_price, high_price, low_price, close_price, volume, amount, change_rate)
+        同一日期已存在时以新数据为准；先写临时文件再替换，读取方不会看到写了一半的文件
+        """
+        if not rows:
+            existing = self.read_arrays(code)
+            return 0 if existing is None else len(existing['date'])
+
+        columns = list(zip(*rows))
+        new = {
+            'date': np.array([day.toordinal() for day in columns[0]], dtype=np.int32),
+            'volume': np.array(columns[5], dtype=np.int64),
+            'change_rate': np.array(
+                [NULL_RATE if value is None else int(Decimal(value).scaleb(2).to_integral_value())
+                 for value in columns[7]], dtype=np.int32),
+        }
+        for name, index in (('open_price', 1), ('high_price', 2), ('low_price', 3), ('close_price', 4), ('amount', 6)):
+            new[name] = _to_cents(columns[index])
+
+        with self._write_lock:
+            existing = self.read_arrays(code)
+            if existing is not None:
+                merged = {name: np.concatenate([existing[name], new[name]]) for name in new}
+            else:
+                merged = new
+
+            # 按日期排序，同一日期保留最后写入的一条
+            dates = merged['date']
+            order = np.lexsort((np.arange(len(dates)), dates))
+            sorted_dates = dates[order]
+            keep = order[np.append(sorted_dates[1:] != sorted_dates[:-1], True)]
+            merged = {name: values[keep] for name, values in merged.items()}
+
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.directory / f".{code}.{os.getpid()}.tmp.npz"
+            np.savez_compressed(tmp_path, **merged)
+            tmp_path.replace(self.path(code))
+        return len(merged['date'])
+
+    def read_rows(self, code: str, start: Optional[date] = None, end: Optional[date] = None,
+                  exclude: Iterable[date] = (), limit: Optional[int] = None) -> List[dict]:
+        """
+        读取日期范围内的冷数据（按日期降序，与 StockPrice 默认排序一致），最多 limit 条
+        exclude 中的日期跳过（已在数据库中的日期）
+        """
+        arrays = self.read_arrays(code)
+        if arrays is None:
+            return []
+
+        dates = arrays['date']
+        lo = np.searchsorted(dates, start.toordinal()) if start else 0
+        hi = np.searchsorted(dates, end.toordinal(), side='right') if end else len(dates)
+        excluded = {day.toordinal() for day in exclude}
+
+        rows = []
+        for i in range(hi - 1, lo - 1, -1):
+            ordinal = int(dates[i])
+            if ordinal in excluded:
+                continue
+            rate = int(arrays['change_rate'][i])
+            row = {name: _from_cents(int(arrays[name][i])) for name in CENT_FIELDS}
+            row.update(
+                date=date.fromordinal(ordinal),
+                volume=int(arrays['volume'][i]),
+                change_rate=None if rate == NULL_RATE else _from_cents(rate),
+            )
+            rows.append(row)
+            if limit and len(rows) >= limit:
+                break
+        return rows
+
+
+def load_prices(stock, start: Optional[date] = None, end: Optional[date] = None,
+                limit: Optional[int] = None) -> list:
+    """
+    合并冷热两层的日线，按日期降序返回 StockPrice 列表
+    冷数据构造为未保存的 StockPrice 实例（id、created_at 为空），可直接用 StockPriceSerializer 序列化
+    """
+    from .models import StockPrice
+    from .registry import get_cold_store
+
+    queryset = stock.prices.all()
+    if start:
+        queryset = queryset.filter(date__gte=start)
+    if end:
+        queryset = queryset.filter(date__lte=end)
+    hot = list(queryset[:limit] if limit else queryset)
+    for price in hot:
+        price.stock = stock
+
+    cold = get_cold_store().read_rows(stock.code, start, end, exclude=[price.date for price in hot], limit=limit)
+    if not cold:
+        return hot
+    prices = hot + [StockPrice(stock=stock, **row) for row in cold]
+    prices.sort(key=lambda price: price.date, reverse=True)
+    return prices[:limit] if limit else prices
@@ -0,0 +1,87 @@
+"""
+主从数据库路由
+配置了只读副本（settings.DATABASES 中 default 以外的库）时，由 ReplicaRoutingMiddleware 标记的
+只读请求（GET/HEAD/OPTIONS）的查询分散到各副本，写入始终在主库:
+
+- 请求中发生过写入后，该请求后续的读取改到主库
+- 发生写入的 POST/PUT/PATCH/DELETE 请求在响应中设置粘滞Cookie，DB_REPLICA_STICKY_SECONDS 内
+  同一客户端的请求都读主库，避免副本复制延迟导致读不到自己刚写入的数据
+- 请求以外的代码（管理命令、后台线程）全部使用主库
+"""
+import contextvars
+import itertools
+from contextlib import contextmanager
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_COOKIE = 'db_primary'
+
+
+class RoutingState:
+    """单个请求的路由状态"""
+    __slots__ = ('use_replica', 'wrote')
+
+    def __init__(self, use_replica: bool):
+        self.use_replica = use_replica
+        self.wrote = False
+
+
+_state: contextvars.ContextVar[Optional[RoutingState]] = contextvars.ContextVar('db_routing_state', default=None)
+
+
+def replica_aliases() -> List[str]:
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+def start_request(use_replica: bool):
+    """开始一个请求的路由，返回 (状态, token)"""
+    state = RoutingState(use_replica)
+    return state, _state.set(state)
+
+
+def end_request(token):
+    _state.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """在只读请求中强制从主库读取（如读取刚由其他进程写入的数据）"""
+    state = _state.get()
+    if state is None:
+        yield
+        return
+    previous, state.use_replica = state.use_replica, False
+    try:
+        yield
+    finally:
+        state.use_replica = previous
+
+
+class PrimaryReplicaRouter:
+    """只读请求的读取轮流分配到副本，其余读写都在主库"""
+
+    def __init__(self):
+        self.replicas = replica_aliases()
+        self._next = itertools.cycle(self.replicas) if self.replicas else None
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if self._next is None or state is None or not state.use_replica or state.wrote:
+            return DEFAULT_DB_ALIAS
+        return next(self._next)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 主库和副本是同一份数据
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 副本通过数据库复制同步表结构
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,110 @@
+"""
+上游HTTP连接池
+AKShare内部直接调用 requests.get / requests.post，每次请求都会新建连接；
+启用时只把akshare各模块中的 requests 名称替换为 PooledRequests，其他库仍使用原来的requests。
+每次请求使用新的会话（与 requests.get 一样不保留cookie和请求头），会话都挂载同一个HTTPAdapter，
+由其（线程安全的）urllib3连接池复用到东方财富等上游主机的TCP/TLS连接
+"""
+import logging
+import sys
+import threading
+import types
+from typing import List, Optional
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_adapter: Optional[HTTPAdapter] = None
+# 已替换 requests 名称的akshare模块
+_patched: List[types.ModuleType] = []
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """为未指定超时的请求补充默认超时"""
+
+    def __init__(self, *args, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def get_http_adapter() -> HTTPAdapter:
+    """获取（必要时创建）共享的连接池"""
+    global _adapter
+    with _lock:
+        if _adapter is None:
+            _adapter = TimeoutHTTPAdapter(
+                pool_connections=getattr(settings, 'AKSHARE_POOL_CONNECTIONS', 10),
+                pool_maxsize=getattr(settings, 'AKSHARE_POOL_MAXSIZE', 20),
+                timeout=getattr(settings, 'AKSHARE_TIMEOUT', 30),
+            )
+            logger.info("初始化上游HTTP连接池")
+        return _adapter
+
+
+def pooled_request(method: str, url: str, **kwargs) -> requests.Response:
+    """与 requests.request 相同，但连接来自共享连接池"""
+    adapter = get_http_adapter()
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    # 不关闭会话：关闭会同时关闭共享的连接池
+    return session.request(method, url, **kwargs)
+
+
+class PooledRequests(types.ModuleType):
+    """代替akshare模块中的 requests：request/get/post 使用连接池，其余属性取自requests模块"""
+
+    def __init__(self):
+        super().__init__('requests')
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+    @staticmethod
+    def request(method, url, **kwargs):
+        return pooled_request(method, url, **kwargs)
+
+    @staticmethod
+    def get(url, params=None, **kwargs):
+        return pooled_request('GET', url, params=params, **kwargs)
+
+    @staticmethod
+    def post(url, data=None, json=None, **kwargs):
+        return pooled_request('POST', url, data=data, json=json, **kwargs)
+
+
+def install_pooled_session():
+    """
+    把已导入的akshare模块中的 requests 替换为 PooledRequests
+    AKShare的接口不支持传入会话，只能替换其模块中的名称；重复调用无副作用
+    """
+    with _lock:
+        if _patched:
+            return
+        pooled = PooledRequests()
+        for name, module in list(sys.modules.items()):
+            if (name == 'akshare' or name.startswith('akshare.')) and getattr(module, 'requests', None) is requests:
+                module.requests = pooled
+                _patched.append(module)
+    logger.info(f"AKShare上游请求已启用连接复用（{len(_patched)} 个模块）")
+
+
+def close_http_session():
+    """恢复akshare模块中的 requests 并关闭连接池"""
+    global _adapter
+    with _lock:
+        for module in _patched:
+            module.requests = requests
+        _patched.clear()
+        if _adapter is not None:
+            _adapter.close()
+            _adapter = None
@@ -0,0 +1,297 @@
+"""
+分时数据存储
+由定时采集的全市场实时快照构成，只追加写入，按交易日分区:
+
+    <INTRADAY_DIR>/<YYYYMMDD>/ticks.bin    当日快照记录（定长结构化数组，直接追加）
+    <INTRADAY_DIR>/<YYYYMMDD>/codes.bin    当日出现过的股票代码（S6，按首次出现顺序追加，下标即槽位）
+    <INTRADAY_DIR>/<YYYYMMDD>/blocks.bin   每次快照在 ticks.bin 中的位置（时间、起始记录、槽位数）
+    <INTRADAY_DIR>/<YYYYMMDD>/bars_1m.npz  收盘后压缩生成的1分钟K线（按股票排序，带偏移索引）
+
+每次快照按槽位顺序写成一个连续的块（本次没有行情的股票价格为NaN），
+同一只股票在各块中的位置都是 块起始 + 槽位，读取当天尚未压缩的单只股票时只取这些记录，不扫描全天数据。
+分钟K线由快照批量向量化计算（排序后 reduceat），不为每只股票每分钟写一行ORM记录。
+快照只由采集进程（python manage.py collect_intraday）单进程写入，接口进程只读
+"""
+import logging
+import shutil
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+
+from .trading_calendar import MARKET_TIMEZONE
+
+logger = logging.getLogger(__name__)
+
+TICK_DTYPE = np.dtype([
+    ('ts', '<i8'),         # 快照时间（Unix秒）
+    ('code', 'S6'),        # 股票代码
+    ('price', '<f4'),      # 最新价
+    ('volume', '<i8'),     # 当日累计成交量（手）
+    ('amount', '<f8'),     # 当日累计成交额（元）
+])
+
+BLOCK_DTYPE = np.dtype([
+    ('ts', '<i8'),         # 快照时间（Unix秒）
+    ('offset', '<u8'),     # 块在 ticks.bin 中的起始记录
+    ('width', '<u4'),      # 块的记录数（写入时的槽位数）
+])
+
+TICKS_FILE = 'ticks.bin'
+CODES_FILE = 'codes.bin'
+BLOCKS_FILE = 'blocks.bin'
+BARS_FILE = 'bars_1m.npz'
+
+# 支持的K线周期（秒）
+INTERVALS = {'1m': 60, '5m': 300, '15m': 900, '30m': 1800}
+
+
+def is_trading_time(moment: datetime) -> bool:
+    """是否处于交易时段（按交易日历，排除周末和节假日）"""
+    from .registry import get_trading_calendar
+    return get_trading_calendar().is_open(moment)
+
+
+def build_bars(ts: np.ndarray, price: np.ndarray, volume: np.ndarray, amount: np.ndarray,
+               interval: int, group: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    把快照聚合为K线
+    参数:
+        ts/price/volume/amount: 快照时间、价格和累计成交量、成交额，需按 (group, ts) 排序
+        interval: K线周期（秒）
+        group: 分组键（如股票代码），为空表示只有一组
+    返回: {'group', 'ts', 'open', 'high', 'low', 'close', 'volume', 'amount'}，ts 为K线起始时间
+    成交量、成交额为该周期内累计值的增量，每组第一根K线从该组第一个快照开始计算
+    """
+    valid = np.isfinite(price) & (price > 0)
+    ts, price, volume, amount = ts[valid], price[valid], volume[valid], amount[valid]
+    group = group[valid] if group is not None else np.zeros(len(ts), dtype=np.int8)
+    if len(ts) == 0:
+        empty = np.array([], dtype=np.float64)
+        return {'group': group[:0], 'ts': ts[:0], 'open': empty, 'high': empty, 'low': empty,
+                'close': empty, 'volume': volume[:0], 'amount': empty}
+
+    bucket = ts - ts % interval
+    boundary = np.ones(len(ts), dtype=bool)
+    boundary[1:] = (bucket[1:] != bucket[:-1]) | (group[1:] != group[:-1])
+    starts = np.flatnonzero(boundary)
+    ends = np.append(starts[1:], len(ts)) - 1
+
+    # 每根K线的成交增量 = 本周期最后一个累计值 - 上一根K线最后一个累计值（同组）
+    group_start = np.ones(len(starts), dtype=bool)
+    group_start[1:] = group[starts[1:]] != group[starts[:-1]]
+    prev_volume = np.where(group_start, volume[starts], np.roll(volume[ends], 1))
+    prev_amount = np.where(group_start, amount[starts], np.roll(amount[ends], 1))
+
+    return {
+        'group': group[starts],
+        'ts': bucket[starts],
+        'open': price[starts].astype(np.float64),
+        'high': np.maximum.reduceat(price, starts).astype(np.float64),
+        'low': np.minimum.reduceat(price, starts).astype(np.float64),
+        'close': price[ends].astype(np.float64),
+        'volume': np.maximum(volume[ends] - prev_volume, 0),
+        'amount': np.maximum(amount[ends] - prev_amount, 0),
+    }
+
+
+def resample_bars(bars: Dict[str, np.ndarray], interval: int) -> Dict[str, np.ndarray]:
+    """把单只股票的1分钟K线合并为更长周期"""
+    if len(bars['ts']) == 0 or interval <= INTERVALS['1m']:
+        return bars
+    bucket = bars['ts'] - bars['ts'] % interval
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.append(starts[1:], len(bucket)) - 1
+    return {
+        'ts': bucket[starts],
+        'open': bars['open'][starts],
+        'high': np.maximum.reduceat(bars['high'], starts),
+        'low': np.minimum.reduceat(bars['low'], starts),
+        'close': bars['close'][ends],
+        'volume': np.add.reduceat(bars['volume'], starts),
+        'amount': np.add.reduceat(bars['amount'], starts),
+    }
+
+
+class IntradayStore:
+    """按交易日分区的分时数据存储"""
+
+    def __init__(self, directory=None, retention_days: int = None):
+        self.directory = Path(directory or getattr(settings, 'INTRADAY_DIR', settings.BASE_DIR / 'intraday_data'))
+        self.retention_days = retention_days if retention_days is not None else getattr(
+            settings, 'INTRADAY_RETENTION_DAYS', 30)
+        self._lock = threading.Lock()
+        # 采集进程中各交易日的槽位: {分区路径: {代码: 槽位}}
+        self._slots: Dict[Path, Dict[bytes, int]] = {}
+
+    def partition(self, day: date) -> Path:
+        return self.directory / day.strftime('%Y%m%d')
+
+    def days(self) -> List[date]:
+        """已有数据的交易日"""
+        if not self.directory.exists():
+            return []
+        return sorted(
+            datetime.strptime(path.name, '%Y%m%d').date()
+            for path in self.directory.iterdir() if path.is_dir() and path.name.isdigit()
+        )
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    def _day_slots(self, path: Path) -> Dict[bytes, int]:
+        """某日的槽位，采集进程重启后从 codes.bin 恢复"""
+        slots = self._slots.get(path)
+        if slots is None:
+            codes_path = path / CODES_FILE
+            codes = np.fromfile(codes_path, dtype='S6') if codes_path.exists() else []
+            slots = {code: i for i, code in enumerate(np.asarray(codes).tolist())}
+            self._slots = {path: slots}
+        return slots
+
+    def append_snapshot(self, ts: int, codes: np.ndarray, price: np.ndarray,
+                        volume: np.ndarray, amount: np.ndarray) -> int:
+        """追加一次全市场快照，返回快照中的股票数"""
+        codes = np.asarray(codes).astype('S6')
+        # 按市场时区划分交易日，与服务器时区无关
+        path = self.partition(datetime.fromtimestamp(ts, MARKET_TIMEZONE).date())
+        path.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            slots = self._day_slots(path)
+            new_codes = [code for code in dict.fromkeys(codes.tolist()) if code not in slots]
+            if new_codes:
+                with open(path / CODES_FILE, 'ab') as f:
+                    np.array(new_codes, dtype='S6').tofile(f)
+                for code in new_codes:
+                    slots[code] = len(slots)
+
+            records = np.zeros(len(slots), dtype=TICK_DTYPE)
+            records['ts'] = ts
+            records['code'] = list(slots)
+            records['price'] = np.nan
+            index = np.fromiter((slots[code] for code in codes.tolist()), dtype=np.int64, count=len(codes))
+            records['price'][index] = price
+            records['volume'][index] = volume
+            records['amount'][index] = amount
+
+            with open(path / TICKS_FILE, 'ab') as f:
+                # 丢弃上次异常退出时写了一半的记录，保证块起始位置与记录对齐
+                count = f.tell() // TICK_DTYPE.itemsize
+                f.truncate(count * TICK_DTYPE.itemsize)
+                f.seek(count * TICK_DTYPE.itemsize)
+                records.tofile(f)
+            # 先写快照再登记块，读取方看到的块都是完整的
+            block = np.array([(ts, count, len(records))], dtype=BLOCK_DTYPE)
+            with open(path / BLOCKS_FILE, 'ab') as f:
+                block.tofile(f)
+        return len(codes)
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+
+    def read_ticks(self, day: date) -> np.ndarray:
+        """读取某日全部快照记录（内存映射，不完整的末尾记录忽略）"""
+        path = self.partition(day) / TICKS_FILE
+        if not path.exists():
+            return np.empty(0, dtype=TICK_DTYPE)
+        count = path.stat().st_size // TICK_DTYPE.itemsize
+        if count == 0:
+            return np.empty(0, dtype=TICK_DTYPE)
+        return np.memmap(path, dtype=TICK_DTYPE, mode='r', shape=(count,))
+
+    def _symbol_ticks(self, day: date, symbol: str) -> np.ndarray:
+        """
+        单只股票某日的快照记录（按时间排序）
+        按槽位从每个块中各取一条，没有块索引的分区（旧版本写入）退回扫描全天数据
+        """
+        partition = self.partition(day)
+        ticks = self.read_ticks(day)
+        blocks_path, codes_path = partition / BLOCKS_FILE, partition / CODES_FILE
+        if not (blocks_path.exists() and codes_path.exists()):
+            ticks = ticks[ticks['code'] == symbol.encode()]
+            return ticks[np.argsort(ticks['ts'], kind='stable')]
+
+        slot = np.flatnonzero(np.fromfile(codes_path, dtype='S6') == symbol.encode())
+        if len(slot) == 0:
+            return ticks[:0]
+        blocks = np.fromfile(blocks_path, dtype=BLOCK_DTYPE)
+        blocks = blocks[blocks['width'] > slot[0]]
+        positions = blocks['offset'].astype(np.int64) + int(slot[0])
+        return np.asarray(ticks[positions[positions < len(ticks)]])
+
+    def get_bars(self, symbol: str, day: date, interval: str = '1m') -> Dict[str, np.ndarray]:
+        """
+        单只股票某日的K线
+        已压缩的交易日从1分钟K线文件读取，否则由当日快照即时计算
+        """
+        seconds = INTERVALS[interval]
+        bars_path = self.partition(day) / BARS_FILE
+        if bars_path.exists():
+            bars = self._read_compacted(bars_path, symbol)
+        else:
+            ticks = self._symbol_ticks(day, symbol)
+            bars = build_bars(ticks['ts'], ticks['price'], ticks['volume'], ticks['amount'], INTERVALS['1m'])
+            bars.pop('group')
+        return resample_bars(bars, seconds)
+
+    @staticmethod
+    def _read_compacted(path: Path, symbol: str) -> Dict[str, np.ndarray]:
+        with np.load(path) as data:
+            codes = data['codes']
+            index = np.searchsorted(codes, symbol.encode())
+            if index >= len(codes) or codes[index] != symbol.encode():
+                start = end = 0
+            else:
+                start, end = data['offsets'][index], data['offsets'][index + 1]
+            return {name: data[name][start:end] for name in
+                    ('ts', 'open', 'high', 'low', 'close', 'volume', 'amount')}
+
+    # ------------------------------------------------------------------
+    # 压缩与保留
+    # ------------------------------------------------------------------
+
+    def compact(self, day: date, keep_ticks: bool = False) -> int:
+        """
+        把某日快照压缩为按股票排序的1分钟K线，返回K线数
+        默认删除原始快照；压缩后的文件按代码二分查找，读取单只股票不需要扫描全天数据
+        """
+        partition = self.partition(day)
+        ticks = np.array(self.read_ticks(day))
+        if len(ticks) == 0:
+            return 0
+
+        order = np.lexsort((ticks['ts'], ticks['code']))
+        ticks = ticks[order]
+        bars = build_bars(ticks['ts'], ticks['price'], ticks['volume'], ticks['amount'],
+                          INTERVALS['1m'], group=ticks['code'])
+
+        codes, starts = np.unique(bars['group'], return_index=True)
+        offsets = np.append(starts, len(bars['group']))
+        tmp_path = partition / (BARS_FILE + '.tmp.npz')
+        np.savez_compressed(
+            tmp_path, codes=codes, offsets=offsets,
+            ts=bars['ts'], open=bars['open'].astype(np.float32), high=bars['high'].astype(np.float32),
+            low=bars['low'].astype(np.float32), close=bars['close'].astype(np.float32),
+            volume=bars['volume'], amount=bars['amount'],
+        )
+        tmp_path.replace(partition / BARS_FILE)
+
+        if not keep_ticks:
+            for name in (TICKS_FILE, CODES_FILE, BLOCKS_FILE):
+                (partition / name).unlink(missing_ok=True)
+        logger.info(f"分时数据 {day} 压缩为 {len(bars['ts'])} 根1分钟K线（{len(codes)} 只股票）")
+        return len(bars['ts'])
+
+    def prune(self, today: Optional[date] = None) -> List[date]:
+        """删除超出保留天数的分区"""
+        cutoff = (today or datetime.now(MARKET_TIMEZONE).date()) - timedelta(days=self.retention_days)
+        removed = [day for day in self.days() if day < cutoff]
+        for day in removed:
+            shutil.rmtree(self.partition(day), ignore_errors=True)
+        return removed
@@ -0,0 +1,186 @@
+"""
+全市场历史数据回填
+
+多线程并发获取日线（全局令牌桶限制上游调用速率，重试也计入），由主线程批量写入数据库；
+每只股票写入后记录（股票, 日期范围）检查点，中断后重新运行会跳过已完成的股票
+
+示例:
+    python manage.py backfill_history --start 20230101 --workers 16 --rate 10
+    python manage.py backfill_history --symbols 000001 600519 --start 20200101 --end 20231231
+    AKSHARE_BACKEND=replay python manage.py backfill_history --rate 0   # 对本地回放数据压测，不限速
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from stock_app.models import BackfillCheckpoint, Stock, StockPrice
+from stock_app.ratelimit import TokenBucket
+from stock_app.registry import get_akshare_service, get_trading_calendar
+
+PRICE_FIELDS = ['open_price', 'high_price', 'low_price', 'close_price', 'volume', 'amount', 'change_rate']
+
+
+def _parse_date(value: str):
+    try:
+        return datetime.strptime(value, '%Y%m%d').date()
+    except ValueError:
+        raise CommandError(f"日期格式应为YYYYMMDD: {value}")
+
+
+class Command(BaseCommand):
+    help = '并发回填全市场（或指定股票）的日线历史数据，支持断点续传'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--symbols', nargs='*', help='只回填指定股票，默认全部A股')
+        parser.add_argument('--start', help='开始日期 YYYYMMDD，默认一年前')
+        parser.add_argument('--end', help='结束日期 YYYYMMDD，默认最近一个已收市的交易日')
+        parser.add_argument('--workers', type=int, default=8, help='并发获取的线程数')
+        parser.add_argument('--rate', type=float, default=5.0, help='每秒最多的上游调用数，0为不限速')
+        parser.add_argument('--flush-rows', type=int, default=20000, help='累计多少行写入一次数据库')
+        parser.add_argument('--skip-failed', action='store_true', help='跳过之前失败的股票（默认会重试）')
+        parser.add_argument('--restart', action='store_true', help='忽略已有检查点，全部重新回填')
+
+    def handle(self, *args, **options):
+        # 默认截至最近一个已收市的交易日：收市前或休市日重复运行时使用同一组检查点，不会重新请求上游
+        end = _parse_date(options['end']) if options['end'] else get_trading_calendar().last_completed_session(timezone.now())
+        start = _parse_date(options['start']) if options['start'] else end - timedelta(days=365)
+        if start > end:
+            raise CommandError('开始日期不能晚于结束日期')
+
+        service = get_akshare_service()
+        universe = self._load_universe(service, options['symbols'])
+        stock_ids = dict(Stock.objects.filter(code__in=[s['code'] for s in universe]).values_list('code', 'id'))
+
+        checkpoints = BackfillCheckpoint.objects.filter(start_date=start, end_date=end)
+        if options['restart']:
+            checkpoints.delete()
+        skip_status = [BackfillCheckpoint.STATUS_DONE]
+        if options['skip_failed']:
+            skip_status.append(BackfillCheckpoint.STATUS_FAILED)
+        finished = set(checkpoints.filter(status__in=skip_status).values_list('symbol', flat=True))
+        pending = [code for code in stock_ids if code not in finished]
+
+        self.stdout.write(
+            f"回填 {start}~{end}: 共 {len(stock_ids)} 只，已完成 {len(stock_ids) - len(pending)} 只，待处理 {len(pending)} 只"
+        )
+        if not pending:
+            return
+
+        bucket = TokenBucket(options['rate']) if options['rate'] > 0 else None
+        start_arg, end_arg = start.strftime('%Y%m%d'), end.strftime('%Y%m%d')
+
+        def fetch(symbol):
+            return service.fetch_stock_history(symbol, 'daily', start_arg, end_arg, limiter=bucket)
+
+        self._started = time.perf_counter()
+        self._done = self._failed = self._rows = 0
+        buffer, completed = [], []
+
+        workers = max(1, options['workers'])
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            symbols = iter(pending)
+            running = {}
+
+            def submit_next():
+                symbol = next(symbols, None)
+                if symbol is not None:
+                    running[executor.submit(fetch, symbol)] = symbol
+
+            # 只保持有限个任务在队列中，中断时不会有大量已提交但未完成的任务
+            for _ in range(workers * 2):
+                submit_next()
+
+            try:
+                while running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        symbol = running.pop(future)
+                        submit_next()
+                        try:
+                            history = future.result()
+                        except Exception as e:
+                            self._record_failure(symbol, start, end, e)
+                            continue
+
+                        buffer.extend(
+                            StockPrice(stock_id=stock_ids[symbol], date=row['date'],
+                                       **{field: row[field] for field in PRICE_FIELDS})
+                            for row in history
+                        )
+                        completed.append((symbol, len(history)))
+                        if len(buffer) >= options['flush_rows']:
+                            self._flush(buffer, completed, start, end, len(pending))
+                            buffer, completed = [], []
+            finally:
+                # 中断（Ctrl+C）时也把已获取的数据写入，保证检查点与数据一致
+                for future in running:
+                    future.cancel()
+                if completed:
+                    self._flush(buffer, completed, start, end, len(pending))
+
+        elapsed = time.perf_counter() - self._started
+        self.stdout.write(self.style.SUCCESS(
+            f"完成 {self._done} 只（失败 {self._failed} 只），写入 {self._rows} 行，"
+            f"耗时 {elapsed:.1f}s（{self._done / max(elapsed, 1e-9) * 60:.0f} 只/分钟）"
+        ))
+
+    def _load_universe(self, service, symbols):
+        """获取股票列表，并确保每只股票在数据库中都有记录"""
+        universe = service.get_stock_universe()
+        if symbols:
+            known = {stock['code']: stock for stock in universe}
+            universe = [
+                known.get(code) or {'code': code, 'name': code, 'market': 'SH' if code.startswith('6') else 'SZ'}
+                for code in symbols
+            ]
+        if not universe:
+            raise CommandError('未获取到股票列表')
+
+        Stock.objects.bulk_create(
+            [Stock(code=stock['code'], name=stock['name'], market=stock['market']) for stock in universe],
+            ignore_conflicts=True, batch_size=1000
+        )
+        return universe
+
+    def _flush(self, buffer, completed, start, end, total):
+        """批量写入价格数据，并在同一事务中记录检查点（尝试次数在之前失败的基础上累加）"""
+        with transaction.atomic():
+            StockPrice.objects.bulk_create(buffer, ignore_conflicts=True, batch_size=1000)
+            attempts = dict(BackfillCheckpoint.objects.filter(
+                symbol__in=[symbol for symbol, _ in completed], start_date=start, end_date=end
+            ).values_list('symbol', 'attempts'))
+            BackfillCheckpoint.objects.bulk_create(
+                [BackfillCheckpoint(symbol=symbol, start_date=start, end_date=end,
+                                    status=BackfillCheckpoint.STATUS_DONE, rows=rows,
+                                    attempts=attempts.get(symbol, 0) + 1)
+                 for symbol, rows in completed],
+                update_conflicts=True,
+                unique_fields=['symbol', 'start_date', 'end_date'],
+                update_fields=['status', 'rows', 'error', 'attempts', 'updated_at'],
+            )
+
+        self._done += len(completed)
+        self._rows += len(buffer)
+        elapsed = time.perf_counter() - self._started
+        rate = self._done / max(elapsed, 1e-9)
+        remaining = total - self._done - self._failed
+        self.stdout.write(
+            f"  进度 {self._done + self._failed}/{total}，{rate * 60:.0f} 只/分钟，"
+            f"预计剩余 {remaining / max(rate, 1e-9):.0f}s"
+        )
+
+    def _record_failure(self, symbol, start, end, error):
+        self._failed += 1
+        checkpoint, _ = BackfillCheckpoint.objects.get_or_create(
+            symbol=symbol, start_date=start, end_date=end,
+            defaults={'status': BackfillCheckpoint.STATUS_FAILED}
+        )
+        checkpoint.status = BackfillCheckpoint.STATUS_FAILED
+        checkpoint.attempts += 1
+        checkpoint.error = str(error)[:1000]
+        checkpoint.save()
+        self.stderr.write(f"  {symbol}: 获取失败 {str(error)}")
@@ -0,0 +1,105 @@
+"""
+采集分时数据
+
+交易时段内按固定间隔获取全市场快照追加到当日分区，发布为各worker共享的新版本快照文件（见 spot_snapshot.py），
+并检查价格提醒规则（见 alerts.py）；
+收盘后把当日快照压缩为1分钟K线，并删除超出 INTRADAY_RETENTION_DAYS 的分区。
+交易时段按交易日历判断（见 trading_calendar.py），午休、夜间、周末和节假日休眠到下次开市，不请求上游。
+同一数据目录只应运行一个采集进程，否则提醒会重复触发
+
+示例:
+    python manage.py collect_intraday
+    python manage.py collect_intraday --interval 5 --always     # 非交易时段也采集（配合合成数据测试）
+    python manage.py collect_intraday --compact 20240105        # 手动压缩某日数据
+"""
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from stock_app.alerts import AlertEngine
+from stock_app.registry import get_akshare_service, get_intraday_store, get_trading_calendar
+from stock_app.spot_snapshot import publish_snapshot
+
+# 休市期间单次休眠的最长时间（秒），之后重新检查交易日历
+MAX_IDLE_SLEEP = 600
+
+
+class Command(BaseCommand):
+    help = '定时采集全市场快照，生成分钟K线'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=None, help='采集间隔（秒），默认 INTRADAY_INTERVAL')
+        parser.add_argument('--always', action='store_true', help='不判断交易时段，一直采集')
+        parser.add_argument('--once', action='store_true', help='只采集一次后退出')
+        parser.add_argument('--compact', metavar='YYYYMMDD', help='压缩指定日期的快照后退出')
+        parser.add_argument('--no-alerts', action='store_true', help='不检查价格提醒规则')
+
+    def handle(self, *args, **options):
+        store = get_intraday_store()
+
+        if options['compact']:
+            try:
+                day = datetime.strptime(options['compact'], '%Y%m%d').date()
+            except ValueError:
+                raise CommandError(f"日期格式应为YYYYMMDD: {options['compact']}")
+            bars = store.compact(day)
+            self.stdout.write(self.style.SUCCESS(f"{day}: 生成 {bars} 根1分钟K线"))
+            return
+
+        self.alerts = None if options['no_alerts'] else AlertEngine()
+
+        if options['once']:
+            self._collect(store)
+            return
+
+        interval = options['interval'] or getattr(settings, 'INTRADAY_INTERVAL', 15)
+        self.stdout.write(f"开始采集分时数据，间隔 {interval}s，目录 {store.directory}")
+        compacted = None
+        try:
+            while True:
+                started = time.monotonic()
+                now = timezone.now()
+                calendar = get_trading_calendar()
+                if options['always'] or calendar.is_open(now):
+                    self._collect(store)
+                    time.sleep(max(0.0, interval - (time.monotonic() - started)))
+                    continue
+
+                today = calendar.market_date(now)
+                if calendar.last_completed_session(now) == today and compacted != today:
+                    # 收盘后压缩当日数据（每个交易日一次）
+                    compacted = today
+                    bars = store.compact(compacted)
+                    removed = store.prune(compacted)
+                    self.stdout.write(f"{compacted}: 生成 {bars} 根1分钟K线，清理 {len(removed)} 个过期分区")
+                # 休市期间不采集，休眠到下次开市
+                idle = (calendar.next_open(now) - now).total_seconds()
+                time.sleep(min(max(idle, 1.0), MAX_IDLE_SLEEP))
+        except KeyboardInterrupt:
+            self.stdout.write('停止采集')
+
+    def _collect(self, store):
+        spot = get_akshare_service().get_spot_arrays()
+        if spot is None:
+            self.stderr.write('获取全市场快照失败，跳过本次采集')
+            return
+        fetched_at = time.time()
+        count = store.append_snapshot(int(fetched_at), spot['code'], spot['price'], spot['volume'], spot['amount'])
+        message = f"{datetime.now():%H:%M:%S} 采集 {count} 只股票"
+        try:
+            publish_snapshot(spot, fetched_at)
+        except OSError as e:
+            self.stderr.write(f"写入共享快照失败: {str(e)}")
+
+        if self.alerts is not None:
+            try:
+                events = self.alerts.process(spot)
+            except Exception as e:
+                self.stderr.write(f"检查价格提醒失败: {str(e)}")
+            else:
+                if events:
+                    message += f"，触发 {len(events)} 条提醒"
+        self.stdout.write(message)
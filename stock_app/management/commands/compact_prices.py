@@ -0,0 +1,88 @@
+"""
+把早期日线从数据库压缩到冷存储
+
+早于 PRICE_HOT_DAYS 的 StockPrice 记录按股票合并写入冷数据文件（见 cold_storage.py），
+写入成功后按读出的记录ID从数据库删除（每只股票一个事务）；中途中断不会丢数据，重新运行即可。建议每天收盘后定时运行
+
+示例:
+    python manage.py compact_prices
+    python manage.py compact_prices --hot-days 365 --vacuum
+    python manage.py compact_prices --dry-run
+"""
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+
+from stock_app.cold_storage import hot_cutoff
+from stock_app.models import Stock, StockPrice
+from stock_app.registry import get_cold_store
+
+COLUMNS = ['date', 'open_price', 'high_price', 'low_price', 'close_price', 'volume', 'amount', 'change_rate']
+
+# 每条 DELETE 语句的ID数，避免超出数据库的参数个数限制
+DELETE_BATCH = 900
+
+
+class Command(BaseCommand):
+    help = '把超出保留期的历史日线压缩到冷存储并从数据库删除'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hot-days', type=int, default=None, help='数据库中保留的天数，默认 PRICE_HOT_DAYS')
+        parser.add_argument('--symbols', nargs='*', help='只压缩指定股票')
+        parser.add_argument('--dry-run', action='store_true', help='只统计待压缩的行数，不写入')
+        parser.add_argument('--vacuum', action='store_true', help='完成后整理数据库文件，释放空间（SQLite/PostgreSQL）')
+
+    def handle(self, *args, **options):
+        if options['hot_days'] is not None:
+            cutoff = date.today() - timedelta(days=options['hot_days'])
+        else:
+            cutoff = hot_cutoff()
+
+        stale = StockPrice.objects.filter(date__lt=cutoff)
+        if options['symbols']:
+            stale = stale.filter(stock__code__in=options['symbols'])
+        counts = dict(stale.order_by().values('stock_id').annotate(rows=Count('id')).values_list('stock_id', 'rows'))
+        self.stdout.write(f"早于 {cutoff} 的日线: {len(counts)} 只股票，{sum(counts.values())} 行")
+        if options['dry_run'] or not counts:
+            return
+
+        store = get_cold_store()
+        codes = dict(Stock.objects.filter(id__in=counts).values_list('id', 'code'))
+        started = time.perf_counter()
+        moved = 0
+        for index, (stock_id, code) in enumerate(sorted(codes.items(), key=lambda item: item[1]), 1):
+            with transaction.atomic():
+                # 锁定读出的记录，写入冷存储前不会被其他事务修改；之后插入的记录不在ID列表中，不会被删除
+                records = list(
+                    StockPrice.objects.select_for_update().filter(stock_id=stock_id, date__lt=cutoff)
+                    .order_by('date').values_list('id', *COLUMNS)
+                )
+                if not records:
+                    continue
+                # 先写冷存储再删除，删除失败时同一日期两层都有，查询以数据库为准
+                store.write(code, [row[1:] for row in records])
+                ids = [row[0] for row in records]
+                for start in range(0, len(ids), DELETE_BATCH):
+                    StockPrice.objects.filter(id__in=ids[start:start + DELETE_BATCH]).delete()
+            moved += len(records)
+            if index % 500 == 0:
+                self.stdout.write(f"  进度 {index}/{len(codes)}，已压缩 {moved} 行")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"压缩 {moved} 行到 {store.directory}，耗时 {elapsed:.1f}s"
+        ))
+
+        if options['vacuum']:
+            self._vacuum()
+
+    def _vacuum(self):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.stdout.write(f"{connection.vendor} 不支持 --vacuum，跳过")
+            return
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM')
+        self.stdout.write('数据库整理完成')
@@ -0,0 +1,133 @@
+"""
+导出历史价格表
+
+按市场（可再按股票细分为多个分片）并行导出，每个分片用流式游标分块读取，
+内存占用只与 --chunk-size 和单只股票的日线条数有关，与表的大小无关；导出市场的股票基本信息一并写入 stocks.json
+
+已由 compact_prices 压缩到冷存储的早期日线一并导出：每只股票先写冷数据再写数据库中的数据，
+同一日期两层都有时以数据库为准（与 cold_storage.load_prices 一致）。导入后全部写入数据库，可再运行 compact_prices
+
+示例:
+    python manage.py export_prices --output /data/prices
+    python manage.py export_prices --output /data/prices --format parquet --shards 4 --workers 8
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import groupby, islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models.functions import Mod
+
+from stock_app.models import Stock, StockPrice
+from stock_app.registry import get_cold_store
+from stock_app.price_archive import (
+    COLUMNS, FORMAT_CSV, FORMAT_PARQUET, PARQUET_AVAILABLE, STOCK_FIELDS, STOCKS_NAME,
+    open_writer, shard_filename, write_manifest, write_stocks,
+)
+
+
+class Command(BaseCommand):
+    help = '将历史价格表分片导出为压缩的CSV或Parquet文件'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', required=True, help='导出目录')
+        parser.add_argument('--format', choices=[FORMAT_CSV, FORMAT_PARQUET], default=FORMAT_CSV)
+        parser.add_argument('--market', nargs='*', help='只导出指定市场，默认全部')
+        parser.add_argument('--shards', type=int, default=1, help='每个市场按股票拆分的分片数')
+        parser.add_argument('--workers', type=int, default=4, help='并行导出的线程数')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='每次从数据库读取的行数')
+
+    def handle(self, *args, **options):
+        fmt = options['format']
+        if fmt == FORMAT_PARQUET and not PARQUET_AVAILABLE:
+            raise CommandError('Parquet格式需要安装pyarrow')
+
+        directory = Path(options['output'])
+        directory.mkdir(parents=True, exist_ok=True)
+
+        markets = options['market'] or list(
+            Stock.objects.order_by('market').values_list('market', flat=True).distinct()
+        )
+        tasks = [(market, shard) for market in markets for shard in range(options['shards'])]
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            shards = list(executor.map(
+                lambda task: self._export_shard(directory, fmt, *task, options['shards'], options['chunk_size']),
+                tasks
+            ))
+
+        total = sum(shard['rows'] for shard in shards)
+        write_stocks(directory, Stock.objects.filter(market__in=markets).order_by('code').values(*STOCK_FIELDS))
+        write_manifest(directory, {
+            'format': fmt,
+            'columns': COLUMNS,
+            'exported_at': datetime.now().isoformat(timespec='seconds'),
+            'rows': total,
+            'stocks': STOCKS_NAME,
+            'shards': shards,
+        })
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"导出 {total} 行到 {len(shards)} 个分片，耗时 {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} 行/秒): {directory}"
+        ))
+
+    def _export_shard(self, directory: Path, fmt: str, market: str, shard: int, shards: int,
+                      chunk_size: int) -> dict:
+        """导出一个分片，在工作线程中执行（每个线程使用独立的数据库连接）"""
+        try:
+            stocks = Stock.objects.filter(market=market)
+            queryset = StockPrice.objects.filter(stock__market=market)
+            if shards > 1:
+                stocks = stocks.annotate(shard=Mod('id', shards)).filter(shard=shard)
+                queryset = queryset.annotate(shard=Mod('stock_id', shards)).filter(shard=shard)
+            hot = queryset.order_by('stock_id', 'date').values_list(
+                'stock_id', 'stock__code', 'date', 'open_price', 'high_price', 'low_price', 'close_price',
+                'volume', 'amount', 'change_rate'
+            ).iterator(chunk_size=chunk_size)
+            rows = self._merge_cold(stocks.order_by('id').values_list('id', 'code'), hot)
+
+            filename = shard_filename(market, shard, fmt)
+            writer = open_writer(directory / filename, fmt)
+            count = 0
+            try:
+                while True:
+                    chunk = list(islice(rows, chunk_size))
+                    if not chunk:
+                        break
+                    writer.write_rows(chunk)
+                    count += len(chunk)
+            finally:
+                writer.close()
+
+            self.stdout.write(f"  {filename}: {count} 行")
+            return {'file': filename, 'market': market, 'shard': shard, 'rows': count}
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _merge_cold(stocks, hot):
+        """
+        按股票ID顺序合并冷热两层的日线，每只股票的行按日期升序
+        参数: stocks - (id, code)，hot - (stock_id, code, date, ...)，两者都按股票ID升序
+        """
+        store = get_cold_store()
+        groups = groupby(hot, key=lambda row: row[0])
+        group = next(groups, None)
+        for stock_id, code in stocks:
+            rows = []
+            if group is not None and group[0] == stock_id:
+                rows = [row[1:] for row in group[1]]
+                group = next(groups, None)
+            cold = store.read_rows(code, exclude=[row[1] for row in rows])
+            if cold:
+                rows.extend(
+                    (code, row['date'], row['open_price'], row['high_price'], row['low_price'], row['close_price'],
+                     row['volume'], row['amount'], row['change_rate'])
+                    for row in cold
+                )
+                rows.sort(key=lambda row: row[1])
+            yield from rows
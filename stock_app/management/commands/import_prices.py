@@ -0,0 +1,114 @@
+"""
+导入 export_prices 导出的历史价格归档
+
+各分片并行读取，分批 bulk_create 写入，每批一个事务；本库没有的股票按归档中的基本信息（stocks.json）创建，
+归档中也没有基本信息的股票（旧版本导出的归档）默认报错，--create-unknown 时以代码作为名称创建
+
+示例:
+    python manage.py import_prices --input /data/prices
+    python manage.py import_prices --input /data/prices --conflicts update --workers 4
+    python manage.py import_prices --input /data/old_prices --create-unknown
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from stock_app.models import Stock, StockPrice
+from stock_app.price_archive import COLUMNS, iter_batches, read_manifest, read_stocks
+
+UPDATE_FIELDS = [name for name in COLUMNS if name not in ('stock_code', 'date')]
+
+
+class Command(BaseCommand):
+    help = '从压缩的CSV或Parquet归档导入历史价格表'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--input', required=True, help='归档目录（包含manifest.json）')
+        parser.add_argument('--workers', type=int, default=4, help='并行导入的线程数（SQLite固定为1）')
+        parser.add_argument('--batch-size', type=int, default=5000, help='每批写入的行数')
+        parser.add_argument('--conflicts', choices=['ignore', 'update'], default='ignore',
+                            help='已存在（同一股票同一日期）的记录: ignore 跳过, update 覆盖')
+        parser.add_argument('--create-unknown', action='store_true',
+                            help='归档中没有基本信息的股票以代码作为名称创建（默认报错）')
+
+    def handle(self, *args, **options):
+        directory = Path(options['input'])
+        try:
+            manifest = read_manifest(directory)
+        except FileNotFoundError:
+            raise CommandError(f"{directory} 中没有 manifest.json")
+
+        workers = max(1, options['workers'])
+        if connection.vendor == 'sqlite' and workers > 1:
+            # SQLite同一时间只允许一个写事务，多线程写入只会互相等待锁
+            self.stdout.write('SQLite不支持并发写入，使用单线程导入')
+            workers = 1
+
+        self._stock_ids = dict(Stock.objects.values_list('code', 'id'))
+        self._stock_info = read_stocks(directory)
+        self._create_unknown = options['create_unknown']
+        self._stock_lock = threading.Lock()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            counts = list(executor.map(
+                lambda shard: self._import_shard(directory, manifest['format'], shard, options),
+                manifest['shards']
+            ))
+
+        total = sum(counts)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"导入 {total} 行，耗时 {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} 行/秒)"
+        ))
+
+    def _resolve_stocks(self, codes, market: str):
+        """返回代码到股票ID的映射，缺失的股票按归档中的基本信息先创建"""
+        missing = {code for code in codes if code not in self._stock_ids}
+        if missing:
+            with self._stock_lock:
+                missing = sorted(code for code in missing if code not in self._stock_ids)
+                unknown = [code for code in missing if code not in self._stock_info]
+                if unknown and not self._create_unknown:
+                    raise CommandError(
+                        f"归档中没有股票 {', '.join(unknown[:10])} 等 {len(unknown)} 只股票的基本信息，"
+                        f"先同步股票列表或使用 --create-unknown"
+                    )
+                if missing:
+                    Stock.objects.bulk_create(
+                        [Stock(**self._stock_info.get(code, {'code': code, 'name': code, 'market': market}))
+                         for code in missing],
+                        ignore_conflicts=True
+                    )
+                    self._stock_ids.update(Stock.objects.filter(code__in=missing).values_list('code', 'id'))
+        return self._stock_ids
+
+    def _import_shard(self, directory: Path, fmt: str, shard: dict, options) -> int:
+        """导入一个分片，在工作线程中执行"""
+        conflict_options = {'ignore_conflicts': True}
+        if options['conflicts'] == 'update':
+            conflict_options = {
+                'update_conflicts': True,
+                'unique_fields': ['stock', 'date'],
+                'update_fields': UPDATE_FIELDS,
+            }
+
+        count = 0
+        try:
+            for batch in iter_batches(directory / shard['file'], fmt, options['batch_size']):
+                stock_ids = self._resolve_stocks({row['stock_code'] for row in batch}, shard['market'])
+                objects = [
+                    StockPrice(stock_id=stock_ids[row.pop('stock_code')], **row)
+                    for row in batch
+                ]
+                with transaction.atomic():
+                    StockPrice.objects.bulk_create(objects, batch_size=1000, **conflict_options)
+                count += len(objects)
+            self.stdout.write(f"  {shard['file']}: {count} 行")
+            return count
+        finally:
+            connection.close()
@@ -0,0 +1,67 @@
+"""
+查看请求采样分析结果
+
+示例:
+    python manage.py profiles                                      # 列出最近的分析结果
+    python manage.py profiles --view StockViewSet.history --top 20  # 合并某视图的结果，列出热点函数
+    python manage.py profiles --view SimpleHistoryView --output history.folded
+    flamegraph.pl history.folded > history.svg                      # 或拖入 https://www.speedscope.app
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from stock_app.profiling import ProfileStore, parse_profile_name, read_folded, strip_line_numbers, top_frames
+
+
+class Command(BaseCommand):
+    help = '列出、合并请求采样分析结果，输出火焰图可用的折叠栈'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', help='只处理指定视图，如 StockViewSet.history')
+        parser.add_argument('--last', type=int, default=0, help='只处理最近N个结果')
+        parser.add_argument('--top', type=int, default=0, help='列出合并后自身样本最多的N个函数')
+        parser.add_argument('--output', help='把合并后的折叠栈写入文件')
+        parser.add_argument('--lines', action='store_true', help='保留帧中的行号（默认按函数合并）')
+        parser.add_argument('--clear', action='store_true', help='删除选中的结果文件')
+
+    def handle(self, *args, **options):
+        store = ProfileStore(
+            getattr(settings, 'PROFILING_DIR', settings.BASE_DIR / 'profiles'),
+            getattr(settings, 'PROFILING_MAX_FILES', 200),
+        )
+        files = store.list(options['view'])
+        if options['last']:
+            files = files[-options['last']:]
+
+        if not files:
+            self.stdout.write('没有分析结果（确认已开启 PROFILING_ENABLED 并有请求被采样）')
+            return
+
+        if options['clear']:
+            for path in files:
+                path.unlink()
+            self.stdout.write(self.style.SUCCESS(f"已删除 {len(files)} 个分析结果"))
+            return
+
+        if not options['top'] and not options['output']:
+            for path in files:
+                info = parse_profile_name(path)
+                self.stdout.write(f"{info['timestamp']}  {info['view']:<32} {info['elapsed']:>8}  {path.name}")
+            self.stdout.write(f"共 {len(files)} 个结果: {store.directory}")
+            return
+
+        samples = read_folded(files)
+        if not options['lines']:
+            samples = strip_line_numbers(samples)
+        total = sum(samples.values())
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                for stack, count in samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            self.stdout.write(self.style.SUCCESS(f"已合并 {len(files)} 个结果（{total} 个样本）: {options['output']}"))
+
+        if options['top']:
+            self.stdout.write(f"{'自身':>7} {'累计':>7}  函数（{len(files)} 个结果，{total} 个样本）")
+            for frame, own, cumulative in top_frames(samples, options['top']):
+                self.stdout.write(f"{own / total:7.1%} {cumulative / total:7.1%}  {frame}")
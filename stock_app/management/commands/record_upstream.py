@@ -0,0 +1,89 @@
+"""
+录制上游数据，供 AKSHARE_BACKEND=replay 回放
+
+示例:
+    python manage.py record_upstream --top 50
+    python manage.py record_upstream --source synthetic --symbols 000001 600519 --days 365
+    python manage.py record_upstream --top 50 --skip-sectors
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from stock_app.akshare_service import prefixed_symbol
+from stock_app.backends import BACKEND_AKSHARE, BACKEND_SYNTHETIC, create_fetch_backend
+from stock_app.replay import RecordingBackend
+
+INDEX_SYMBOLS = ['sh000001', 'sz399001']
+
+
+class Command(BaseCommand):
+    help = '录制AKShare返回的行情数据，用于离线回放和压测'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', choices=[BACKEND_AKSHARE, BACKEND_SYNTHETIC], default=BACKEND_AKSHARE,
+                            help='数据来源，synthetic 使用合成市场（无需网络）')
+        parser.add_argument('--output', default=None, help='录制目录，默认 AKSHARE_REPLAY_DIR')
+        parser.add_argument('--symbols', nargs='*', default=[], help='录制日线、复权因子和盘口行情的股票代码')
+        parser.add_argument('--top', type=int, default=20, help='未指定代码时录制成交额最大的前N只股票的日线')
+        parser.add_argument('--days', type=int, default=365, help='日线的日期范围（天）')
+        parser.add_argument('--skip-sectors', action='store_true',
+                            help='不录制行业板块和 SECTOR_INDICES 指数的成分股')
+
+    def handle(self, *args, **options):
+        upstream = create_fetch_backend(options['source'])
+        if upstream is None:
+            raise CommandError('AKShare不可用，可使用 --source synthetic 录制合成数据')
+
+        directory = options['output'] or settings.AKSHARE_REPLAY_DIR
+        backend = RecordingBackend(upstream, directory)
+
+        spot = backend.stock_zh_a_spot_em()
+        for symbol in INDEX_SYMBOLS:
+            backend.stock_zh_index_spot_em(symbol=symbol)
+        backend.stock_info_sh_name_code(symbol='主板A股')
+        self.stdout.write(f"已录制实时行情 {len(spot)} 只股票及 {len(INDEX_SYMBOLS)} 个指数")
+        trade_dates = backend.tool_trade_date_hist_sina()
+        self.stdout.write(f"已录制交易日历 {len(trade_dates)} 个交易日")
+        if not options['skip_sectors']:
+            self._record_sectors(backend)
+
+        symbols = options['symbols']
+        if not symbols:
+            symbols = spot.sort_values('成交额', ascending=False)['代码'].head(options['top']).tolist()
+
+        # 录制较长的日期范围，回放时可从中截取任意子区间
+        end_date = datetime.now().strftime('%Y%m%d')
+        start_date = (datetime.now() - timedelta(days=options['days'])).strftime('%Y%m%d')
+        for symbol in symbols:
+            try:
+                frame = backend.stock_zh_a_hist(
+                    symbol=symbol, period='daily', start_date=start_date, end_date=end_date, adjust=''
+                )
+                factors = backend.stock_zh_a_daily(symbol=prefixed_symbol(symbol), adjust='hfq-factor')
+                backend.stock_bid_ask_em(symbol=symbol)
+                self.stdout.write(f"  {symbol}: {len(frame)} 条日线，{len(factors)} 条复权因子，盘口行情")
+            except Exception as e:
+                self.stderr.write(f"  {symbol}: 录制失败 {str(e)}")
+
+        self.stdout.write(self.style.SUCCESS(f"录制完成: {directory}"))
+
+    def _record_sectors(self, backend):
+        """录制 sync_sectors 使用的行业板块列表、各板块成分股和指数成分股"""
+        boards = backend.stock_board_industry_name_em()
+        failed = 0
+        for name in boards['板块名称'].tolist():
+            try:
+                backend.stock_board_industry_cons_em(symbol=name)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"  {name}: 录制失败 {str(e)}")
+        indices = getattr(settings, 'SECTOR_INDICES', [])
+        for symbol in indices:
+            try:
+                backend.index_stock_cons_csindex(symbol=symbol)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"  指数 {symbol}: 录制失败 {str(e)}")
+        self.stdout.write(f"已录制 {len(boards)} 个行业板块及 {len(indices)} 个指数的成分股（失败 {failed} 个）")
@@ -0,0 +1,164 @@
+"""
+按需求刷新实时行情
+
+按接口访问量和涨跌幅给每只股票分配刷新间隔（见 refresh_scheduler.py），在 REFRESH_BUDGET 的全局请求预算内
+逐只获取行情写入 StockRealtime：热门股票保持在 REALTIME_MAX_AGE 内，接口直接读数据库；冷门股票按最长间隔慢慢刷新。
+休市期间不请求上游，休眠到下次开市。
+
+示例:
+    python manage.py refresh_quotes
+    python manage.py refresh_quotes --budget 10 --workers 8
+    python manage.py refresh_quotes --once --symbols 600519 000001     # 立即刷新指定股票后退出
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from stock_app.models import Stock, StockRealtime
+from stock_app.ratelimit import TokenBucket
+from stock_app.refresh_scheduler import RefreshScheduler, get_demand
+from stock_app.registry import get_akshare_service, get_trading_calendar
+
+REALTIME_FIELDS = ['current_price', 'change_rate', 'change_amount', 'volume', 'amount',
+                   'high_price', 'low_price', 'open_price', 'pre_close']
+
+# 休市期间单次休眠的最长时间（秒），之后重新检查交易日历
+MAX_IDLE_SLEEP = 600
+
+
+class Command(BaseCommand):
+    help = '按访问量和波动分配刷新频率，在全局请求预算内刷新实时行情'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--symbols', nargs='*', help='只刷新指定股票，默认数据库中的全部股票')
+        parser.add_argument('--budget', type=float, default=None, help='每秒最多的上游请求数，默认 REFRESH_BUDGET')
+        parser.add_argument('--workers', type=int, default=4, help='并发获取的线程数')
+        parser.add_argument('--replan', type=float, default=60, help='重新读取访问量、分配刷新间隔的周期（秒）')
+        parser.add_argument('--always', action='store_true', help='不判断交易时段，一直刷新')
+        parser.add_argument('--once', action='store_true', help='每只股票刷新一次后退出')
+
+    def handle(self, *args, **options):
+        stocks = Stock.objects.order_by('code')
+        if options['symbols']:
+            stocks = stocks.filter(code__in=options['symbols'])
+        self.stock_ids = dict(stocks.values_list('code', 'id'))
+        if not self.stock_ids:
+            self.stderr.write('没有需要刷新的股票')
+            return
+
+        budget = options['budget'] or getattr(settings, 'REFRESH_BUDGET', 5)
+        scheduler = RefreshScheduler(
+            self.stock_ids, budget,
+            min_interval=getattr(settings, 'REFRESH_MIN_INTERVAL', 10),
+            max_interval=getattr(settings, 'REFRESH_MAX_INTERVAL', 1800),
+        )
+        # 已有的实时行情作为上次刷新的时间和涨跌幅，重启后不必全部重新获取
+        for code, updated_at, change_rate in StockRealtime.objects.filter(
+                stock_id__in=self.stock_ids.values()).values_list('stock__code', 'updated_at', 'change_rate'):
+            scheduler.refreshed_at[code] = updated_at.timestamp()
+            scheduler.change_rate[code] = float(change_rate)
+        if options['once']:
+            scheduler.refreshed_at.clear()
+
+        self.service = get_akshare_service()
+        self.bucket = TokenBucket(budget)
+        self.stdout.write(f"刷新 {len(scheduler)} 只股票的实时行情，预算 {budget:g} 次/秒")
+
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            try:
+                if options['once']:
+                    self._run_once(scheduler, executor)
+                else:
+                    self._run(scheduler, executor, options)
+            except KeyboardInterrupt:
+                self.stdout.write('停止刷新')
+
+    def _plan(self, scheduler):
+        scheduler.set_demand(get_demand())
+        scheduler.plan(time.time())
+        top = ', '.join(f"{code}({interval:.0f}s)" for code, _, interval in scheduler.summary())
+        self.stdout.write(f"{timezone.localtime():%H:%M:%S} 重新分配刷新间隔，权重最高: {top}")
+
+    def _run_once(self, scheduler, executor):
+        self._plan(scheduler)
+        pending = {}
+        while True:
+            # 不等到期时间，按到期顺序全部提交，由令牌桶限速
+            code = scheduler.pop_due(float('inf'))
+            if code is None:
+                break
+            pending[self._submit(executor, code)] = code
+        refreshed = 0
+        for future, code in pending.items():
+            refreshed += self._finish(scheduler, code, future)
+        self.stdout.write(self.style.SUCCESS(f"刷新 {refreshed}/{len(scheduler)} 只股票"))
+
+    def _run(self, scheduler, executor, options):
+        workers = max(1, options['workers'])
+        pending = {}
+        planned_at = None
+        refreshed = 0
+        while True:
+            now = time.time()
+            calendar = get_trading_calendar()
+            if not options['always'] and not calendar.is_open(timezone.now()):
+                # 休市：等待进行中的请求完成后休眠到下次开市，开市后重新分配（积压的股票按权重排队）
+                for future, code in pending.items():
+                    refreshed += self._finish(scheduler, code, future)
+                pending.clear()
+                planned_at = None
+                idle = (calendar.next_open(timezone.now()) - timezone.now()).total_seconds()
+                time.sleep(min(max(idle, 1.0), MAX_IDLE_SLEEP))
+                continue
+
+            if planned_at is None or now - planned_at >= options['replan']:
+                self._plan(scheduler)
+                planned_at = now
+                if refreshed:
+                    self.stdout.write(f"  已刷新 {refreshed} 次")
+
+            # 令牌桶限制总速率，进行中的请求数不超过线程数
+            while len(pending) < workers:
+                next_due = scheduler.next_due()
+                if next_due is None or next_due > time.time() or not self.bucket.try_acquire():
+                    break
+                code = scheduler.pop_due(time.time())
+                pending[self._submit(executor, code, throttle=False)] = code
+
+            next_due = scheduler.next_due()
+            timeout = min(max((next_due or now + 1.0) - time.time(), 0.05), 1.0)
+            if pending:
+                done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    refreshed += self._finish(scheduler, pending.pop(future), future)
+            else:
+                time.sleep(timeout)
+
+    def _submit(self, executor, code, throttle: bool = True):
+        def fetch():
+            if throttle:
+                self.bucket.acquire()
+            return self.service.get_stock_quote(code)
+        return executor.submit(fetch)
+
+    def _finish(self, scheduler, code, future) -> int:
+        """写入一只股票的刷新结果，返回成功刷新的数量"""
+        now = time.time()
+        try:
+            quote = future.result()
+        except Exception as e:
+            self.stderr.write(f"{code} 获取失败: {str(e)}")
+            scheduler.requeue(code, now + scheduler.min_interval)
+            return 0
+        if not quote:
+            scheduler.observe(code, None, now)
+            return 0
+        StockRealtime.objects.update_or_create(
+            stock_id=self.stock_ids[code],
+            defaults={field: quote[field] for field in REALTIME_FIELDS},
+        )
+        scheduler.observe(code, quote['change_rate'], now)
+        return 1
@@ -0,0 +1,65 @@
+"""
+同步复权因子
+
+多线程从上游获取每只股票的后复权因子序列，由主线程逐只替换数据库中的记录（见 adjust.py）。
+因子只在除权除息后变化，建议每天收盘后运行一次；日线本身不需要重新获取
+
+示例:
+    python manage.py sync_adjust_factors
+    python manage.py sync_adjust_factors --symbols 000001 600519
+    python manage.py sync_adjust_factors --workers 16 --rate 10
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from stock_app.adjust import save_factors
+from stock_app.models import Stock
+from stock_app.ratelimit import TokenBucket
+from stock_app.registry import get_akshare_service
+
+
+class Command(BaseCommand):
+    help = '从上游同步全部（或指定）股票的后复权因子'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--symbols', nargs='*', help='只同步指定股票，默认数据库中的全部股票')
+        parser.add_argument('--workers', type=int, default=8, help='并发获取的线程数')
+        parser.add_argument('--rate', type=float, default=5.0, help='每秒最多的上游调用数，0为不限速')
+
+    def handle(self, *args, **options):
+        stocks = Stock.objects.order_by('code')
+        if options['symbols']:
+            stocks = stocks.filter(code__in=options['symbols'])
+        stocks = list(stocks)
+        self.stdout.write(f"同步 {len(stocks)} 只股票的复权因子")
+
+        service = get_akshare_service()
+        bucket = TokenBucket(options['rate']) if options['rate'] > 0 else None
+
+        def fetch(stock):
+            if bucket is not None:
+                bucket.acquire()
+            return service.get_adjust_factors(stock.code)
+
+        started = time.perf_counter()
+        synced = failed = rows = 0
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            futures = [(stock, executor.submit(fetch, stock)) for stock in stocks]
+            for index, (stock, future) in enumerate(futures, 1):
+                try:
+                    factors = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"{stock.code} 获取失败: {str(e)}")
+                    continue
+                rows += save_factors(stock, factors)
+                synced += 1
+                if index % 500 == 0:
+                    self.stdout.write(f"  进度 {index}/{len(stocks)}")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"完成 {synced} 只（失败 {failed} 只），共 {rows} 条复权因子，耗时 {elapsed:.1f}s"
+        ))
@@ -0,0 +1,128 @@
+"""
+同步板块成分股
+
+多线程从上游获取全部行业板块和 SECTOR_INDICES 中各指数的成分股，由主线程按板块替换 SectorMember 中的记录，
+同时把行业名称写入 Stock.industry。获取失败的板块保留原有成分股；上游已不存在的行业板块被删除。
+成分股变化不频繁，建议每天收盘后运行一次
+
+示例:
+    python manage.py sync_sectors
+    python manage.py sync_sectors --kind index --indices 000300 000905
+    python manage.py sync_sectors --workers 8 --rate 5
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from stock_app.models import SectorMember, Stock
+from stock_app.ratelimit import TokenBucket
+from stock_app.registry import get_akshare_service
+from stock_app.sectors import bump_version
+
+
+class Command(BaseCommand):
+    help = '从上游同步行业板块和指数的成分股'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=['all', SectorMember.KIND_INDUSTRY, SectorMember.KIND_INDEX],
+                            default='all', help='只同步行业或指数，默认全部')
+        parser.add_argument('--indices', nargs='*', help='同步的指数代码，默认 SECTOR_INDICES')
+        parser.add_argument('--workers', type=int, default=4, help='并发获取的线程数')
+        parser.add_argument('--rate', type=float, default=5.0, help='每秒最多的上游调用数，0为不限速')
+
+    def handle(self, *args, **options):
+        self.service = get_akshare_service()
+        self.bucket = TokenBucket(options['rate']) if options['rate'] > 0 else None
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            self.executor = executor
+            if options['kind'] in ('all', SectorMember.KIND_INDUSTRY):
+                self._sync_industries()
+            if options['kind'] in ('all', SectorMember.KIND_INDEX):
+                self._sync_indices(options['indices'] or getattr(settings, 'SECTOR_INDICES', []))
+
+        bump_version()
+        self.stdout.write(self.style.SUCCESS(f"完成，耗时 {time.perf_counter() - started:.1f}s"))
+
+    def _call(self, func, *args):
+        if self.bucket is not None:
+            self.bucket.acquire()
+        return func(*args)
+
+    def _sync_industries(self):
+        try:
+            boards = self.service.get_industry_boards()
+        except Exception as e:
+            self.stderr.write(f"获取行业板块列表失败: {str(e)}")
+            return
+        if not boards:
+            self.stderr.write('上游没有返回行业板块，保留原有数据')
+            return
+        self.stdout.write(f"同步 {len(boards)} 个行业板块")
+
+        futures = [(board, self.executor.submit(self._call, self.service.get_industry_constituents, board['name']))
+                   for board in boards]
+        synced = failed = rows = 0
+        industry_of = {}
+        for board, future in futures:
+            try:
+                stocks = future.result()
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"{board['name']} 获取失败: {str(e)}")
+                continue
+            rows += self._replace(SectorMember.KIND_INDUSTRY, board['code'], board['name'], stocks)
+            for stock in stocks:
+                industry_of.setdefault(stock['code'], board['name'])
+            synced += 1
+
+        removed, _ = SectorMember.objects.filter(kind=SectorMember.KIND_INDUSTRY).exclude(
+            sector_code__in=[board['code'] for board in boards]).delete()
+        updated = self._update_stock_industry(industry_of)
+        self.stdout.write(f"  行业 {synced} 个（失败 {failed} 个），成分股 {rows} 条，删除 {removed} 条，"
+                          f"更新 {updated} 只股票的所属行业")
+
+    def _sync_indices(self, indices):
+        if not indices:
+            return
+        self.stdout.write(f"同步 {len(indices)} 个指数")
+        futures = [(symbol, self.executor.submit(self._call, self.service.get_index_constituents, symbol))
+                   for symbol in indices]
+        for symbol, future in futures:
+            try:
+                index = future.result()
+            except Exception as e:
+                self.stderr.write(f"指数 {symbol} 获取失败: {str(e)}")
+                continue
+            if not index['stocks']:
+                self.stderr.write(f"指数 {symbol} 没有成分股，保留原有数据")
+                continue
+            rows = self._replace(SectorMember.KIND_INDEX, symbol, index['name'] or symbol, index['stocks'])
+            self.stdout.write(f"  {symbol} {index['name']}: {rows} 只成分股")
+
+    @staticmethod
+    def _replace(kind, sector_code, sector_name, stocks) -> int:
+        """替换一个板块的全部成分股，返回条数"""
+        objects = [
+            SectorMember(kind=kind, sector_code=sector_code, sector_name=sector_name,
+                         stock_code=stock['code'], stock_name=stock['name'])
+            for stock in {stock['code']: stock for stock in stocks}.values()
+        ]
+        with transaction.atomic():
+            SectorMember.objects.filter(kind=kind, sector_code=sector_code).delete()
+            SectorMember.objects.bulk_create(objects, batch_size=1000)
+        return len(objects)
+
+    @staticmethod
+    def _update_stock_industry(industry_of) -> int:
+        """把行业名称写入 Stock.industry，只更新有变化的股票（不在任何已获取板块中的股票保持不变）"""
+        stocks = [stock for stock in Stock.objects.only('id', 'code', 'industry')
+                  if stock.code in industry_of and stock.industry != industry_of[stock.code]]
+        for stock in stocks:
+            stock.industry = industry_of[stock.code]
+        Stock.objects.bulk_update(stocks, ['industry'], batch_size=500)
+        return len(stocks)
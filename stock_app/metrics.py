@@ -0,0 +1,311 @@
+"""
+性能指标
+- 进程内的计数器和直方图，以Prometheus文本格式在 /metrics 导出
+- 按请求汇总各阶段（上游、数据库、序列化）耗时，由 TimingMiddleware 写入 Server-Timing 响应头
+
+指标按进程统计，多worker部署时由Prometheus分别抓取各worker后汇总
+"""
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.http import HttpResponse
+
+# 默认直方图分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """指标基类，按标签值分别保存"""
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    """只增不减的计数器"""
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def expose(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(Metric):
+    """累积分桶直方图"""
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # 每个桶只记录落在该桶内的次数，导出时再累加
+                state = self._values[key] = {'buckets': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+            state['buckets'][index] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state['count'] if state else 0
+
+    def expose(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            items = sorted((key, dict(state, buckets=list(state['buckets']))) for key, state in self._values.items())
+        for key, state in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), state['buckets']):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                labels = _format_labels(self.labelnames, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state['count']}")
+        return lines
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector):
+        """注册导出时才计算的指标，collector() 返回Prometheus文本行"""
+        self._collectors.append(collector)
+
+    def expose(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.expose())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        for metric in self._metrics.values():
+            metric.clear()
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.histogram(
+    'stock_http_request_duration_seconds', '请求处理耗时', ('view', 'method', 'status'))
+UPSTREAM_DURATION = REGISTRY.histogram(
+    'stock_upstream_request_duration_seconds', '单次上游调用耗时（含失败）', ('function', 'outcome'))
+UPSTREAM_RETRIES = REGISTRY.counter(
+    'stock_upstream_retries_total', '上游调用重试次数', ('function',))
+UPSTREAM_FAILURES = REGISTRY.counter(
+    'stock_upstream_failures_total', '重试耗尽后仍失败的上游调用数', ('function',))
+DB_QUERY_DURATION = REGISTRY.histogram(
+    'stock_db_query_duration_seconds', '数据库查询耗时', ('alias',),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0))
+CACHE_REQUESTS = REGISTRY.counter(
+    'stock_cache_requests_total', '缓存查询次数', ('cache', 'result'))
+SERIALIZE_DURATION = REGISTRY.histogram(
+    'stock_serialize_duration_seconds', '序列化耗时', ('serializer',))
+ROWS_SERIALIZED = REGISTRY.counter(
+    'stock_rows_serialized_total', '序列化的记录数', ('serializer',))
+
+
+def _singleflight_collector() -> List[str]:
+    """请求合并统计：被合并的调用相当于命中了进行中的请求"""
+    from .singleflight import all_stats
+
+    calls = Counter('stock_singleflight_calls_total', '合并器收到的调用数', ('flight', 'function'))
+    coalesced = Counter('stock_singleflight_coalesced_total', '被合并（未实际执行）的调用数', ('flight', 'function'))
+    for flight, stats in all_stats().items():
+        for function, counter in stats.items():
+            calls.inc(counter['calls'], flight=flight, function=function)
+            coalesced.inc(counter['coalesced'], flight=flight, function=function)
+    return calls.expose() + coalesced.expose()
+
+
+REGISTRY.add_collector(_singleflight_collector)
+
+
+def _snapshot_collector() -> List[str]:
+    """本进程持有的全市场快照字节数（共享快照为映射的文件大小，物理内存由各worker共用）和映射的版本"""
+    module = sys.modules.get('stock_app.spot_snapshot')
+    if module is None:
+        return []
+    name = 'stock_spot_snapshot_bytes'
+    lines = [f"# HELP {name} 本进程持有的全市场快照字节数", f"# TYPE {name} gauge"]
+    for backing, size in module.snapshot_memory().items():
+        lines.append(f"{name}{_format_labels(('backing',), (backing,))} {size}")
+    name = 'stock_spot_snapshot_version'
+    lines += [f"# HELP {name} 本进程映射的共享快照版本号", f"# TYPE {name} gauge",
+              f"{name} {module.shared_version()}"]
+    return lines
+
+
+REGISTRY.add_collector(_snapshot_collector)
+
+
+# ---------------------------------------------------------------------------
+# 按请求汇总的阶段耗时
+# ---------------------------------------------------------------------------
+
+class RequestTimer:
+    """一次请求内各阶段的累计耗时和次数"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float):
+        # 合并器可能在其他线程中执行上游调用，这里加锁
+        with self._lock:
+            entry = self.phases.setdefault(phase, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def server_timing(self) -> str:
+        """Server-Timing 响应头，耗时单位为毫秒"""
+        parts = [
+            f'{phase};dur={seconds * 1000:.1f};desc="n={count}"'
+            for phase, (seconds, count) in self.phases.items()
+        ]
+        parts.append(f'total;dur={(time.perf_counter() - self.started) * 1000:.1f}')
+        return ', '.join(parts)
+
+
+_current_timer: ContextVar[Optional[RequestTimer]] = ContextVar('stock_request_timer', default=None)
+
+
+def metrics_enabled() -> bool:
+    return getattr(settings, 'METRICS_ENABLED', True)
+
+
+def start_request() -> Tuple[RequestTimer, object]:
+    """开始统计当前请求，返回（计时器, 用于结束时恢复的token）"""
+    timer = RequestTimer()
+    return timer, _current_timer.set(timer)
+
+
+def end_request(token):
+    _current_timer.reset(token)
+
+
+def record_phase(phase: str, seconds: float):
+    """把耗时计入当前请求的阶段（不在请求中时忽略）"""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.add(phase, seconds)
+
+
+def record_upstream(function: str, seconds: float, success: bool):
+    UPSTREAM_DURATION.observe(seconds, function=function, outcome='success' if success else 'error')
+    record_phase('upstream', seconds)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def record_serialization(serializer: str, seconds: float, rows: int):
+    SERIALIZE_DURATION.observe(seconds, serializer=serializer)
+    ROWS_SERIALIZED.inc(rows, serializer=serializer)
+    record_phase('serialize', seconds)
+
+
+@contextmanager
+def time_serialization(serializer: str, rows: int = 1):
+    """统计一次序列化的耗时和记录数"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_serialization(serializer, time.perf_counter() - start, rows)
+
+
+def query_timer(execute, sql, params, many, context):
+    """数据库执行包装器（connection.execute_wrapper），统计每条查询的耗时"""
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        DB_QUERY_DURATION.observe(elapsed, alias=context['connection'].alias)
+        record_phase('db', elapsed)
+
+
+def install_query_timer(sender=None, connection=None, **kwargs):
+    """connection_created 信号处理：为新建的数据库连接安装查询计时"""
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
+
+
+def metrics_view(request):
+    """Prometheus抓取接口"""
+    return HttpResponse(REGISTRY.expose(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,267 @@
+"""
+自定义中间件
+"""
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+    brotli = None
+
+import re
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+from . import db_router, metrics, refresh_scheduler
+
+_re_accepts_brotli = re.compile(r'\bbr\b')
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    响应压缩中间件
+    客户端支持且安装了brotli时使用brotli压缩，否则退回Django自带的gzip压缩
+    """
+    # 小于该长度的响应不压缩
+    min_length = 200
+    brotli_quality = 5
+
+    def process_response(self, request, response):
+        if (not BROTLI_AVAILABLE or response.streaming
+                or response.has_header('Content-Encoding')
+                or len(response.content) < self.min_length):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if not _re_accepts_brotli.search(accept_encoding):
+            return super().process_response(request, response)
+
+        compressed_content = brotli.compress(response.content, quality=self.brotli_quality)
+        if len(compressed_content) >= len(response.content):
+            return response
+
+        response.content = compressed_content
+        response.headers['Content-Length'] = str(len(response.content))
+
+        # 与GZipMiddleware一致，弱化ETag
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+
+        return response
+
+
+def view_name(request) -> str:
+    """
+    请求对应的视图名，用作指标标签
+    如 StockViewSet.history、StockSearchView；未匹配路由时为 unmatched
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    func = match.func
+    view_class = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+    if view_class is None:
+        return getattr(func, '__name__', match.view_name or 'unknown')
+    # DRF视图集的自定义动作
+    action = (getattr(func, 'actions', None) or {}).get(request.method.lower())
+    return f"{view_class.__name__}.{action}" if action else view_class.__name__
+
+
+class TimingMiddleware:
+    """
+    请求计时中间件
+    记录每个请求的耗时指标，并通过 Server-Timing 响应头返回上游、数据库、序列化各阶段的耗时，
+    可在浏览器开发者工具的 Timing 面板中查看
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = metrics.metrics_enabled()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        timer, token = metrics.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self._finish(request, response, timer)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        timer, token = metrics.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self._finish(request, response, timer)
+
+    @staticmethod
+    def _finish(request, response, timer):
+        metrics.REQUEST_DURATION.observe(
+            time.perf_counter() - timer.started,
+            view=view_name(request), method=request.method, status=response.status_code
+        )
+        response['Server-Timing'] = timer.server_timing()
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    请求采样分析中间件（PROFILING_ENABLED 开启时生效）
+    按 PROFILING_SAMPLE_RATE 随机采样，或对 PROFILING_TRUSTED_IPS 中带 X-Profile 请求头的请求采样，
+    结果按视图名保存为折叠栈文件，响应头 X-Profile-Id 返回文件名
+    异步视图采样的是事件循环线程，同一时间在该循环上运行的其他请求也会出现在栈中
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        from .profiling import RequestProfiler
+
+        self.get_response = get_response
+        self.profiler = RequestProfiler()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        sampler = self.profiler.start(threading.get_ident()) if self.profiler.wants(request) else None
+        if sampler is None:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            path = self.profiler.finish(sampler, view_name(request), time.perf_counter() - start)
+        return self._annotate(response, path)
+
+    async def __acall__(self, request):
+        sampler = self.profiler.start(threading.get_ident()) if self.profiler.wants(request) else None
+        if sampler is None:
+            return await self.get_response(request)
+
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            path = self.profiler.finish(sampler, view_name(request), time.perf_counter() - start)
+        return self._annotate(response, path)
+
+    @staticmethod
+    def _annotate(response, path):
+        if path is not None:
+            response['X-Profile-Id'] = path.name
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    主从读写分离中间件（配置了只读副本时生效，见 db_router.py）
+    只读请求的查询读副本；发生写入的其他请求设置粘滞Cookie，之后一段时间内该客户端的请求都读主库
+    """
+    sync_capable = True
+    async_capable = True
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        if not db_router.replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sticky_seconds = getattr(settings, 'DB_REPLICA_STICKY_SECONDS', 5)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        state, token = db_router.start_request(self._use_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            db_router.end_request(token)
+        return self._finish(request, response, state)
+
+    async def __acall__(self, request):
+        state, token = db_router.start_request(self._use_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            db_router.end_request(token)
+        return self._finish(request, response, state)
+
+    def _use_replica(self, request) -> bool:
+        return request.method in self.safe_methods and db_router.STICKY_COOKIE not in request.COOKIES
+
+    def _finish(self, request, response, state):
+        if state.wrote and request.method not in self.safe_methods and self.sticky_seconds > 0:
+            response.set_cookie(db_router.STICKY_COOKIE, '1', max_age=self.sticky_seconds,
+                                httponly=True, samesite='Lax')
+        return response
+
+
+class DemandTrackingMiddleware:
+    """
+    按股票代码统计接口访问量（个股路由的成功请求），供实时行情刷新调度分配刷新频率（见 refresh_scheduler.py）
+    """
+    # 路由参数 code 为股票代码的路由；板块等其他路由的 code 不是股票代码，不计入
+    stock_routes = frozenset({
+        'stock-detail', 'stock-realtime', 'stock-history', 'stock-intraday',
+        'async-stock-realtime', 'async-stock-history',
+    })
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'DEMAND_TRACKING_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self._record(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        self._record(request, response)
+        return response
+
+    def _record(self, request, response):
+        match = getattr(request, 'resolver_match', None)
+        if match is None or match.url_name not in self.stock_routes:
+            return
+        code = match.kwargs.get('code')
+        if code and response.status_code < 400:
+            refresh_scheduler.record_demand(code)
+
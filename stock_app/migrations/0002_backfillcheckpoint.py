@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackfillCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=10, verbose_name='股票代码')),
+                ('start_date', models.DateField(verbose_name='开始日期')),
+                ('end_date', models.DateField(verbose_name='结束日期')),
+                ('status', models.CharField(choices=[('done', '已完成'), ('failed', '失败')], max_length=10, verbose_name='状态')),
+                ('rows', models.IntegerField(default=0, verbose_name='写入行数')),
+                ('attempts', models.IntegerField(default=0, verbose_name='尝试次数')),
+                ('error', models.TextField(blank=True, verbose_name='错误信息')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '回填进度',
+                'verbose_name_plural': '回填进度',
+                'db_table': 'backfill_checkpoint',
+                'unique_together': {('symbol', 'start_date', 'end_date')},
+            },
+        ),
+    ]
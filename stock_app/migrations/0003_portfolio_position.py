@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock_app', '0002_backfillcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Portfolio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='名称')),
+                ('version', models.PositiveIntegerField(default=1, verbose_name='版本')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '自选组合',
+                'verbose_name_plural': '自选组合',
+                'db_table': 'portfolio',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Position',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock_code', models.CharField(max_length=10, verbose_name='股票代码')),
+                ('quantity', models.BigIntegerField(default=0, verbose_name='持仓数量(股)')),
+                ('cost_price', models.DecimalField(decimal_places=3, default=0, max_digits=10, verbose_name='成本价')),
+                ('added_at', models.DateTimeField(auto_now_add=True, verbose_name='加入时间')),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='positions', to='stock_app.portfolio', verbose_name='组合')),
+            ],
+            options={
+                'verbose_name': '组合持仓',
+                'verbose_name_plural': '组合持仓',
+                'db_table': 'portfolio_position',
+                'ordering': ['id'],
+                'unique_together': {('portfolio', 'stock_code')},
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock_app', '0003_portfolio_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock_code', models.CharField(max_length=10, verbose_name='股票代码')),
+                ('kind', models.CharField(choices=[('price_above', '价格向上突破'), ('price_below', '价格向下跌破'), ('change_above', '涨跌幅升至'), ('change_below', '涨跌幅降至'), ('move', '涨跌幅绝对值超过')], max_length=20, verbose_name='类型')),
+                ('threshold', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='阈值')),
+                ('note', models.CharField(blank=True, max_length=200, verbose_name='备注')),
+                ('once', models.BooleanField(default=True, verbose_name='只提醒一次')),
+                ('active', models.BooleanField(default=True, verbose_name='启用')),
+                ('last_triggered_at', models.DateTimeField(blank=True, null=True, verbose_name='最近触发时间')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '价格提醒',
+                'verbose_name_plural': '价格提醒',
+                'db_table': 'alert_rule',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['active', 'updated_at'], name='alert_rule_active_885f6e_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AlertEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock_code', models.CharField(max_length=10, verbose_name='股票代码')),
+                ('kind', models.CharField(max_length=20, verbose_name='类型')),
+                ('threshold', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='阈值')),
+                ('value', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='触发时的值')),
+                ('triggered_at', models.DateTimeField(verbose_name='触发时间')),
+                ('rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='stock_app.alertrule', verbose_name='规则')),
+            ],
+            options={
+                'verbose_name': '提醒记录',
+                'verbose_name_plural': '提醒记录',
+                'db_table': 'alert_event',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock_app', '0004_alertrule_alertevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdjustFactor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='生效日期')),
+                ('factor', models.DecimalField(decimal_places=8, max_digits=20, verbose_name='后复权因子')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='adjust_factors', to='stock_app.stock', verbose_name='股票')),
+            ],
+            options={
+                'verbose_name': '复权因子',
+                'verbose_name_plural': '复权因子',
+                'db_table': 'adjust_factor',
+                'ordering': ['date'],
+                'unique_together': {('stock', 'date')},
+            },
+        ),
+    ]
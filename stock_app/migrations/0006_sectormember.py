@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock_app', '0005_adjustfactor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SectorMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('industry', '行业'), ('index', '指数')], max_length=10, verbose_name='类型')),
+                ('sector_code', models.CharField(max_length=20, verbose_name='板块代码')),
+                ('sector_name', models.CharField(max_length=50, verbose_name='板块名称')),
+                ('stock_code', models.CharField(max_length=10, verbose_name='股票代码')),
+                ('stock_name', models.CharField(blank=True, max_length=100, verbose_name='股票名称')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '板块成分股',
+                'verbose_name_plural': '板块成分股',
+                'db_table': 'sector_member',
+                'ordering': ['kind', 'sector_code', 'stock_code'],
+                'unique_together': {('kind', 'sector_code', 'stock_code')},
+            },
+        ),
+    ]
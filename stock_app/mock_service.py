@@ -1,12 +1,18 @@
 """
 模拟数据服务 - 用于测试和演示
 当AKShare不可用时提供模拟数据
+
+数据来自按随机种子生成的合成市场（见 synthetic_market.py）：
+同一时间片内同一股票的报价保持一致，历史日线可复现，规模可配置到数千只股票
 """
-import random
-from datetime import datetime, timedelta
+import threading
+import time
+from datetime import date, datetime
 from typing import Dict, List, Optional
 import logging
 
+from django.conf import settings
+
 logger = logging.getLogger(__name__)
 
 
@@ -14,121 +20,202 @@ class MockDataService:
     """模拟数据服务类"""
     
     def __init__(self):
-        self.mock_stocks = [
-            {'code': '000001', 'name': '平安银行', 'market': 'SZ'},
-            {'code': '000002', 'name': '万科A', 'market': 'SZ'},
-            {'code': '600000', 'name': '浦发银行', 'market': 'SH'},
-            {'code': '600036', 'name': '招商银行', 'market': 'SH'},
-            {'code': '000858', 'name': '五粮液', 'market': 'SZ'},
-            {'code': '600519', 'name': '贵州茅台', 'market': 'SH'},
-            {'code': '000725', 'name': '京东方A', 'market': 'SZ'},
-            {'code': '600276', 'name': '恒瑞医药', 'market': 'SH'},
-            {'code': '300059', 'name': '东方财富', 'market': 'SZ'},
-            {'code': '002415', 'name': '海康威视', 'market': 'SZ'},
-        ]
+        # 模拟上游接口耗时（秒），用于压测时近似真实AKShare请求的等待
+        self.latency = getattr(settings, 'MOCK_DATA_LATENCY', 0)
+        self.market_size = getattr(settings, 'MOCK_MARKET_SIZE', 5000)
+        self.market_seed = getattr(settings, 'MOCK_MARKET_SEED', 42)
+        self.history_days = getattr(settings, 'MOCK_MARKET_HISTORY_DAYS', 750)
+        self.snapshot_interval = getattr(settings, 'MOCK_SNAPSHOT_INTERVAL', 60)
+        self._market = None
+        self._lock = threading.Lock()
+    
+    @property
+    def market(self):
+        """合成市场，首次使用时生成；跨日后按新日期重新生成"""
+        market = self._market
+        if market is None or market.as_of != date.today():
+            with self._lock:
+                market = self._market
+                if market is None or market.as_of != date.today():
+                    from .synthetic_market import SyntheticMarket
+                    market = SyntheticMarket(
+                        size=self.market_size,
+                        seed=self.market_seed,
+                        history_days=self.history_days,
+                        snapshot_interval=self.snapshot_interval,
+                    )
+                    self._market = market
+                    logger.info(f"生成合成市场: {market.size} 只股票, {market.history_days} 个交易日")
+        return market
+    
+    def _simulate_latency(self):
+        """按配置模拟上游请求耗时"""
+        if self.latency:
+            time.sleep(self.latency)
     
     def get_stock_list(self) -> List[Dict]:
         """获取股票列表"""
+        self._simulate_latency()
         logger.info("使用模拟数据获取股票列表")
-        return self.mock_stocks
+        return self.market.stock_list()
+    
+    def get_stock_quotes(self, symbols: List[str]) -> List[Optional[Dict]]:
+        """批量获取实时行情（同一份快照），不存在的股票返回None"""
+        self._simulate_latency()
+        return [self.market.quote(symbol) for symbol in symbols]
     
     def get_stock_realtime(self, symbol: str) -> Optional[Dict]:
         """获取股票实时行情"""
-        # 查找股票
-        stock = next((s for s in self.mock_stocks if s['code'] == symbol), None)
-        if not stock:
-            return None
-        
-        # 生成模拟实时数据
-        base_price = random.uniform(10, 100)
-        change_rate = random.uniform(-10, 10)
-        change_amount = base_price * change_rate / 100
-        
+        self._simulate_latency()
+        return self.market.quote(symbol)
+    
+    def get_spot_arrays(self) -> Dict:
+        """全市场实时快照的列数组: {'code', 'name', 'price', 'pre_close', 'change_rate', 'open', 'high', 'low', 'volume', 'amount'}"""
+        self._simulate_latency()
+        market = self.market
+        snap = market.snapshot_arrays()
         return {
-            'code': symbol,
-            'name': stock['name'],
-            'current_price': round(base_price, 2),
-            'change_rate': round(change_rate, 2),
-            'change_amount': round(change_amount, 2),
-            'volume': random.randint(1000000, 100000000),
-            'amount': random.randint(100000000, 10000000000),
-            'high_price': round(base_price * 1.05, 2),
-            'low_price': round(base_price * 0.95, 2),
-            'open_price': round(base_price * 0.98, 2),
-            'pre_close': round(base_price - change_amount, 2),
-            'updated_at': datetime.now()
+            'code': market.codes,
+            'name': market.names,
+            'price': snap['price'],
+            'pre_close': snap['pre_close'],
+            'change_rate': snap['change_rate'],
+            'open': snap['open'],
+            'high': snap['high'],
+            'low': snap['low'],
+            'volume': snap['volume'],
+            'amount': snap['amount'],
         }
     
     def get_stock_history(self, symbol: str, period: str = "daily", 
                          start_date: str = None, end_date: str = None) -> List[Dict]:
-        """获取股票历史数据"""
-        # 生成30天的模拟历史数据
-        history_data = []
-        base_price = random.uniform(10, 100)
+        """
+        获取股票历史数据
+        日期格式 'YYYYMMDD'，默认最近 HISTORY_DEFAULT_SESSIONS 个交易日；period 目前只提供日线
+        """
+        from .trading_calendar import default_history_start
+        
+        self._simulate_latency()
+        end = datetime.strptime(end_date, '%Y%m%d').date() if end_date else date.today()
+        start = datetime.strptime(start_date, '%Y%m%d').date() if start_date else default_history_start(end)
+        
+        market = self.market
+        index = market.index_of.get(symbol)
+        if index is None:
+            return []
         
-        for i in range(30):
-            date = datetime.now() - timedelta(days=i)
-            
-            # 模拟价格波动
-            daily_change = random.uniform(-0.05, 0.05)
-            open_price = base_price * (1 + daily_change)
-            high_price = open_price * random.uniform(1.0, 1.05)
-            low_price = open_price * random.uniform(0.95, 1.0)
-            close_price = open_price * random.uniform(0.98, 1.02)
-            
-            change_rate = (close_price - base_price) / base_price * 100
-            
-            history_data.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'open_price': round(open_price, 2),
-                'high_price': round(high_price, 2),
-                'low_price': round(low_price, 2),
-                'close_price': round(close_price, 2),
-                'volume': random.randint(1000000, 50000000),
-                'amount': random.randint(100000000, 5000000000),
-                'change_rate': round(change_rate, 2)
-            })
-            
-            base_price = close_price  # 下一天的基准价格
+        bars = market.history_arrays(index, start, end)
+        change_rate = (bars['close'] - bars['pre_close']) / bars['pre_close'] * 100
         
-        return sorted(history_data, key=lambda x: x['date'])
+        return [
+            {
+                'date': str(day),
+                'open_price': open_price,
+                'high_price': high_price,
+                'low_price': low_price,
+                'close_price': close_price,
+                'volume': volume,
+                'amount': amount,
+                'change_rate': round(rate, 2),
+            }
+            for day, open_price, high_price, low_price, close_price, volume, amount, rate in zip(
+                bars['date'].tolist(), bars['open'].tolist(), bars['high'].tolist(), bars['low'].tolist(),
+                bars['close'].tolist(), bars['volume'].tolist(), bars['amount'].tolist(), change_rate.tolist()
+            )
+        ]
+    
+    def get_adjust_factors(self, symbol: str) -> List[Dict]:
+        """后复权因子序列: [{'date': '2024-06-12', 'factor': 1.0213}, ...]，按日期升序"""
+        self._simulate_latency()
+        index = self.market.index_of.get(symbol)
+        if index is None:
+            return []
+        factors = self.market.adjust_factors(index)
+        return [
+            {'date': str(day), 'factor': factor}
+            for day, factor in zip(factors['date'].tolist(), factors['factor'].tolist())
+        ]
+    
+    def get_trade_dates(self) -> List[str]:
+        """交易日历: ['1990-12-19', ...]，合成市场只排除周末"""
+        return [str(day) for day in self.market.trade_dates().tolist()]
+    
+    def get_industry_boards(self) -> List[Dict]:
+        """行业板块列表: [{'code': 'BK0475', 'name': '银行'}, ...]"""
+        from .synthetic_market import INDUSTRIES
+        
+        self._simulate_latency()
+        return [{'code': code, 'name': name} for code, name in INDUSTRIES]
+    
+    def get_industry_constituents(self, board: str) -> List[Dict]:
+        """行业板块成分股（board 为板块名称）: [{'code': '000001', 'name': '平安银行'}, ...]"""
+        self._simulate_latency()
+        market = self.market
+        members = market.industry_members(board)
+        return [
+            {'code': code, 'name': name}
+            for code, name in zip(market.codes[members].tolist(), market.names[members].tolist())
+        ]
+    
+    def get_index_constituents(self, symbol: str) -> Dict:
+        """指数成分股: {'code': '000300', 'name': '沪深300', 'stocks': [{'code', 'name'}, ...]}"""
+        from .synthetic_market import CONSTITUENT_INDICES
+        
+        self._simulate_latency()
+        market = self.market
+        members = market.index_members(symbol)
+        return {
+            'code': symbol,
+            'name': CONSTITUENT_INDICES[symbol][0] if symbol in CONSTITUENT_INDICES else '',
+            'stocks': [
+                {'code': code, 'name': name}
+                for code, name in zip(market.codes[members].tolist(), market.names[members].tolist())
+            ],
+        }
     
     def search_stock(self, keyword: str) -> List[Dict]:
-        """搜索股票"""
+        """搜索股票（按代码或名称，最多返回20条）"""
+        self._simulate_latency()
         keyword = keyword.upper()
-        results = []
+        market = self.market
         
-        for stock in self.mock_stocks:
-            if keyword in stock['code'] or keyword in stock['name']:
-                realtime = self.get_stock_realtime(stock['code'])
-                results.append({
-                    'code': stock['code'],
-                    'name': stock['name'],
-                    'current_price': realtime['current_price'],
-                    'change_rate': realtime['change_rate'],
-                    'market': stock['market']
-                })
+        matched = [
+            i for i, (code, name) in enumerate(zip(market.codes.tolist(), market.names.tolist()))
+            if keyword in code or keyword in name
+        ][:20]
         
-        return results
+        snap = market.snapshot_arrays()
+        return [
+            {
+                'code': str(market.codes[i]),
+                'name': str(market.names[i]),
+                'current_price': float(snap['price'][i]),
+                'change_rate': float(snap['change_rate'][i]),
+                'market': str(market.markets[i])
+            }
+            for i in matched
+        ]
     
     def get_market_overview(self) -> Dict:
         """获取市场概览数据"""
+        self._simulate_latency()
+        market = self.market
+        change_rate = market.snapshot_arrays()['change_rate']
+        
+        def index_info(symbol):
+            quote = market.index_quote(symbol)
+            return {
+                'name': quote['name'],
+                'current': quote['current'],
+                'change_rate': quote['change_rate'],
+                'change_amount': quote['change_amount']
+            }
+        
         return {
-            'sh_index': {
-                'name': '上证指数',
-                'current': round(random.uniform(3000, 3500), 2),
-                'change_rate': round(random.uniform(-2, 2), 2),
-                'change_amount': round(random.uniform(-50, 50), 2)
-            },
-            'sz_index': {
-                'name': '深证成指',
-                'current': round(random.uniform(10000, 12000), 2),
-                'change_rate': round(random.uniform(-2, 2), 2),
-                'change_amount': round(random.uniform(-200, 200), 2)
-            },
-            'total_stocks': len(self.mock_stocks),
-            'up_count': random.randint(3, 7),
-            'down_count': random.randint(2, 5),
-            'flat_count': random.randint(0, 2)
+            'sh_index': index_info('sh000001'),
+            'sz_index': index_info('sz399001'),
+            'total_stocks': int(market.size),
+            'up_count': int((change_rate > 0).sum()),
+            'down_count': int((change_rate < 0).sum()),
+            'flat_count': int((change_rate == 0).sum())
         }
-
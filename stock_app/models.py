@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F
 from django.utils import timezone
 
 
@@ -52,6 +53,26 @@ class StockPrice(models.Model):
         return 0
 
 
+class AdjustFactor(models.Model):
+    """
+    后复权因子，每个除权除息日一条，从该日起生效直到下一条
+    日线只保存不复权价格，前复权/后复权价格按因子即时计算（见 adjust.py）
+    """
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='adjust_factors', verbose_name='股票')
+    date = models.DateField(verbose_name='生效日期')
+    factor = models.DecimalField(max_digits=20, decimal_places=8, verbose_name='后复权因子')
+
+    class Meta:
+        db_table = 'adjust_factor'
+        verbose_name = '复权因子'
+        verbose_name_plural = '复权因子'
+        unique_together = ['stock', 'date']
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.stock.code} - {self.date} - {self.factor}"
+
+
 class StockRealtime(models.Model):
     """实时股票数据模型"""
     stock = models.OneToOneField(Stock, on_delete=models.CASCADE, related_name='realtime', verbose_name='股票')
@@ -73,3 +94,168 @@ class StockRealtime(models.Model):
 
     def __str__(self):
         return f"{self.stock.code} - 实时价格: {self.current_price}"
+
+
+class SectorMember(models.Model):
+    """
+    板块成分股，每个（板块, 股票）一条；行业板块和成分股指数都作为板块保存
+    由 sync_sectors 命令按板块整体替换，板块行情由全市场快照按板块汇总（见 sectors.py）
+    """
+    KIND_INDUSTRY = 'industry'
+    KIND_INDEX = 'index'
+    KIND_CHOICES = [
+        (KIND_INDUSTRY, '行业'),
+        (KIND_INDEX, '指数'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name='类型')
+    sector_code = models.CharField(max_length=20, verbose_name='板块代码')
+    sector_name = models.CharField(max_length=50, verbose_name='板块名称')
+    stock_code = models.CharField(max_length=10, verbose_name='股票代码')
+    stock_name = models.CharField(max_length=100, blank=True, verbose_name='股票名称')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'sector_member'
+        verbose_name = '板块成分股'
+        verbose_name_plural = '板块成分股'
+        unique_together = ['kind', 'sector_code', 'stock_code']
+        ordering = ['kind', 'sector_code', 'stock_code']
+
+    def __str__(self):
+        return f"{self.sector_name} - {self.stock_code}"
+
+
+class BackfillCheckpoint(models.Model):
+    """历史数据回填进度，每个（股票, 日期范围）一条"""
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_DONE, '已完成'),
+        (STATUS_FAILED, '失败'),
+    ]
+
+    symbol = models.CharField(max_length=10, verbose_name='股票代码')
+    start_date = models.DateField(verbose_name='开始日期')
+    end_date = models.DateField(verbose_name='结束日期')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, verbose_name='状态')
+    rows = models.IntegerField(default=0, verbose_name='写入行数')
+    attempts = models.IntegerField(default=0, verbose_name='尝试次数')
+    error = models.TextField(blank=True, verbose_name='错误信息')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'backfill_checkpoint'
+        verbose_name = '回填进度'
+        verbose_name_plural = '回填进度'
+        unique_together = ['symbol', 'start_date', 'end_date']
+
+    def __str__(self):
+        return f"{self.symbol} {self.start_date}~{self.end_date} - {self.status}"
+
+
+class Portfolio(models.Model):
+    """自选股/持仓组合"""
+    name = models.CharField(max_length=100, verbose_name='名称')
+    # 持仓每次变化时递增，用作估值结果的缓存键
+    version = models.PositiveIntegerField(default=1, verbose_name='版本')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'portfolio'
+        verbose_name = '自选组合'
+        verbose_name_plural = '自选组合'
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.name} (v{self.version})"
+
+    def bump_version(self):
+        """持仓变化后递增版本号，使已缓存的估值失效"""
+        Portfolio.objects.filter(pk=self.pk).update(version=F('version') + 1, updated_at=timezone.now())
+        self.refresh_from_db(fields=['version', 'updated_at'])
+
+
+class Position(models.Model):
+    """组合中的一只股票，数量为0时只作为自选股"""
+    portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE, related_name='positions', verbose_name='组合')
+    stock_code = models.CharField(max_length=10, verbose_name='股票代码')
+    quantity = models.BigIntegerField(default=0, verbose_name='持仓数量(股)')
+    cost_price = models.DecimalField(max_digits=10, decimal_places=3, default=0, verbose_name='成本价')
+    added_at = models.DateTimeField(auto_now_add=True, verbose_name='加入时间')
+
+    class Meta:
+        db_table = 'portfolio_position'
+        verbose_name = '组合持仓'
+        verbose_name_plural = '组合持仓'
+        unique_together = ['portfolio', 'stock_code']
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.portfolio.name} - {self.stock_code} x {self.quantity}"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.portfolio.bump_version()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.portfolio.bump_version()
+        return result
+
+
+class AlertRule(models.Model):
+    """价格提醒规则，由 collect_intraday 在每次快照刷新时检查（见 alerts.py）"""
+    KIND_PRICE_ABOVE = 'price_above'
+    KIND_PRICE_BELOW = 'price_below'
+    KIND_CHANGE_ABOVE = 'change_above'
+    KIND_CHANGE_BELOW = 'change_below'
+    KIND_MOVE = 'move'
+    KIND_CHOICES = [
+        (KIND_PRICE_ABOVE, '价格向上突破'),
+        (KIND_PRICE_BELOW, '价格向下跌破'),
+        (KIND_CHANGE_ABOVE, '涨跌幅升至'),
+        (KIND_CHANGE_BELOW, '涨跌幅降至'),
+        (KIND_MOVE, '涨跌幅绝对值超过'),
+    ]
+
+    stock_code = models.CharField(max_length=10, verbose_name='股票代码')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name='类型')
+    threshold = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='阈值')  # 价格或涨跌幅(%)
+    note = models.CharField(max_length=200, blank=True, verbose_name='备注')
+    once = models.BooleanField(default=True, verbose_name='只提醒一次')
+    active = models.BooleanField(default=True, verbose_name='启用')
+    last_triggered_at = models.DateTimeField(null=True, blank=True, verbose_name='最近触发时间')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'alert_rule'
+        verbose_name = '价格提醒'
+        verbose_name_plural = '价格提醒'
+        ordering = ['id']
+        indexes = [models.Index(fields=['active', 'updated_at'])]
+
+    def __str__(self):
+        return f"{self.stock_code} {self.get_kind_display()} {self.threshold}"
+
+
+class AlertEvent(models.Model):
+    """已触发的提醒，按id递增顺序由提醒事件接口读取"""
+    rule = models.ForeignKey(AlertRule, on_delete=models.CASCADE, related_name='events', verbose_name='规则')
+    stock_code = models.CharField(max_length=10, verbose_name='股票代码')
+    kind = models.CharField(max_length=20, verbose_name='类型')
+    threshold = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='阈值')
+    value = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='触发时的值')
+    triggered_at = models.DateTimeField(verbose_name='触发时间')
+
+    class Meta:
+        db_table = 'alert_event'
+        verbose_name = '提醒记录'
+        verbose_name_plural = '提醒记录'
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.stock_code} {self.kind} {self.threshold} @ {self.value}"
+
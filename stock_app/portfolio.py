@@ -0,0 +1,106 @@
+"""
+组合估值
+全市场实时快照按代码排序后以紧凑格式保存（见 spot_snapshot.py，开市时 SPOT_SNAPSHOT_TTL 秒内复用，休市时复用到下次开市），
+组合估值时用二分查找一次取出全部持仓的价格，再整体计算市值、盈亏和权重，不逐只请求实时行情。
+
+估值结果按（组合, 组合版本, 快照时间片）缓存在Django缓存中，持仓变化后版本号递增，旧结果自然失效
+"""
+import logging
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .registry import get_trading_calendar
+from .spot_snapshot import CompactSnapshot, get_spot_snapshot
+
+logger = logging.getLogger(__name__)
+
+def _round(values: np.ndarray, digits: int = 2) -> list:
+    """数组转为列表，NaN转为None"""
+    rounded = np.round(values.astype(np.float64), digits)
+    return [None if np.isnan(value) else value for value in rounded.tolist()]
+
+
+def value_positions(positions: List[Dict], snapshot: CompactSnapshot) -> Dict:
+    """
+    按快照计算组合估值
+    参数: positions - [{'stock_code': '000001', 'quantity': 1000, 'cost_price': Decimal('10.5')}, ...]
+    返回: {'totals': {...}, 'results': [每只股票的估值, ...]}
+    市值、盈亏中不包含快照中没有价格的股票
+    """
+    codes = [position['stock_code'] for position in positions]
+    quantity = np.array([position['quantity'] for position in positions], dtype=np.float64)
+    cost_price = np.array([float(position['cost_price']) for position in positions], dtype=np.float64)
+    quote = snapshot.gather(codes)
+
+    price = quote['price']
+    priced = np.isfinite(price)
+    market_value = quantity * price
+    cost_value = quantity * cost_price
+    pnl = market_value - cost_value
+    day_pnl = quantity * (price - quote['pre_close'])
+
+    total_value = np.nansum(market_value)
+    total_cost = np.sum(cost_value[priced])
+    total_pnl = np.nansum(pnl)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pnl_rate = np.where(cost_value > 0, pnl / cost_value * 100, np.nan)
+        weight = market_value / total_value * 100 if total_value > 0 else np.full(len(codes), np.nan)
+
+    names = quote['name'].tolist()
+    rows = [
+        {'stock_code': code, 'stock_name': name if found else None, 'quantity': int(qty)}
+        for code, name, found, qty in zip(codes, names, quote['found'].tolist(), quantity.tolist())
+    ]
+    for field, values, digits in (
+        ('cost_price', cost_price, 3), ('price', price, 2), ('change_rate', quote['change_rate'], 2),
+        ('market_value', market_value, 2), ('pnl', pnl, 2), ('pnl_rate', pnl_rate, 2),
+        ('day_pnl', day_pnl, 2), ('weight', weight, 2),
+    ):
+        for row, value in zip(rows, _round(values, digits)):
+            row[field] = value
+
+    return {
+        'totals': {
+            'market_value': round(float(total_value), 2),
+            'cost': round(float(total_cost), 2),
+            'pnl': round(float(total_pnl), 2),
+            'pnl_rate': round(float(total_pnl / total_cost * 100), 2) if total_cost > 0 else None,
+            'day_pnl': round(float(np.nansum(day_pnl)), 2),
+            'positions': len(codes),
+            'unpriced': int(len(codes) - priced.sum()),
+        },
+        'results': rows,
+    }
+
+
+def get_valuation(portfolio) -> Optional[Dict]:
+    """
+    组合估值（带缓存），快照不可用时返回None
+    缓存键包含组合版本和快照时间片，同一时间片内同一版本的组合只计算一次
+    """
+    snapshot = get_spot_snapshot()
+    if snapshot is None:
+        return None
+
+    ttl = getattr(settings, 'SPOT_SNAPSHOT_TTL', 5)
+    key = f"portfolio:valuation:{portfolio.pk}:{portfolio.version}:{int(snapshot.fetched_at // max(ttl, 1))}"
+    valuation = cache.get(key)
+    if valuation is None:
+        positions = list(portfolio.positions.values('stock_code', 'quantity', 'cost_price'))
+        valuation = value_positions(positions, snapshot)
+        fetched_at = timezone.localtime(datetime.fromtimestamp(snapshot.fetched_at, dt_timezone.utc))
+        valuation.update(
+            portfolio_id=portfolio.pk,
+            name=portfolio.name,
+            version=portfolio.version,
+            as_of=fetched_at.strftime('%Y-%m-%d %H:%M:%S'),
+        )
+        # 休市期间快照不变，估值缓存到下次开市
+        timeout = get_trading_calendar().cache_ttl(timezone.now(), max(ttl, 1))
+        cache.set(key, valuation, timeout=int(timeout) * 2)
+    return valuation
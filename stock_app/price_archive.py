@@ -0,0 +1,148 @@
+"""
+历史价格归档文件读写
+export_prices / import_prices 命令使用的分片文件格式:
+
+- csv: gzip压缩的CSV，首行为列名
+- parquet: 需要安装pyarrow，每批数据写为一个row group
+
+归档目录下的 manifest.json 记录格式、列名以及每个分片的市场和行数，
+stocks.json 记录导出市场的股票基本信息，导入时用于创建本库没有的股票
+"""
+import csv
+import gzip
+import importlib.util
+import json
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence
+
+FORMAT_CSV = 'csv'
+FORMAT_PARQUET = 'parquet'
+
+PARQUET_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+MANIFEST_NAME = 'manifest.json'
+STOCKS_NAME = 'stocks.json'
+
+# 股票基本信息字段，与 Stock 字段对应
+STOCK_FIELDS = ['code', 'name', 'market', 'industry']
+
+# 归档列，与 StockPrice 字段对应，股票以代码表示以便跨环境导入
+COLUMNS = [
+    'stock_code', 'date', 'open_price', 'high_price', 'low_price', 'close_price',
+    'volume', 'amount', 'change_rate',
+]
+DECIMAL_COLUMNS = ['open_price', 'high_price', 'low_price', 'close_price', 'amount', 'change_rate']
+
+FILE_SUFFIXES = {FORMAT_CSV: '.csv.gz', FORMAT_PARQUET: '.parquet'}
+
+
+def shard_filename(market: str, shard: int, fmt: str) -> str:
+    return f"prices_{market}_{shard:03d}{FILE_SUFFIXES[fmt]}"
+
+
+class CsvShardWriter:
+    """gzip压缩的CSV分片"""
+
+    def __init__(self, path: Path, compresslevel: int = 6):
+        self._file = gzip.open(path, 'wt', encoding='utf-8', newline='', compresslevel=compresslevel)
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(COLUMNS)
+
+    def write_rows(self, rows: Sequence[tuple]):
+        self._writer.writerows(
+            [(code, day.isoformat(), *('' if value is None else value for value in values))
+             for code, day, *values in rows]
+        )
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetShardWriter:
+    """Parquet分片，每次 write_rows 写入一个row group"""
+
+    def __init__(self, path: Path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._schema = pa.schema([
+            ('stock_code', pa.string()),
+            ('date', pa.date32()),
+            *((name, pa.decimal128(15, 2)) for name in ('open_price', 'high_price', 'low_price', 'close_price')),
+            ('volume', pa.int64()),
+            ('amount', pa.decimal128(15, 2)),
+            ('change_rate', pa.decimal128(6, 2)),
+        ])
+        self._writer = pq.ParquetWriter(path, self._schema, compression='zstd')
+
+    def write_rows(self, rows: Sequence[tuple]):
+        columns = list(zip(*rows))
+        self._writer.write_table(self._pa.Table.from_arrays(
+            [self._pa.array(column, type=field.type) for column, field in zip(columns, self._schema)],
+            schema=self._schema
+        ))
+
+    def close(self):
+        self._writer.close()
+
+
+def open_writer(path: Path, fmt: str):
+    if fmt == FORMAT_PARQUET:
+        if not PARQUET_AVAILABLE:
+            raise RuntimeError('Parquet格式需要安装pyarrow')
+        return ParquetShardWriter(path)
+    return CsvShardWriter(path)
+
+
+def _parse_csv_row(row: List[str]) -> Dict:
+    record = dict(zip(COLUMNS, row))
+    record['date'] = date.fromisoformat(record['date'])
+    record['volume'] = int(record['volume'])
+    for name in DECIMAL_COLUMNS:
+        record[name] = Decimal(record[name]) if record[name] else None
+    return record
+
+
+def iter_batches(path: Path, fmt: str, batch_size: int) -> Iterator[List[Dict]]:
+    """分批读取分片，每批最多 batch_size 行，内存占用与批大小成正比"""
+    if fmt == FORMAT_PARQUET:
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=COLUMNS):
+            yield batch.to_pylist()
+        return
+
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        next(reader)  # 列名
+        batch = []
+        for row in reader:
+            batch.append(_parse_csv_row(row))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def write_manifest(directory: Path, manifest: Dict):
+    (directory / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding='utf-8')
+
+
+def read_manifest(directory: Path) -> Dict:
+    return json.loads((directory / MANIFEST_NAME).read_text(encoding='utf-8'))
+
+
+def write_stocks(directory: Path, stocks: Sequence[Dict]):
+    (directory / STOCKS_NAME).write_text(json.dumps(list(stocks), ensure_ascii=False), encoding='utf-8')
+
+
+def read_stocks(directory: Path) -> Dict[str, Dict]:
+    """代码到股票基本信息的映射，归档中没有 stocks.json（旧版本导出）时返回空字典"""
+    path = directory / STOCKS_NAME
+    if not path.exists():
+        return {}
+    return {stock['code']: stock for stock in json.loads(path.read_text(encoding='utf-8'))}
@@ -0,0 +1,189 @@
+"""
+请求采样分析
+按比例（或由可信IP通过请求头指定）对请求进行统计采样：请求处理期间由后台线程定时抓取
+处理线程的调用栈，结束后按视图名保存为折叠栈（folded stacks）格式，
+可直接交给 flamegraph.pl、speedscope 或 inferno 生成火焰图
+
+输出目录是一个有上限的环形缓冲区，超出 PROFILING_MAX_FILES 时删除最早的文件
+"""
+import logging
+import random
+import re
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SUFFIX = '.folded'
+
+_unsafe_chars = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+class StackSampler:
+    """在后台线程中定时抓取目标线程的调用栈"""
+
+    def __init__(self, thread_id: int, interval: float = 0.005, max_depth: int = 128):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _stack(self, frame) -> str:
+        """把帧链转换为 根;...;叶 形式的折叠栈"""
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            module = frame.f_globals.get('__name__', '?')
+            names.append(f"{module}:{code.co_name}:{frame.f_lineno}")
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[self._stack(frame)] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stock-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.samples
+
+
+class ProfileStore:
+    """有上限的分析结果目录，文件名包含时间、视图名和请求耗时"""
+
+    def __init__(self, directory, max_files: int = 200):
+        self.directory = Path(directory)
+        self.max_files = max_files
+        self._lock = threading.Lock()
+
+    def save(self, view: str, samples: Counter, elapsed: float) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        name = f"{timestamp}_{_unsafe_chars.sub('_', view)}_{int(elapsed * 1000)}ms{PROFILE_SUFFIX}"
+        path = self.directory / name
+        path.write_text(
+            ''.join(f"{stack} {count}\n" for stack, count in samples.most_common()),
+            encoding='utf-8'
+        )
+        self._prune()
+        return path
+
+    def _prune(self):
+        with self._lock:
+            files = self.list()
+            for path in files[:max(0, len(files) - self.max_files)]:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+    def list(self, view: Optional[str] = None) -> List[Path]:
+        """按时间从早到晚列出结果文件，可按视图名过滤"""
+        if not self.directory.exists():
+            return []
+        files = sorted(self.directory.glob(f'*{PROFILE_SUFFIX}'))
+        if view:
+            token = f"_{_unsafe_chars.sub('_', view)}_"
+            files = [path for path in files if token in path.name]
+        return files
+
+
+def parse_profile_name(path: Path) -> Dict[str, str]:
+    """从文件名解析时间、视图名和耗时"""
+    stem = path.name[:-len(PROFILE_SUFFIX)]
+    timestamp, rest = stem.split('_', 1)
+    view, elapsed = rest.rsplit('_', 1)
+    return {'timestamp': timestamp, 'view': view, 'elapsed': elapsed}
+
+
+def read_folded(paths: Iterable[Path]) -> Counter:
+    """读取并合并多个折叠栈文件"""
+    merged: Counter = Counter()
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                if stack:
+                    merged[stack] += int(count)
+    return merged
+
+
+def strip_line_numbers(samples: Counter) -> Counter:
+    """去掉帧中的行号，让同一函数不同行的样本合并到一起"""
+    merged: Counter = Counter()
+    for stack, count in samples.items():
+        merged[';'.join(frame.rsplit(':', 1)[0] for frame in stack.split(';'))] += count
+    return merged
+
+
+def top_frames(samples: Counter, limit: int = 20) -> List[tuple]:
+    """
+    按自身样本数（栈顶）排序的热点帧，通常先用 strip_line_numbers 按函数合并
+    返回: [(函数, 自身样本数, 累计样本数), ...]
+    """
+    own: Counter = Counter()
+    total: Counter = Counter()
+    for stack, count in samples.items():
+        frames = stack.split(';')
+        own[frames[-1]] += count
+        for frame in set(frames):
+            total[frame] += count
+    return [(frame, count, total[frame]) for frame, count in own.most_common(limit)]
+
+
+class RequestProfiler:
+    """决定是否分析请求，并保存结果"""
+
+    def __init__(self):
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.header = getattr(settings, 'PROFILING_HEADER', 'HTTP_X_PROFILE')
+        self.trusted_ips = set(getattr(settings, 'PROFILING_TRUSTED_IPS', ['127.0.0.1']))
+        self.interval = getattr(settings, 'PROFILING_INTERVAL', 0.005)
+        self.store = ProfileStore(
+            getattr(settings, 'PROFILING_DIR', settings.BASE_DIR / 'profiles'),
+            getattr(settings, 'PROFILING_MAX_FILES', 200),
+        )
+        # 同一时间最多分析的请求数，避免大量并发采样拖慢服务
+        self._slots = threading.BoundedSemaphore(getattr(settings, 'PROFILING_MAX_CONCURRENT', 2))
+
+    def wants(self, request) -> bool:
+        """按比例随机采样，或可信IP带请求头显式要求"""
+        if request.META.get(self.header) and request.META.get('REMOTE_ADDR') in self.trusted_ips:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self, thread_id: int) -> Optional[StackSampler]:
+        if not self._slots.acquire(blocking=False):
+            return None
+        sampler = StackSampler(thread_id, self.interval)
+        sampler.start()
+        return sampler
+
+    def finish(self, sampler: StackSampler, view: str, elapsed: float) -> Optional[Path]:
+        try:
+            samples = sampler.stop()
+        finally:
+            self._slots.release()
+        if not samples:
+            return None
+        try:
+            return self.store.save(view, samples, elapsed)
+        except OSError as e:
+            logger.warning(f"保存分析结果失败: {str(e)}")
+            return None
+
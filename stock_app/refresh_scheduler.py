@@ -0,0 +1,280 @@
+"""
+按需求分配刷新频率的实时行情调度
+所有股票以相同间隔刷新会把上游配额浪费在没人看的冷门股上。这里按访问量和波动分配每只股票的刷新间隔:
+
+- 访问量: 接口进程按股票代码计数（DemandTrackingMiddleware），用 Space-Saving 算法只保留访问最多的
+  DEMAND_TRACKED_SYMBOLS 只，定期合并到共享缓存并按 DEMAND_HALF_LIFE 指数衰减
+- 波动: 最近一次行情的涨跌幅绝对值，涨跌越大的股票价格变化越快
+- 权重 = (1 + 访问量) x (1 + min(|涨跌幅| / VOLATILITY_SCALE, VOLATILITY_CAP))。全局预算（每秒请求数）中，
+  每只股票先分到保底速率（间隔不超过 max_interval），剩余预算按权重分配，单只股票间隔不短于 min_interval，
+  超出的部分再分给其他股票；刷新间隔 = 1 / 分到的速率
+- 到期时间放在最小堆中，采集进程（python manage.py refresh_quotes）依次取出到期的股票，用令牌桶限制总请求速率。
+  已过期的股票（启动、开市时）按各自间隔错开到期时间，热门股票不会排在积压的冷门股票之后
+
+访问量只有在多个进程共享缓存（配置 REDIS_URL）时才能被采集进程看到；进程内缓存时所有股票按波动和默认权重刷新
+"""
+import heapq
+import logging
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+DEMAND_CACHE_KEY = 'refresh:demand'
+
+VOLATILITY_SCALE = 2.0  # 涨跌幅（%）每变化多少，权重增加一倍
+VOLATILITY_CAP = 4.0
+
+# 只分配预算的90%，留出余量吸收到期时间的抖动，避免到期队列持续积压
+UTILIZATION = 0.9
+
+
+class SpaceSavingCounter:
+    """
+    有界的高频计数（Space-Saving）
+    最多跟踪 capacity 个键；已满时新键替换当前计数最小的键并继承其计数，因此计数只会高估，
+    高估量不超过被替换的计数。出现次数超过总数 / capacity 的键一定会被保留
+    """
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError('capacity 必须大于0')
+        self.capacity = capacity
+        self.counts: Dict[str, float] = {}
+        # 惰性最小堆：计数增加时压入新条目，旧条目在弹出时按当前计数识别并丢弃
+        self._heap: List[Tuple[float, str]] = []
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __contains__(self, key):
+        return key in self.counts
+
+    def add(self, key: str, weight: float = 1.0):
+        count = self.counts.get(key)
+        if count is None:
+            if len(self.counts) >= self.capacity:
+                count = self._evict()
+            else:
+                count = 0.0
+        count += weight
+        self.counts[key] = count
+        heapq.heappush(self._heap, (count, key))
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild()
+
+    def update(self, counts: Dict[str, float]):
+        for key, weight in counts.items():
+            self.add(key, weight)
+
+    def _evict(self) -> float:
+        """移除计数最小的键，返回其计数"""
+        while True:
+            count, key = heapq.heappop(self._heap)
+            if self.counts.get(key) == count:
+                del self.counts[key]
+                return count
+
+    def _rebuild(self):
+        self._heap = [(count, key) for key, count in self.counts.items()]
+        heapq.heapify(self._heap)
+
+    def most_common(self, n: Optional[int] = None) -> List[Tuple[str, float]]:
+        items = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        return items[:n] if n is not None else items
+
+
+# ----------------------------------------------------------------------
+# 访问量统计（接口进程）
+# ----------------------------------------------------------------------
+_local_counter: Optional[SpaceSavingCounter] = None
+_local_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def _decay_factor(elapsed: float) -> float:
+    half_life = getattr(settings, 'DEMAND_HALF_LIFE', 1800)
+    return 0.5 ** (max(elapsed, 0.0) / half_life) if half_life > 0 else 1.0
+
+
+def record_demand(code: str):
+    """记录一次对某只股票的访问，每 DEMAND_FLUSH_INTERVAL 秒合并到共享缓存"""
+    global _local_counter, _last_flush
+    capacity = getattr(settings, 'DEMAND_TRACKED_SYMBOLS', 1000)
+    with _local_lock:
+        if _local_counter is None:
+            _local_counter = SpaceSavingCounter(capacity)
+        _local_counter.add(code)
+        if time.monotonic() - _last_flush < getattr(settings, 'DEMAND_FLUSH_INTERVAL', 10):
+            return
+        counts, _local_counter = _local_counter.counts, SpaceSavingCounter(capacity)
+        _last_flush = time.monotonic()
+
+    try:
+        flush_demand(counts)
+    except Exception as e:
+        logger.warning(f"合并访问量统计失败: {str(e)}")
+
+
+def flush_demand(counts: Dict[str, float], now: Optional[float] = None):
+    """
+    把本进程的访问计数合并到共享缓存（读取-合并-写回，并发合并时可能丢失少量计数，访问量本身只是近似值）
+    """
+    now = now or time.time()
+    shared = cache.get(DEMAND_CACHE_KEY) or {'at': now, 'counts': {}}
+    counter = SpaceSavingCounter(getattr(settings, 'DEMAND_TRACKED_SYMBOLS', 1000))
+    factor = _decay_factor(now - shared['at'])
+    counter.update({code: count * factor for code, count in shared['counts'].items()})
+    counter.update(counts)
+    half_life = getattr(settings, 'DEMAND_HALF_LIFE', 1800)
+    cache.set(DEMAND_CACHE_KEY, {'at': now, 'counts': counter.counts}, timeout=int(half_life * 8) or None)
+
+
+def get_demand(now: Optional[float] = None) -> Dict[str, float]:
+    """衰减到当前时刻的各股票访问量（只含访问最多的 DEMAND_TRACKED_SYMBOLS 只）"""
+    now = now or time.time()
+    shared = cache.get(DEMAND_CACHE_KEY)
+    if not shared:
+        return {}
+    factor = _decay_factor(now - shared['at'])
+    return {code: count * factor for code, count in shared['counts'].items()}
+
+
+# ----------------------------------------------------------------------
+# 刷新调度（采集进程）
+# ----------------------------------------------------------------------
+class RefreshScheduler:
+    """
+    按权重分配刷新间隔的到期队列
+    时间均为Unix秒；堆中的条目为 (到期时间, -权重, 版本, 代码)，重新分配间隔后旧版本的条目在弹出时丢弃
+    """
+
+    def __init__(self, codes: Iterable[str], budget: float, min_interval: float, max_interval: float):
+        self.codes = list(dict.fromkeys(codes))
+        self.budget = budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.demand: Dict[str, float] = {}
+        self.change_rate: Dict[str, float] = {}
+        self.refreshed_at: Dict[str, float] = {}
+        self.weights: Dict[str, float] = {}
+        self.intervals: Dict[str, float] = {}
+        self._due: Dict[str, float] = {}
+        self._version: Dict[str, int] = {}
+        self._inflight = set()
+        self._heap: List[Tuple[float, float, int, str]] = []
+
+    def __len__(self):
+        return len(self.codes)
+
+    def set_demand(self, demand: Dict[str, float]):
+        self.demand = demand
+
+    def observe(self, code: str, change_rate: Optional[float], at: float):
+        """记录一次刷新结果，并按当前间隔安排下次刷新"""
+        self._inflight.discard(code)
+        self.refreshed_at[code] = at
+        if change_rate is not None:
+            self.change_rate[code] = change_rate
+        self._schedule(code, at + self.intervals.get(code, self.max_interval))
+
+    def weight(self, code: str) -> float:
+        volatility = min(abs(self.change_rate.get(code, 0.0)) / VOLATILITY_SCALE, VOLATILITY_CAP)
+        return (1.0 + self.demand.get(code, 0.0)) * (1.0 + volatility)
+
+    def allocate(self) -> Dict[str, float]:
+        """
+        按权重把预算分为每只股票的刷新速率（次/秒）
+        保底速率为 1 / max_interval（预算不足时最多用一半预算保底），其余预算按权重注水分配，上限 1 / min_interval
+        """
+        if not self.codes:
+            return {}
+        budget = self.budget * UTILIZATION
+        floor = min(1.0 / self.max_interval, 0.5 * budget / len(self.codes))
+        cap = 1.0 / self.min_interval
+        rates = dict.fromkeys(self.codes, floor)
+        left = budget - floor * len(self.codes)
+        free = set(self.codes)
+        while left > 1e-9 and free:
+            total = sum(self.weights[code] for code in free)
+            excess = 0.0
+            for code in list(free):
+                rate = rates[code] + left * self.weights[code] / total
+                if rate >= cap:
+                    excess += rate - cap
+                    rate = cap
+                    free.discard(code)
+                rates[code] = rate
+            left = excess
+        return rates
+
+    @staticmethod
+    def _phase(code: str) -> float:
+        """按代码固定的 [0, 1) 相位，用于错开过期股票的到期时间"""
+        return (zlib.crc32(code.encode()) % 1024) / 1024
+
+    def plan(self, now: float):
+        """
+        按当前访问量和波动重新分配刷新间隔，并重排到期时间
+        从未刷新或已过期的股票在 [now, now + 间隔) 内按相位错开，间隔短（权重高）的先到期
+        """
+        self.weights = {code: self.weight(code) for code in self.codes}
+        for code, rate in self.allocate().items():
+            self.intervals[code] = 1.0 / rate
+            if code in self._inflight:
+                continue
+            interval = self.intervals[code]
+            current = self._due.get(code)
+            refreshed = self.refreshed_at.get(code)
+            due = None if refreshed is None else refreshed + interval
+            if due is None or due < now:
+                # 已经错开安排过、且不晚于新间隔的保留原到期时间
+                if current is not None and current <= now + interval:
+                    continue
+                due = now + interval * self._phase(code)
+            if current != due:
+                self._schedule(code, due)
+        if len(self._heap) > 2 * len(self.codes):
+            self._heap = [(due, -self.weights.get(code, 1.0), self._version[code], code)
+                          for code, due in self._due.items()]
+            heapq.heapify(self._heap)
+
+    def _schedule(self, code: str, due: float):
+        version = self._version.get(code, 0) + 1
+        self._version[code] = version
+        self._due[code] = due
+        heapq.heappush(self._heap, (due, -self.weights.get(code, 1.0), version, code))
+
+    def _discard_stale(self):
+        while self._heap and self._heap[0][2] != self._version.get(self._heap[0][3]):
+            heapq.heappop(self._heap)
+
+    def next_due(self) -> Optional[float]:
+        """最早的到期时间，队列为空时返回None"""
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> Optional[str]:
+        """取出一只已到期的股票（同时移出队列，刷新完成后由 observe 重新安排），没有到期的返回None"""
+        self._discard_stale()
+        if not self._heap or self._heap[0][0] > now:
+            return None
+        _, _, _, code = heapq.heappop(self._heap)
+        self._due.pop(code, None)
+        self._inflight.add(code)
+        return code
+
+    def requeue(self, code: str, due: float):
+        """刷新失败时重新安排"""
+        self._inflight.discard(code)
+        self._schedule(code, due)
+
+    def summary(self, top: int = 5) -> List[Tuple[str, float, float]]:
+        """权重最高的股票: [(代码, 权重, 刷新间隔秒数), ...]"""
+        ranked = sorted(self.weights.items(), key=lambda item: item[1], reverse=True)[:top]
+        return [(code, weight, self.intervals[code]) for code, weight in ranked]
@@ -0,0 +1,104 @@
+"""
+服务注册表
+在进程内保存长生命周期的服务实例，视图直接复用，避免每个请求重新读取配置、创建模拟服务
+"""
+import logging
+import sys
+import threading
+from typing import Callable, Dict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_services: Dict[str, object] = {}
+_calendar_lock = threading.Lock()
+
+
+def _get_or_create(name: str, factory: Callable):
+    """按名称获取单例，首次访问时创建"""
+    service = _services.get(name)
+    if service is None:
+        with _lock:
+            service = _services.get(name)
+            if service is None:
+                service = factory()
+                _services[name] = service
+    return service
+
+
+def get_akshare_service():
+    """获取共享的 AKShareService 实例"""
+    from .akshare_service import AKShareService
+    return _get_or_create('akshare', AKShareService)
+
+
+def get_mock_service():
+    """获取共享的 MockDataService 实例"""
+    from .mock_service import MockDataService
+    return _get_or_create('mock', MockDataService)
+
+
+def get_fetch_backend():
+    """
+    获取共享的上游数据获取后端（见 backends.py）
+    akshare不可用时返回None，下次调用时重新检测
+    """
+    from .backends import create_fetch_backend
+    return _get_or_create('fetch_backend', create_fetch_backend)
+
+
+def get_intraday_store():
+    """获取共享的分时数据存储（见 intraday.py）"""
+    from .intraday import IntradayStore
+    return _get_or_create('intraday', IntradayStore)
+
+
+def get_cold_store():
+    """获取共享的历史价格冷数据存储（见 cold_storage.py）"""
+    from .cold_storage import ColdPriceStore
+    return _get_or_create('cold_prices', ColdPriceStore)
+
+
+def get_trading_calendar():
+    """
+    获取共享的交易日历（见 trading_calendar.py）
+    日历不再覆盖今天（或只能按周末近似）时，每小时最多重新加载一次
+    """
+    from .trading_calendar import load_trading_calendar
+
+    calendar = _services.get('trading_calendar')
+    if calendar is None or calendar.expired():
+        # 加载时会通过注册表获取上游服务，不能持有 _lock
+        with _calendar_lock:
+            calendar = _services.get('trading_calendar')
+            if calendar is None or calendar.expired():
+                calendar = load_trading_calendar()
+                _services['trading_calendar'] = calendar
+    return calendar
+
+
+def warm_up():
+    """
+    预先创建服务实例
+    AKSHARE_PRELOAD 开启时同时导入akshare（适合 gunicorn --preload，由主进程导入后fork共享）
+    """
+    get_akshare_service()
+    get_mock_service()
+
+    if getattr(settings, 'AKSHARE_PRELOAD', False):
+        from .akshare_service import load_akshare
+        load_akshare()
+
+    logger.debug("服务注册表预热完成")
+
+
+def shutdown():
+    """进程退出时释放资源"""
+    # 未使用过连接池时不为此导入requests
+    http_session = sys.modules.get('stock_app.http_session')
+    if http_session is not None:
+        http_session.close_http_session()
+    with _lock:
+        _services.clear()
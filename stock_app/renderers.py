@@ -0,0 +1,65 @@
+"""
+DRF渲染器
+供 views.py 中的视图通过 ?format= 或 Accept 头输出列式JSON/MessagePack
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .wire_format import (
+    COLUMNAR_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, MSGPACK_AVAILABLE,
+    FORMAT_COLUMNAR, FORMAT_MSGPACK, to_columnar, pack_msgpack
+)
+
+# 行级别重复的股票字段，列式输出时只保留一份
+CONSTANT_FIELDS = ('stock_code', 'stock_name')
+
+
+def _constant_fields(rows):
+    """CONSTANT_FIELDS 中在所有行取值都相同的字段（多只股票的结果不提升股票字段）"""
+    return [field for field in CONSTANT_FIELDS if len({row.get(field) for row in rows}) <= 1]
+
+
+def _columnar_payload(data):
+    """列表数据（或分页结果中的 results）转换为列式结构，错误信息等字典原样输出"""
+    if isinstance(data, list):
+        return to_columnar(data, _constant_fields(data))
+    if isinstance(data, dict) and isinstance(data.get('results'), list):
+        payload = dict(data)
+        payload['results'] = to_columnar(data['results'], _constant_fields(data['results']))
+        return payload
+    return data
+
+
+class ColumnarJSONRenderer(BaseRenderer):
+    """列式JSON渲染器"""
+    media_type = COLUMNAR_MEDIA_TYPE
+    format = FORMAT_COLUMNAR
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        payload = _columnar_payload(data)
+        return json.dumps(payload, cls=DjangoJSONEncoder, ensure_ascii=False,
+                          separators=(',', ':')).encode('utf-8')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """MessagePack二进制渲染器"""
+    media_type = MSGPACK_MEDIA_TYPE
+    format = FORMAT_MSGPACK
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return pack_msgpack(_columnar_payload(data))
+
+
+# 批量数据接口可用的渲染器
+BULK_RENDERER_CLASSES = [JSONRenderer, ColumnarJSONRenderer]
+if MSGPACK_AVAILABLE:
+    BULK_RENDERER_CLASSES.append(MessagePackRenderer)
@@ -0,0 +1,200 @@
+"""
+上游数据录制与回放
+录制: 调用上游函数并把返回的DataFrame连同调用参数保存为gzip压缩文件
+回放: 按函数名和参数读取录制文件，可注入延迟、随机错误和限流，
+      使重试、缓存、请求合并等功能可以在没有网络的环境中稳定地压测
+
+录制文件布局:
+    <目录>/<函数名>/<参数摘要>.pkl.gz
+"""
+import gzip
+import hashlib
+import json
+import logging
+import pickle
+import random
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayError(ConnectionError):
+    """回放注入的上游错误"""
+
+
+class ReplayThrottledError(ReplayError):
+    """回放注入的限流错误"""
+
+
+class ReplayMissError(KeyError):
+    """没有与调用参数匹配的录制数据"""
+
+
+def call_digest(function: str, kwargs: Dict) -> str:
+    """调用参数摘要，用作录制文件名"""
+    payload = json.dumps([function, kwargs], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def save_recording(directory, function: str, kwargs: Dict, frame) -> Path:
+    """保存一次调用的返回结果"""
+    path = Path(directory) / function / f"{call_digest(function, kwargs)}.pkl.gz"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    record = {
+        'function': function,
+        'kwargs': kwargs,
+        'recorded_at': datetime.now().isoformat(),
+        'frame': frame,
+    }
+    # 先写临时文件再改名，避免回放方读到写了一半的文件
+    tmp_path = path.with_suffix('.tmp')
+    with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+        pickle.dump(record, f, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp_path.replace(path)
+    return path
+
+
+def load_recording(path) -> Dict:
+    """读取录制文件（仅用于本项目自己录制的可信文件）"""
+    with gzip.open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+class RecordingBackend:
+    """录制后端：透传到上游，并保存每次调用的返回结果"""
+
+    def __init__(self, upstream, directory):
+        self.upstream = upstream
+        self.directory = Path(directory)
+
+    def __getattr__(self, name):
+        func = getattr(self.upstream, name)
+
+        def record(**kwargs):
+            frame = func(**kwargs)
+            path = save_recording(self.directory, name, kwargs, frame)
+            logger.info(f"已录制 {name}{kwargs} -> {path}")
+            return frame
+
+        record.__name__ = name
+        return record
+
+
+class ReplayBackend:
+    """
+    回放后端
+    参数:
+        latency / jitter: 每次调用的基础延迟和随机抖动（秒）
+        error_rate: 随机抛出 ReplayError 的概率
+        throttle_rate: 每秒允许的调用数，0表示不限流
+        throttle_mode: 'delay' 超出时等待令牌，'error' 超出时抛出 ReplayThrottledError
+        seed: 注入错误和抖动的随机种子，保证多次压测结果可复现
+    """
+
+    def __init__(self, directory, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0,
+                 throttle_mode: str = 'delay', seed: int = 0):
+        self.directory = Path(directory)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_mode = throttle_mode
+        self.bucket = TokenBucket(throttle_rate) if throttle_rate else None
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._index: Optional[Dict[str, List[Tuple[Dict, Path]]]] = None
+        self._frames: Dict[Path, object] = {}
+        self.stats = {'calls': 0, 'errors': 0, 'throttled': 0, 'misses': 0}
+
+    def _load_index(self) -> Dict[str, List[Tuple[Dict, Path]]]:
+        """扫描录制目录，建立 函数名 -> [(参数, 文件)] 索引"""
+        with self._index_lock:
+            if self._index is None:
+                self._index = self._scan()
+        return self._index
+
+    def _scan(self) -> Dict[str, List[Tuple[Dict, Path]]]:
+        """读取目录下全部录制文件"""
+        index: Dict[str, List[Tuple[Dict, Path]]] = {}
+        for path in sorted(self.directory.glob('*/*.pkl.gz')):
+            record = load_recording(path)
+            index.setdefault(record['function'], []).append((record['kwargs'], path))
+            self._frames[path] = record['frame']
+        logger.info(f"加载回放数据 {sum(len(v) for v in index.values())} 条: {self.directory}")
+        return index
+
+    def _inject(self, name: str):
+        """按配置注入限流、延迟和错误"""
+        with self._lock:
+            self.stats['calls'] += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = self.error_rate and self._random.random() < self.error_rate
+
+        if self.bucket is not None:
+            if self.throttle_mode == 'error':
+                if not self.bucket.try_acquire():
+                    with self._lock:
+                        self.stats['throttled'] += 1
+                    raise ReplayThrottledError(f"{name}: 请求过于频繁")
+            else:
+                if self.bucket.acquire():
+                    with self._lock:
+                        self.stats['throttled'] += 1
+
+        if delay:
+            time.sleep(delay)
+
+        if fail:
+            with self._lock:
+                self.stats['errors'] += 1
+            raise ReplayError(f"{name}: 注入的上游错误")
+
+    def _find(self, name: str, kwargs: Dict):
+        """查找录制数据：参数完全一致优先，日线可从覆盖该日期范围的录制中截取"""
+        recordings = self._load_index().get(name, [])
+        for recorded_kwargs, path in recordings:
+            if recorded_kwargs == kwargs:
+                return self._frames[path]
+
+        if name == 'stock_zh_a_hist':
+            start, end = kwargs.get('start_date'), kwargs.get('end_date')
+            for recorded_kwargs, path in recordings:
+                same_series = all(
+                    recorded_kwargs.get(key) == kwargs.get(key) for key in ('symbol', 'period', 'adjust')
+                )
+                covers = (
+                    (not recorded_kwargs.get('start_date') or (start and recorded_kwargs['start_date'] <= start)) and
+                    (not recorded_kwargs.get('end_date') or (end and recorded_kwargs['end_date'] >= end))
+                )
+                if same_series and covers:
+                    frame = self._frames[path]
+                    dates = frame['日期'].astype(str).str.replace('-', '')
+                    mask = dates.notna()
+                    if start:
+                        mask &= dates >= start
+                    if end:
+                        mask &= dates <= end
+                    return frame[mask]
+
+        with self._lock:
+            self.stats['misses'] += 1
+        raise ReplayMissError(f"没有 {name}{kwargs} 的录制数据")
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def replay(**kwargs):
+            self._inject(name)
+            return self._find(name, kwargs).copy()
+
+        replay.__name__ = name
+        return replay
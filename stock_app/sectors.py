@@ -0,0 +1,253 @@
+"""
+板块行情汇总
+行业板块和成分股指数的成分股（SectorMember，由 sync_sectors 命令批量同步）在进程内加载为成员数组:
+每条成员关系是一对（板块编号, 股票代码），板块按代码排序后从0编号，同一股票可以属于多个板块。
+
+板块行情不逐个查询数据库，而是把成员数组与全市场快照（spot_snapshot.get_spot_snapshot）对齐后，
+用 np.bincount 按板块编号一次算出所有板块的成分股数、平均涨跌幅、上涨/下跌家数和成交额，
+领涨股由 (板块编号, -涨跌幅) 排序后取每组前几名。结果按（类型, 成员版本, 快照时间片）缓存，
+同一时间片内所有请求共用一次计算
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import SectorMember
+from .registry import get_trading_calendar
+from .spot_snapshot import CompactSnapshot, get_spot_snapshot
+
+logger = logging.getLogger(__name__)
+
+SECTOR_KINDS = (SectorMember.KIND_INDUSTRY, SectorMember.KIND_INDEX)
+
+# sync_sectors 更新成员后递增，各进程据此重新加载
+VERSION_CACHE_KEY = 'sectors:version'
+
+MAX_LEADERS = 20
+
+
+class SectorMap:
+    """一类板块的成员数组"""
+
+    def __init__(self, kind: str, rows: List[tuple], version):
+        """rows: [(板块代码, 板块名称, 股票代码, 股票名称), ...]"""
+        self.kind = kind
+        self.version = version
+        names = {}
+        for sector_code, sector_name, _, _ in rows:
+            names.setdefault(sector_code, sector_name)
+        self.codes = sorted(names)
+        self.names = [names[code] for code in self.codes]
+        self._id_of = {code: i for i, code in enumerate(self.codes)}
+
+        self.member_sector = np.array([self._id_of[row[0]] for row in rows], dtype=np.int64)
+        self.member_codes = np.array([row[2] for row in rows], dtype=str)
+        self.member_names = np.array([row[3] for row in rows], dtype=str)
+        self.loaded_at = time.time()
+
+    def __len__(self):
+        return len(self.codes)
+
+    def sector_id(self, code: str) -> Optional[int]:
+        return self._id_of.get(code)
+
+
+_maps: Dict[str, SectorMap] = {}
+_maps_lock = threading.Lock()
+
+
+def bump_version():
+    """成员变化后调用，使各进程重新加载成员、已缓存的汇总失效"""
+    cache.set(VERSION_CACHE_KEY, time.time(), timeout=None)
+
+
+def _current_version():
+    return cache.get(VERSION_CACHE_KEY) or 0
+
+
+def _is_current(sector_map: Optional[SectorMap], version) -> bool:
+    if sector_map is None or sector_map.version != version:
+        return False
+    return time.time() - sector_map.loaded_at < getattr(settings, 'SECTOR_MAP_TTL', 3600)
+
+
+def get_sector_map(kind: str) -> SectorMap:
+    """
+    进程内缓存的板块成员数组，成员版本变化或超过 SECTOR_MAP_TTL 秒后重新从数据库加载
+    缓存不在进程间共享时（未配置 REDIS_URL）其他进程的 sync_sectors 在 SECTOR_MAP_TTL 内生效
+    """
+    version = _current_version()
+    sector_map = _maps.get(kind)
+    if _is_current(sector_map, version):
+        return sector_map
+
+    with _maps_lock:
+        sector_map = _maps.get(kind)
+        if _is_current(sector_map, version):
+            return sector_map
+        rows = list(SectorMember.objects.filter(kind=kind).order_by('sector_code', 'stock_code').values_list(
+            'sector_code', 'sector_name', 'stock_code', 'stock_name'))
+        sector_map = SectorMap(kind, rows, version)
+        _maps[kind] = sector_map
+        logger.info(f"加载板块成员: {kind} {len(sector_map)} 个板块，{len(rows)} 条成员")
+        return sector_map
+
+
+def _round(value: float, digits: int = 2) -> Optional[float]:
+    return None if not np.isfinite(value) else round(float(value), digits)
+
+
+def _leaders(sector_ids: np.ndarray, change_rate: np.ndarray, sectors: int, limit: int) -> List[np.ndarray]:
+    """每个板块涨幅最大的 limit 条成员（成员下标，按涨跌幅降序），没有行情的成员不参与"""
+    result = [np.array([], dtype=np.int64)] * sectors
+    if limit <= 0:
+        return result
+    candidates = np.flatnonzero(np.isfinite(change_rate))
+    order = candidates[np.lexsort((-change_rate[candidates], sector_ids[candidates]))]
+    grouped = sector_ids[order]
+    starts = np.searchsorted(grouped, np.arange(sectors))
+    rank = np.arange(len(order)) - starts[grouped]
+    picked = order[rank < limit]
+    bounds = np.searchsorted(sector_ids[picked], np.arange(sectors + 1))
+    return [picked[bounds[i]:bounds[i + 1]] for i in range(sectors)]
+
+
+def summarize(sector_map: SectorMap, snapshot: CompactSnapshot, leaders: int = 3) -> List[Dict]:
+    """
+    按快照汇总每个板块的行情，按平均涨跌幅降序
+    平均涨跌幅为成分股等权平均，加权涨跌幅按成交额加权；停牌或不在快照中的成分股不计入涨跌统计
+    """
+    sectors = len(sector_map)
+    if not sectors:
+        return []
+    ids = sector_map.member_sector
+    quote = snapshot.gather(sector_map.member_codes)
+    change_rate = quote['change_rate']
+    priced = np.isfinite(change_rate)
+    change = np.where(priced, change_rate, 0.0)
+    amount = np.where(priced, np.nan_to_num(quote['amount']), 0.0)
+
+    def total(weights=None):
+        return np.bincount(ids, weights=weights, minlength=sectors)
+
+    members = total()
+    priced_count = total(priced.astype(np.float64))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_change = total(change) / priced_count
+        amount_total = total(amount)
+        weighted_change = total(change * amount) / amount_total
+    up = total((change > 0) & priced)
+    down = total((change < 0) & priced)
+    volume = total(quote['volume'].astype(np.float64))
+    top = _leaders(ids, change_rate, sectors, leaders)
+
+    member_names = np.where(quote['found'], quote['name'], sector_map.member_names)
+    rows = []
+    for i in range(sectors):
+        rows.append({
+            'code': sector_map.codes[i],
+            'name': sector_map.names[i],
+            'stocks': int(members[i]),
+            'priced': int(priced_count[i]),
+            'avg_change_rate': _round(avg_change[i]),
+            'weighted_change_rate': _round(weighted_change[i]),
+            'up_count': int(up[i]),
+            'down_count': int(down[i]),
+            'flat_count': int(priced_count[i] - up[i] - down[i]),
+            'volume': int(volume[i]),
+            'amount': _round(amount_total[i]),
+            'leaders': [
+                {
+                    'code': str(sector_map.member_codes[j]),
+                    'name': str(member_names[j]),
+                    'price': _round(quote['price'][j]),
+                    'change_rate': _round(change_rate[j]),
+                }
+                for j in top[i].tolist()
+            ],
+        })
+    rows.sort(key=lambda row: -row['avg_change_rate'] if row['avg_change_rate'] is not None else float('inf'))
+    return rows
+
+
+def _cache_timeout(ttl: float) -> int:
+    # 休市期间快照不变，汇总缓存到下次开市
+    return int(get_trading_calendar().cache_ttl(timezone.now(), max(ttl, 1))) * 2
+
+
+def _as_of(snapshot: CompactSnapshot) -> str:
+    fetched_at = timezone.localtime(datetime.fromtimestamp(snapshot.fetched_at, dt_timezone.utc))
+    return fetched_at.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def get_sector_summary(kind: str, leaders: int = 3) -> Optional[Dict]:
+    """
+    全部板块的行情汇总（带缓存），快照不可用时返回None
+    返回: {'type', 'as_of', 'count', 'results': [每个板块的汇总, ...]}
+    """
+    snapshot = get_spot_snapshot()
+    if snapshot is None:
+        return None
+    sector_map = get_sector_map(kind)
+
+    ttl = getattr(settings, 'SPOT_SNAPSHOT_TTL', 5)
+    key = f"sectors:summary:{kind}:{sector_map.version}:{leaders}:{int(snapshot.fetched_at // max(ttl, 1))}"
+    summary = cache.get(key)
+    if summary is None:
+        results = summarize(sector_map, snapshot, leaders)
+        summary = {'type': kind, 'as_of': _as_of(snapshot), 'count': len(results), 'results': results}
+        cache.set(key, summary, timeout=_cache_timeout(ttl))
+    return summary
+
+
+def get_sector_detail(kind: str, code: str) -> Optional[Dict]:
+    """
+    单个板块的汇总及全部成分股行情（按涨跌幅降序），板块不存在时返回None
+    成分股数为 stock_count，stocks 为成分股列表；快照不可用时成分股行情为空
+    """
+    sector_map = get_sector_map(kind)
+    sector_id = sector_map.sector_id(code)
+    if sector_id is None:
+        return None
+
+    index = np.flatnonzero(sector_map.member_sector == sector_id)
+    codes = sector_map.member_codes[index]
+    snapshot = get_spot_snapshot()
+    if snapshot is None:
+        return {
+            'type': kind, 'code': code, 'name': sector_map.names[sector_id], 'as_of': None, 'stock_count': len(codes),
+            'stocks': [{'code': str(stock), 'name': str(name), 'price': None, 'change_rate': None, 'amount': None}
+                       for stock, name in zip(codes.tolist(), sector_map.member_names[index].tolist())],
+        }
+
+    quote = snapshot.gather(codes)
+    change_rate = quote['change_rate']
+    names = np.where(quote['found'], quote['name'], sector_map.member_names[index])
+    order = np.lexsort((codes, np.where(np.isfinite(change_rate), -change_rate, np.inf)))
+    stocks = [
+        {
+            'code': str(codes[i]),
+            'name': str(names[i]),
+            'price': _round(quote['price'][i]),
+            'change_rate': _round(change_rate[i]),
+            'amount': _round(quote['amount'][i]),
+        }
+        for i in order.tolist()
+    ]
+    summary = next((row for row in (get_sector_summary(kind, 0) or {}).get('results', [])
+                    if row['code'] == code), None)
+    detail = {'type': kind, 'code': code, 'name': sector_map.names[sector_id], 'as_of': _as_of(snapshot),
+              'stock_count': len(stocks)}
+    if summary is not None:
+        # 汇总中的 stocks 是成分股数，详情中改为 stock_count，stocks 为成分股行情列表
+        detail.update({field: value for field, value in summary.items()
+                       if field not in ('code', 'name', 'leaders', 'stocks')})
+    detail['stocks'] = stocks
+    return detail
@@ -1,5 +1,18 @@
+import time
+
 from rest_framework import serializers
-from .models import Stock, StockPrice, StockRealtime
+from . import metrics
+from .models import AlertEvent, AlertRule, Portfolio, Position, Stock, StockPrice, StockRealtime
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    """记录序列化耗时和记录数的列表序列化器"""
+    
+    def to_representation(self, data):
+        start = time.perf_counter()
+        rows = super().to_representation(data)
+        metrics.record_serialization(type(self.child).__name__, time.perf_counter() - start, len(rows))
+        return rows
 
 
 class StockSerializer(serializers.ModelSerializer):
@@ -7,6 +20,7 @@ class StockSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Stock
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'code', 'name', 'market', 'industry', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
@@ -19,6 +33,7 @@ class StockPriceSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = StockPrice
+        list_serializer_class = TimedListSerializer
         fields = [
             'id', 'stock_code', 'stock_name', 'date', 
             'open_price', 'high_price', 'low_price', 'close_price',
@@ -34,6 +49,7 @@ class StockRealtimeSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = StockRealtime
+        list_serializer_class = TimedListSerializer
         fields = [
             'stock_code', 'stock_name', 'current_price', 'change_rate', 
             'change_amount', 'volume', 'amount', 'high_price', 'low_price',
@@ -49,6 +65,9 @@ class StockSearchSerializer(serializers.Serializer):
     current_price = serializers.DecimalField(max_digits=10, decimal_places=2)
     change_rate = serializers.DecimalField(max_digits=6, decimal_places=2)
     market = serializers.CharField()
+    
+    class Meta:
+        list_serializer_class = TimedListSerializer
 
 
 class MarketOverviewSerializer(serializers.Serializer):
@@ -59,3 +78,114 @@ class MarketOverviewSerializer(serializers.Serializer):
     up_count = serializers.IntegerField()
     down_count = serializers.IntegerField()
     flat_count = serializers.IntegerField()
+
+
+class PositionSerializer(serializers.ModelSerializer):
+    """组合持仓序列化器"""
+    
+    class Meta:
+        model = Position
+        fields = ['stock_code', 'quantity', 'cost_price', 'added_at']
+        read_only_fields = ['added_at']
+    
+    def validate_stock_code(self, value):
+        if not (len(value) == 6 and value.isdigit()):
+            raise serializers.ValidationError('股票代码应为6位数字')
+        return value
+    
+    def validate_quantity(self, value):
+        if value < 0:
+            raise serializers.ValidationError('持仓数量不能为负数')
+        return value
+
+
+class PortfolioSerializer(serializers.ModelSerializer):
+    """自选组合序列化器"""
+    positions = PositionSerializer(many=True, read_only=True)
+    
+    class Meta:
+        model = Portfolio
+        fields = ['id', 'name', 'version', 'positions', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'version', 'created_at', 'updated_at']
+
+
+class AlertRuleSerializer(serializers.ModelSerializer):
+    """价格提醒规则序列化器"""
+    
+    class Meta:
+        model = AlertRule
+        fields = [
+            'id', 'stock_code', 'kind', 'threshold', 'note', 'once', 'active',
+            'last_triggered_at', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'last_triggered_at', 'created_at', 'updated_at']
+    
+    def validate_stock_code(self, value):
+        if not (len(value) == 6 and value.isdigit()):
+            raise serializers.ValidationError('股票代码应为6位数字')
+        return value
+    
+    def validate(self, attrs):
+        kind = attrs.get('kind', getattr(self.instance, 'kind', None))
+        threshold = attrs.get('threshold', getattr(self.instance, 'threshold', None))
+        if kind in (AlertRule.KIND_PRICE_ABOVE, AlertRule.KIND_PRICE_BELOW, AlertRule.KIND_MOVE) and threshold <= 0:
+            raise serializers.ValidationError({'threshold': '价格和涨跌幅绝对值的阈值必须大于0'})
+        return attrs
+
+
+class AlertEventSerializer(serializers.ModelSerializer):
+    """提醒记录序列化器"""
+    note = serializers.CharField(source='rule.note', read_only=True)
+    
+    class Meta:
+        model = AlertEvent
+        list_serializer_class = TimedListSerializer
+        fields = ['id', 'rule', 'stock_code', 'kind', 'threshold', 'value', 'note', 'triggered_at']
+
+
+class BacktestRequestSerializer(serializers.Serializer):
+    """回测请求：股票集合由 codes 或 portfolio 指定，sweep 中的参数取值做全组合扫描"""
+    codes = serializers.ListField(child=serializers.RegexField(r'^\d{6}$'), required=False, allow_empty=False)
+    portfolio = serializers.IntegerField(required=False)
+    strategy = serializers.CharField()
+    params = serializers.DictField(child=serializers.IntegerField(min_value=1), required=False, default=dict)
+    sweep = serializers.DictField(
+        child=serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False),
+        required=False, default=dict
+    )
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    cost = serializers.FloatField(min_value=0, max_value=0.05, default=0.0005)
+    
+    def validate_strategy(self, value):
+        from .backtest import STRATEGIES
+        if value not in STRATEGIES:
+            raise serializers.ValidationError(f"不支持的策略，可选: {', '.join(STRATEGIES)}")
+        return value
+    
+    def validate(self, attrs):
+        from django.conf import settings
+        from .backtest import STRATEGIES
+        
+        if not attrs.get('codes') and 'portfolio' not in attrs:
+            raise serializers.ValidationError('需要 codes 或 portfolio')
+        max_symbols = getattr(settings, 'ANALYTICS_MAX_SYMBOLS', 1000)
+        if len(attrs.get('codes') or []) > max_symbols:
+            raise serializers.ValidationError({'codes': f'股票数量不能超过 {max_symbols}'})
+        
+        defaults = STRATEGIES[attrs['strategy']][1]
+        unknown = (set(attrs['params']) | set(attrs['sweep'])) - set(defaults)
+        if unknown:
+            raise serializers.ValidationError(
+                f"{attrs['strategy']} 不支持参数 {', '.join(sorted(unknown))}，可用参数: {', '.join(defaults)}"
+            )
+        combinations = 1
+        for values in attrs['sweep'].values():
+            combinations *= len(values)
+        max_sweep = getattr(settings, 'BACKTEST_MAX_SWEEP', 200)
+        if combinations > max_sweep:
+            raise serializers.ValidationError({'sweep': f'参数组合数 {combinations} 超过上限 {max_sweep}'})
+        
+        if attrs.get('start') and attrs.get('end') and attrs['start'] >= attrs['end']:
+            raise serializers.ValidationError('start 应早于 end')
+        return attrs
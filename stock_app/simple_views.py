@@ -1,20 +1,25 @@
 """
 简化视图 - 避免复杂依赖问题
 """
+from datetime import datetime
 from django.http import JsonResponse
+from django.utils import timezone
 from django.views import View
-from .mock_service import MockDataService
+from .registry import get_intraday_store, get_mock_service
+from .wire_format import build_response
 import logging
 
 logger = logging.getLogger(__name__)
 
+MAX_PAGE_SIZE = 100
+
 
 class SimpleMarketView(View):
     """简化市场概览视图"""
     
     def get(self, request):
         try:
-            mock_service = MockDataService()
+            mock_service = get_mock_service()
             data = mock_service.get_market_overview()
             return JsonResponse(data)
         except Exception as e:
@@ -23,28 +28,39 @@ class SimpleMarketView(View):
 
 
 class SimpleStockListView(View):
-    """简化股票列表视图"""
+    """简化股票列表视图，page 从1开始，page_size 最大 MAX_PAGE_SIZE"""
     
     def get(self, request):
         try:
-            mock_service = MockDataService()
+            # 支持分页，只为当前页的股票获取实时价格
+            try:
+                page_size = int(request.GET.get('page_size', 20))
+                page = int(request.GET.get('page', 1))
+            except ValueError:
+                return JsonResponse({'error': 'page 和 page_size 必须是整数'}, status=400)
+            page = max(page, 1)
+            page_size = min(max(page_size, 1), MAX_PAGE_SIZE)
+            
+            mock_service = get_mock_service()
             stocks = mock_service.get_stock_list()
+            start = (page - 1) * page_size
+            page_stocks = [dict(stock) for stock in stocks[start:start + page_size]]
             
-            # 添加实时价格
-            for stock in stocks:
-                realtime = mock_service.get_stock_realtime(stock['code'])
+            # 添加实时价格（同一份快照批量获取）
+            quotes = mock_service.get_stock_quotes([stock['code'] for stock in page_stocks])
+            for stock, realtime in zip(page_stocks, quotes):
                 if realtime:
                     stock.update({
                         'current_price': realtime['current_price'],
                         'change_rate': realtime['change_rate']
                     })
             
-            return JsonResponse({
-                'results': stocks,
+            return build_response(request, {
+                'results': page_stocks,
                 'count': len(stocks),
-                'page': 1,
-                'page_size': len(stocks)
-            })
+                'page': page,
+                'page_size': page_size
+            }, rows_key='results')
         except Exception as e:
             logger.error(f"股票列表错误: {str(e)}")
             return JsonResponse({'error': str(e)}, status=500)
@@ -59,7 +75,7 @@ class SimpleSearchView(View):
             if not keyword:
                 return JsonResponse({'error': '请提供搜索关键词'}, status=400)
             
-            mock_service = MockDataService()
+            mock_service = get_mock_service()
             results = mock_service.search_stock(keyword)
             
             return JsonResponse(results, safe=False)
@@ -73,7 +89,7 @@ class SimpleStockDetailView(View):
     
     def get(self, request, code):
         try:
-            mock_service = MockDataService()
+            mock_service = get_mock_service()
             
             # 查找股票
             stocks = mock_service.get_stock_list()
@@ -93,7 +109,7 @@ class SimpleRealtimeView(View):
     
     def get(self, request, code):
         try:
-            mock_service = MockDataService()
+            mock_service = get_mock_service()
             realtime = mock_service.get_stock_realtime(code)
             
             if not realtime:
@@ -106,15 +122,72 @@ class SimpleRealtimeView(View):
 
 
 class SimpleHistoryView(View):
-    """简化历史数据视图"""
+    """简化历史数据视图，adjust=qfq/hfq 返回前复权/后复权价格（默认不复权）"""
     
     def get(self, request, code):
+        from .adjust import ADJUST_MODES, adjust_rows
+        
+        adjust = request.GET.get('adjust', '')
+        if adjust not in ADJUST_MODES:
+            return JsonResponse({'error': 'adjust 只支持 qfq、hfq 或留空'}, status=400)
+        
         try:
-            mock_service = MockDataService()
+            mock_service = get_mock_service()
             history = mock_service.get_stock_history(code)
+            if adjust:
+                history = adjust_rows(history, mock_service.get_adjust_factors(code), adjust)
+            for row in history:
+                row['stock_code'] = code
             
-            return JsonResponse(history, safe=False)
+            return build_response(request, history, constant_fields=['stock_code'])
         except Exception as e:
             logger.error(f"历史数据错误: {str(e)}")
             return JsonResponse({'error': str(e)}, status=500)
 
+
+
+class SimpleIntradayView(View):
+    """
+    分时K线视图
+    数据来自 collect_intraday 采集的快照（见 intraday.py），不经过数据库
+    参数: interval - 1m/5m/15m/30m，默认1m；date - YYYYMMDD，默认今天（TIME_ZONE 时区）；K线时间按市场时区显示
+    """
+    
+    def get(self, request, code):
+        from .intraday import INTERVALS
+        from .trading_calendar import MARKET_TIMEZONE
+        
+        interval = request.GET.get('interval', '1m')
+        if interval not in INTERVALS:
+            return JsonResponse({'error': f"interval 只支持 {', '.join(INTERVALS)}"}, status=400)
+        try:
+            day = datetime.strptime(request.GET['date'], '%Y%m%d').date() if 'date' in request.GET else timezone.localdate()
+        except ValueError:
+            return JsonResponse({'error': '日期格式应为YYYYMMDD'}, status=400)
+        
+        try:
+            bars = get_intraday_store().get_bars(code, day, interval)
+            rows = [
+                {
+                    'time': datetime.fromtimestamp(ts, MARKET_TIMEZONE).strftime('%H:%M'),
+                    'open': round(open_price, 2),
+                    'high': round(high_price, 2),
+                    'low': round(low_price, 2),
+                    'close': round(close_price, 2),
+                    'volume': volume,
+                    'amount': round(amount, 2),
+                }
+                for ts, open_price, high_price, low_price, close_price, volume, amount in zip(
+                    bars['ts'].tolist(), bars['open'].tolist(), bars['high'].tolist(), bars['low'].tolist(),
+                    bars['close'].tolist(), bars['volume'].tolist(), bars['amount'].tolist()
+                )
+            ]
+            return build_response(request, {
+                'code': code,
+                'date': day.isoformat(),
+                'interval': interval,
+                'bars': rows,
+            }, rows_key='bars')
+        except Exception as e:
+            logger.error(f"分时数据错误: {str(e)}")
+            return JsonResponse({'error': str(e)}, status=500)
@@ -0,0 +1,128 @@
+"""
+请求合并（single-flight）
+相同键的并发调用只执行一次，其余调用方等待并共享结果，
+同时支持多线程调用和同一事件循环内的异步任务
+"""
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from functools import partial
+from typing import Any, Callable, Dict, Hashable, List
+
+from asgiref.sync import sync_to_async
+
+logger = logging.getLogger(__name__)
+
+# 进程内创建的全部合并器，供指标导出
+_flights: List['SingleFlight'] = []
+
+
+class _Call:
+    """一次进行中的调用"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """请求合并器"""
+
+    def __init__(self, name: str = 'default'):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._async_calls: Dict[Hashable, asyncio.Future] = {}
+        # 按键的第一个元素（通常是方法名）分别统计
+        self._counters = defaultdict(lambda: {'calls': 0, 'executions': 0, 'coalesced': 0})
+        _flights.append(self)
+
+    @staticmethod
+    def _label(key) -> str:
+        """统计标签：元组键取第一个元素"""
+        if isinstance(key, tuple) and key:
+            return str(key[0])
+        return str(key)
+
+    def do(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        """
+        执行调用，键相同的并发调用共享同一次执行的结果或异常
+        """
+        label = self._label(key)
+        with self._lock:
+            counter = self._counters[label]
+            counter['calls'] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                counter['coalesced'] += 1
+                leader = False
+            else:
+                counter['executions'] += 1
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            logger.debug(f"合并请求: {key}")
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    async def ado(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        """
+        异步执行同步函数
+        同一事件循环内的并发任务共享一个Future，实际调用在线程池中通过 do() 执行，
+        因此也会与其他线程中的同键调用合并；等待方被取消（客户端断开、超时）时不会取消共享的调用
+        """
+        loop = asyncio.get_running_loop()
+        async_key = (loop, key)
+
+        with self._lock:
+            future = self._async_calls.get(async_key)
+            if future is not None:
+                counter = self._counters[self._label(key)]
+                counter['calls'] += 1
+                counter['coalesced'] += 1
+
+        if future is None:
+            call = sync_to_async(partial(self.do, key, func, *args, **kwargs), thread_sensitive=False)
+            future = asyncio.ensure_future(call())
+            with self._lock:
+                self._async_calls[async_key] = future
+            future.add_done_callback(lambda _: self._async_calls.pop(async_key, None))
+        else:
+            logger.debug(f"合并异步请求: {key}")
+
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        返回统计信息
+        返回: {'stock_zh_a_spot_em': {'calls': 10, 'executions': 2, 'coalesced': 8}, ...}
+        """
+        with self._lock:
+            return {label: dict(counter) for label, counter in self._counters.items()}
+
+    def reset_stats(self):
+        """清空统计信息"""
+        with self._lock:
+            self._counters.clear()
+
+
+def all_stats() -> Dict[str, Dict[str, Dict[str, int]]]:
+    """全部合并器的统计，按合并器名称分组"""
+    return {flight.name: flight.stats() for flight in _flights}
@@ -0,0 +1,369 @@
+"""
+紧凑的全市场快照
+stock_zh_a_spot_em 的DataFrame由object列（中文字符串）和二十多个float64列组成，每个worker各缓存一份。
+这里把组合估值、板块汇总等用到的列编码为一块连续的二进制数据:
+
+    头部（64字节）  magic、格式版本、股票数、获取时间、名称区长度、发布版本号、已被取代标记
+    code           S6，按代码升序（定长ASCII，取代object/Unicode字符串）
+    price/pre_close/change_rate/open/high/low   float32
+    volume         int64
+    amount         float64（成交额数值大，float32精度不够）
+    name_offsets   uint32[n+1]，名称在名称区中的起止位置
+    names          全部名称的UTF-8拼接，用到时才按下标解码
+
+各列按8字节对齐，读取时用 np.frombuffer 直接映射，不复制数据。
+
+采集进程（collect_intraday）把每次获取的快照发布为一个新的版本文件（spot_snapshot.0000000042.bin，除头部的已被取代标记外写入后不再修改），
+再把 SPOT_SNAPSHOT_FILE 符号链接原子替换（rename）为指向新版本，最后在上一版本的头部置位“已被取代”标记。
+接口worker以只读mmap方式映射链接指向的版本：同一台机器上所有worker共享操作系统页缓存中的同一份数据；
+每次使用前只读一下已映射头部中的标记（一次内存读取，没有系统调用），被取代时才重新打开链接映射新版本。
+旧版本保留 KEEP_VERSIONS 个后删除，已映射的worker不受影响。
+文件不存在或已过期（SPOT_SHARED_MAX_AGE）时各worker自行获取，同样以紧凑格式保存在进程内
+"""
+import logging
+import mmap
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .registry import get_akshare_service, get_trading_calendar
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'SPOTSNAP'
+FORMAT_VERSION = 2
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('format', '<u4'),
+    ('count', '<u4'),
+    ('fetched_at', '<f8'),
+    ('names_size', '<u8'),
+    ('version', '<u8'),
+    ('superseded', '<u4'),
+    ('reserved', 'V20'),
+])
+HEADER_SIZE = HEADER_DTYPE.itemsize
+# 版本文件发布后唯一会被修改的字段
+SUPERSEDED_OFFSET = HEADER_DTYPE.fields['superseded'][1]
+
+# 保留的旧版本数，读取方在打开链接和映射文件之间不会遇到已删除的版本
+KEEP_VERSIONS = 3
+
+# 共享快照不可用时，重新尝试打开的最短间隔（秒）
+RETRY_INTERVAL = 1.0
+
+# (列名, 类型)，name_offsets 有 count + 1 个元素
+COLUMNS = [
+    ('code', np.dtype('S6')),
+    ('price', np.dtype('<f4')),
+    ('pre_close', np.dtype('<f4')),
+    ('change_rate', np.dtype('<f4')),
+    ('open', np.dtype('<f4')),
+    ('high', np.dtype('<f4')),
+    ('low', np.dtype('<f4')),
+    ('volume', np.dtype('<i8')),
+    ('amount', np.dtype('<f8')),
+    ('name_offsets', np.dtype('<u4')),
+]
+
+# 按股票取出的行情字段
+QUOTE_FIELDS = ('price', 'pre_close', 'change_rate', 'open', 'high', 'low', 'volume', 'amount')
+
+ALIGNMENT = 8
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _layout(count: int, names_size: int) -> Tuple[Dict[str, Tuple[int, np.dtype, int]], int]:
+    """各列的 (偏移, 类型, 元素数) 以及名称区的偏移；总长度 = 名称区偏移 + names_size"""
+    columns = {}
+    offset = HEADER_SIZE
+    for name, dtype in COLUMNS:
+        length = count + 1 if name == 'name_offsets' else count
+        columns[name] = (offset, dtype, length)
+        offset = _align(offset + dtype.itemsize * length)
+    return columns, offset
+
+
+def encode_snapshot(arrays: Dict[str, np.ndarray], fetched_at: float, version: int = 0) -> bytearray:
+    """
+    把 get_spot_arrays 的结果编码为紧凑格式
+    arrays: {'code', 'name', 'price', 'pre_close', 'change_rate', 'open', 'high', 'low', 'volume', 'amount'}
+    """
+    codes = np.asarray(arrays['code'], dtype=str)
+    order = np.argsort(codes, kind='stable')
+    count = len(codes)
+
+    names = [str(name).encode('utf-8') for name in np.asarray(arrays['name'])[order].tolist()]
+    offsets = np.zeros(count + 1, dtype=np.uint32)
+    np.cumsum([len(name) for name in names], out=offsets[1:])
+    blob = b''.join(names)
+
+    columns, names_at = _layout(count, len(blob))
+    buffer = bytearray(names_at + len(blob))
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header[0] = (MAGIC, FORMAT_VERSION, count, fetched_at, len(blob), version, 0, b'')
+    buffer[:HEADER_SIZE] = header.tobytes()
+
+    values = {
+        'code': np.char.encode(codes[order], 'ascii', 'replace'),
+        'name_offsets': offsets,
+    }
+    for name in QUOTE_FIELDS:
+        values[name] = np.asarray(arrays[name])[order]
+    for name, (offset, dtype, length) in columns.items():
+        np.frombuffer(buffer, dtype=dtype, count=length, offset=offset)[:] = values[name]
+    buffer[names_at:] = blob
+    return buffer
+
+
+class CompactSnapshot:
+    """紧凑格式快照的只读视图，buffer 可以是 bytes、bytearray 或 mmap"""
+
+    def __init__(self, buffer, source: str = 'private'):
+        header = np.frombuffer(buffer, dtype=HEADER_DTYPE, count=1)[0]
+        if header['magic'] != MAGIC or header['format'] != FORMAT_VERSION:
+            raise ValueError('不是可识别的快照格式')
+        self.count = int(header['count'])
+        self.fetched_at = float(header['fetched_at'])
+        self.version = int(header['version'])
+        self.source = source
+        self.buffer = buffer
+
+        columns, names_at = _layout(self.count, int(header['names_size']))
+        self.nbytes = names_at + int(header['names_size'])
+        if len(buffer) < self.nbytes:
+            raise ValueError('快照数据不完整')
+        self.columns = {
+            name: np.frombuffer(buffer, dtype=dtype, count=length, offset=offset)
+            for name, (offset, dtype, length) in columns.items()
+        }
+        self.codes = self.columns['code']
+        self._names = memoryview(buffer)[names_at:self.nbytes]
+        self._all_names = None
+        # 直接读映射中的标记，发布新版本后无需系统调用即可发现
+        self._superseded = np.frombuffer(buffer, dtype='<u4', count=1, offset=SUPERSEDED_OFFSET)
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], fetched_at: float) -> 'CompactSnapshot':
+        return cls(encode_snapshot(arrays, fetched_at))
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def superseded(self) -> bool:
+        """共享快照是否已有更新的版本"""
+        return bool(self._superseded[0])
+
+    def names(self, index: np.ndarray) -> np.ndarray:
+        """按下标解码股票名称"""
+        offsets = self.columns['name_offsets']
+        return np.array([bytes(self._names[offsets[i]:offsets[i + 1]]).decode('utf-8')
+                         for i in np.asarray(index).tolist()], dtype=str)
+
+    def all_names(self) -> np.ndarray:
+        """全部股票名称（按代码顺序），首次使用时解码"""
+        if self._all_names is None:
+            offsets = self.columns['name_offsets'].tolist()
+            blob = bytes(self._names)
+            self._all_names = np.array([blob[offsets[i]:offsets[i + 1]].decode('utf-8')
+                                        for i in range(self.count)], dtype=str)
+        return self._all_names
+
+    def gather(self, codes: List[str]) -> Dict[str, np.ndarray]:
+        """
+        取出指定股票的快照数据，顺序与 codes 一致（浮点列转为float64）
+        返回的 found 标记代码是否在快照中，不在快照中的股票浮点字段为NaN、整数字段为0、名称为空
+        """
+        wanted = np.char.encode(np.asarray(codes, dtype=str), 'ascii', 'replace') if len(codes) else self.codes[:0]
+        if not self.count:
+            result = {'found': np.zeros(len(wanted), dtype=bool), 'name': np.full(len(wanted), '')}
+            for name in QUOTE_FIELDS:
+                result[name] = np.zeros(len(wanted), dtype=np.int64) if name == 'volume' else np.full(len(wanted), np.nan)
+            return result
+
+        index = np.minimum(np.searchsorted(self.codes, wanted), self.count - 1)
+        found = self.codes[index] == wanted
+        result = {'found': found, 'name': np.where(found, self.names(index), '')}
+        for name in QUOTE_FIELDS:
+            values = self.columns[name][index]
+            if values.dtype.kind == 'f':
+                result[name] = np.where(found, values.astype(np.float64), np.nan)
+            else:
+                result[name] = np.where(found, values, 0)
+        return result
+
+
+# ----------------------------------------------------------------------
+# 共享快照文件
+# ----------------------------------------------------------------------
+def _shared_path() -> Path:
+    return Path(getattr(settings, 'SPOT_SNAPSHOT_FILE', settings.BASE_DIR / 'spot_snapshot.bin'))
+
+
+def _version_path(path: Path, version: int) -> Path:
+    return path.with_name(f"{path.stem}.{version:010d}{path.suffix}")
+
+
+def _list_versions(path: Path) -> List[Tuple[int, Path]]:
+    """已发布的版本文件，按版本号升序"""
+    pattern = re.compile(rf"{re.escape(path.stem)}\.(\d{{10}}){re.escape(path.suffix)}$")
+    versions = []
+    for entry in path.parent.iterdir():
+        match = pattern.match(entry.name)
+        if match:
+            versions.append((int(match.group(1)), entry))
+    return sorted(versions)
+
+
+def _mark_superseded(path: Path):
+    """置位版本文件头部的已被取代标记，映射了该版本的worker直接从页缓存看到变化"""
+    with open(path, 'r+b') as f:
+        f.seek(SUPERSEDED_OFFSET)
+        f.write((1).to_bytes(4, 'little'))
+
+
+def publish_snapshot(arrays: Dict[str, np.ndarray], fetched_at: Optional[float] = None) -> int:
+    """
+    发布新版本的共享快照，返回版本号
+    写入新的版本文件后原子替换 SPOT_SNAPSHOT_FILE 链接，再标记旧版本已被取代并删除超出 KEEP_VERSIONS 的旧版本
+    """
+    path = _shared_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    previous = _list_versions(path)
+    version = previous[-1][0] + 1 if previous else 1
+
+    target = _version_path(path, version)
+    temp = target.with_name(f".{target.name}.tmp")
+    with open(temp, 'wb') as f:
+        f.write(encode_snapshot(arrays, fetched_at or time.time(), version))
+    os.replace(temp, target)
+
+    link = path.with_name(f".{path.name}.{os.getpid()}.link")
+    link.unlink(missing_ok=True)
+    os.symlink(target.name, link)
+    os.replace(link, path)
+
+    # 先切换链接再标记，worker看到标记后重新打开链接时一定得到新版本
+    expired = len(previous) - (KEEP_VERSIONS - 1)
+    for i, (_, old) in enumerate(previous):
+        try:
+            _mark_superseded(old)
+            if i < expired:
+                old.unlink()
+        except OSError as e:
+            logger.warning(f"清理旧版本快照 {old} 失败: {str(e)}")
+    # 本进程之后的读取立即打开新版本
+    global _retry_at
+    _retry_at = 0.0
+    return version
+
+
+_shared: Optional[CompactSnapshot] = None
+_shared_lock = threading.Lock()
+_retry_at = 0.0
+
+
+def read_shared_snapshot() -> Optional[CompactSnapshot]:
+    """
+    当前版本的共享快照，从未成功映射过时返回None
+    已映射的版本未被取代时直接返回（只读头部标记）；被取代或尚未映射时重新打开链接，
+    打开失败时继续返回已映射的版本，RETRY_INTERVAL 秒内不再尝试
+    """
+    global _shared, _retry_at
+    shared = _shared
+    if shared is not None and not shared.superseded:
+        return shared
+
+    with _shared_lock:
+        shared = _shared
+        if (shared is not None and not shared.superseded) or time.monotonic() < _retry_at:
+            return shared
+        path = _shared_path()
+        try:
+            # 打开时解析链接，得到当前版本
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            snapshot = CompactSnapshot(mapped, source='shared')
+        except FileNotFoundError:
+            _retry_at = time.monotonic() + RETRY_INTERVAL
+            return shared
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取共享快照 {path} 失败: {str(e)}")
+            _retry_at = time.monotonic() + RETRY_INTERVAL
+            return shared
+        # 旧的映射在没有引用后由垃圾回收释放
+        _shared = snapshot
+        return snapshot
+
+
+# ----------------------------------------------------------------------
+# 接口进程使用的快照
+# ----------------------------------------------------------------------
+_snapshot: Optional[CompactSnapshot] = None
+_snapshot_lock = threading.Lock()
+
+
+def _is_fresh(snapshot: Optional[CompactSnapshot], ttl: float) -> bool:
+    """开市时 ttl 秒内、休市时最近一次收市之后获取的快照仍然有效"""
+    if snapshot is None:
+        return False
+    return snapshot.fetched_at >= get_trading_calendar().fresh_since(timezone.now(), ttl).timestamp()
+
+
+def get_shared_snapshot() -> Optional[CompactSnapshot]:
+    """采集进程发布的共享快照，不存在或超过 SPOT_SHARED_MAX_AGE 秒未更新时返回None"""
+    shared = read_shared_snapshot()
+    return shared if _is_fresh(shared, getattr(settings, 'SPOT_SHARED_MAX_AGE', 60)) else None
+
+
+def get_spot_snapshot() -> Optional[CompactSnapshot]:
+    """
+    获取全市场快照：优先使用采集进程写入的共享快照（SPOT_SHARED_MAX_AGE 秒内有效），
+    否则使用进程内缓存的快照（SPOT_SNAPSHOT_TTL 秒内有效），过期时重新获取（休市期间不请求上游）
+    同一时间只有一个线程刷新；刷新失败时继续使用旧快照
+    """
+    global _snapshot
+    shared = get_shared_snapshot()
+    if shared is not None:
+        return shared
+
+    ttl = getattr(settings, 'SPOT_SNAPSHOT_TTL', 5)
+    snapshot = _snapshot
+    if _is_fresh(snapshot, ttl):
+        return snapshot
+
+    with _snapshot_lock:
+        snapshot = _snapshot
+        if _is_fresh(snapshot, ttl):
+            return snapshot
+        arrays = get_akshare_service().get_spot_arrays()
+        if arrays is None:
+            logger.warning('全市场快照刷新失败，继续使用旧快照')
+            return snapshot or read_shared_snapshot()
+        _snapshot = CompactSnapshot.from_arrays(arrays, time.time())
+        return _snapshot
+
+
+def snapshot_memory() -> Dict[str, int]:
+    """本进程持有的快照字节数：{'shared': 映射的共享快照, 'private': 进程内快照}"""
+    return {
+        'shared': _shared.nbytes if _shared is not None else 0,
+        'private': _snapshot.nbytes if _snapshot is not None else 0,
+    }
+
+
+def shared_version() -> int:
+    """本进程映射的共享快照版本号，未映射时为0"""
+    return _shared.version if _shared is not None else 0
@@ -0,0 +1,508 @@
+"""
+合成行情生成器
+按随机种子生成可复现的大规模模拟市场：数千只股票、多年日线（随机游走OHLCV），
+以及与 ak.stock_zh_a_spot_em / ak.stock_zh_a_hist 列结构一致的DataFrame，
+供模拟数据服务、压测和离线测试使用
+
+- 日线收益率矩阵（交易日 × 股票）一次性批量生成，单只股票的历史只是其中一列
+- 收盘价序列以最近一个交易日的收盘价（即实时行情的昨收）为锚点倒推，两者保持一致
+- 实时快照按时间片生成，同一时间片内同一股票的报价不变；当天的分钟走势由种子和日期确定，
+  快照取交易日历中已进行的连续竞价分钟处的价格，最高/最低、成交量和成交额都是开盘以来的累计值
+- 部分股票每年除权除息一次：日线为不复权价格（除权日价格下跌），复权因子由 adjust_factors 提供
+"""
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .trading_calendar import MARKET_TIMEZONE, fallback_calendar
+
+# 保留常见股票，便于演示和测试
+KNOWN_STOCKS = [
+    ('000001', '平安银行', 11.5),
+    ('000002', '万科A', 7.8),
+    ('600000', '浦发银行', 8.6),
+    ('600036', '招商银行', 34.2),
+    ('000858', '五粮液', 132.0),
+    ('600519', '贵州茅台', 1520.0),
+    ('000725', '京东方A', 4.2),
+    ('600276', '恒瑞医药', 45.5),
+    ('300059', '东方财富', 15.3),
+    ('002415', '海康威视', 31.8),
+]
+
+# (代码前缀, 可用号段数, 市场, 涨跌停幅度)
+CODE_BOARDS = [
+    ('600', 1000, 'SH', 0.10),
+    ('601', 1000, 'SH', 0.10),
+    ('603', 1000, 'SH', 0.10),
+    ('688', 1000, 'SH', 0.20),
+    ('000', 1000, 'SZ', 0.10),
+    ('002', 1000, 'SZ', 0.10),
+    ('300', 1000, 'SZ', 0.20),
+]
+
+_NAME_PREFIXES = list('华中东南西北天金银海江山新宏泰恒安瑞嘉鼎盛万国科信联达')
+_NAME_MIDDLES = list('创远通隆兴利丰和祥源辰光明泽润云')
+_NAME_SUFFIXES = ['科技', '股份', '医药', '电子', '能源', '银行', '证券', '地产', '材料',
+                  '智能', '控股', '传媒', '汽车', '化工', '食品', '机械', '电气', '环保']
+
+# 与 ak.stock_zh_a_spot_em 返回结果一致的列
+SPOT_COLUMNS = [
+    '序号', '代码', '名称', '最新价', '涨跌幅', '涨跌额', '成交量', '成交额', '振幅',
+    '最高', '最低', '今开', '昨收', '量比', '换手率', '市盈率-动态', '市净率',
+    '总市值', '流通市值', '涨速', '5分钟涨跌', '60日涨跌幅', '年初至今涨跌幅',
+]
+
+# 与 ak.stock_zh_a_hist 返回结果一致的列
+HIST_COLUMNS = [
+    '日期', '股票代码', '开盘', '收盘', '最高', '最低', '成交量', '成交额',
+    '振幅', '涨跌幅', '涨跌额', '换手率',
+]
+
+# 与 ak.stock_zh_index_spot_em 返回结果一致的列
+INDEX_COLUMNS = [
+    '序号', '代码', '名称', '最新价', '涨跌幅', '涨跌额', '成交量', '成交额',
+    '振幅', '最高', '最低', '今开', '昨收', '量比',
+]
+
+INDICES = {
+    'sh000001': ('000001', '上证指数', 3200.0),
+    'sz399001': ('399001', '深证成指', 10500.0),
+}
+
+# 行业板块（板块代码, 板块名称），与 ak.stock_board_industry_name_em 的板块一致
+INDUSTRIES = [
+    ('BK0475', '银行'), ('BK0473', '证券'), ('BK0474', '保险'), ('BK0451', '房地产开发'),
+    ('BK0477', '酿酒行业'), ('BK0438', '食品饮料'), ('BK0465', '化学制药'), ('BK1040', '中药'),
+    ('BK1041', '医疗器械'), ('BK1036', '半导体'), ('BK1037', '消费电子'), ('BK1038', '光学光电子'),
+    ('BK0735', '计算机设备'), ('BK0737', '软件开发'), ('BK0448', '通信设备'), ('BK1029', '汽车整车'),
+    ('BK0481', '汽车零部件'), ('BK0428', '电力行业'), ('BK1031', '光伏设备'), ('BK1033', '电池'),
+    ('BK0538', '化学制品'), ('BK0479', '钢铁行业'), ('BK0478', '有色金属'), ('BK0437', '煤炭行业'),
+    ('BK0739', '工程机械'), ('BK0456', '家电行业'), ('BK0486', '文化传媒'), ('BK0450', '航运港口'),
+    ('BK0728', '环保行业'), ('BK0457', '电网设备'),
+]
+
+# 已知股票所属的行业
+KNOWN_INDUSTRIES = {
+    '000001': '银行', '000002': '房地产开发', '600000': '银行', '600036': '银行', '000858': '酿酒行业',
+    '600519': '酿酒行业', '000725': '光学光电子', '600276': '化学制药', '300059': '证券', '002415': '计算机设备',
+}
+
+# 成分股指数：代码 -> (名称, 市场（None 为沪深两市）, 按流通市值排名的起止位置)
+CONSTITUENT_INDICES = {
+    '000016': ('上证50', 'SH', 0, 50),
+    '000300': ('沪深300', None, 0, 300),
+    '000905': ('中证500', None, 300, 800),
+    '000852': ('中证1000', None, 800, 1800),
+}
+
+
+class SyntheticMarket:
+    """可复现的合成市场"""
+
+    def __init__(self, size: int = 5000, seed: int = 42, history_days: int = 750,
+                 snapshot_interval: int = 60, as_of: Optional[date] = None, calendar=None):
+        """
+        参数:
+            size: 股票数量
+            seed: 随机种子，相同种子生成完全相同的市场
+            history_days: 日线历史的交易日数量
+            snapshot_interval: 实时快照的时间片长度（秒）
+            as_of: 行情日期，默认今天；历史日线截止到该日期之前的最后一个工作日
+            calendar: 实时快照使用的交易日历（TradingCalendar），默认按周一至周五近似，与日线一致
+        """
+        self.size = max(size, len(KNOWN_STOCKS))
+        self.seed = seed
+        self.history_days = history_days
+        self.snapshot_interval = snapshot_interval
+        self.as_of = as_of or date.today()
+        self.calendar = calendar or fallback_calendar(self.as_of)
+
+        self._lock = threading.Lock()
+        self._panel = None
+        self._snapshot: Optional[Tuple[int, Dict[str, np.ndarray]]] = None
+
+        self._build_universe()
+
+    # ------------------------------------------------------------------
+    # 股票池
+    # ------------------------------------------------------------------
+    def _build_universe(self):
+        """生成股票代码、名称及每只股票的价格、波动率、成交量参数"""
+        rng = np.random.default_rng([self.seed, 0])
+        n_known = len(KNOWN_STOCKS)
+        n_generated = self.size - n_known
+
+        # 从各板块号段中无放回抽取代码，排除已知股票
+        known_codes = {code for code, _, _ in KNOWN_STOCKS}
+        pool = [f"{prefix}{i:03d}" for prefix, count, _, _ in CODE_BOARDS for i in range(1, count)]
+        pool = np.array([code for code in pool if code not in known_codes])
+        if n_generated > len(pool):
+            raise ValueError(f"合成市场最多支持 {len(pool) + n_known} 只股票")
+        generated = np.sort(rng.choice(pool, size=n_generated, replace=False))
+
+        self.codes = np.concatenate([np.array([c for c, _, _ in KNOWN_STOCKS]), generated])
+
+        prefixes = rng.integers(0, len(_NAME_PREFIXES), n_generated)
+        middles = rng.integers(0, len(_NAME_MIDDLES), n_generated)
+        suffixes = rng.integers(0, len(_NAME_SUFFIXES), n_generated)
+        generated_names = [
+            _NAME_PREFIXES[p] + _NAME_MIDDLES[m] + _NAME_SUFFIXES[s]
+            for p, m, s in zip(prefixes, middles, suffixes)
+        ]
+        self.names = np.array([n for _, n, _ in KNOWN_STOCKS] + generated_names)
+
+        board_markets = {prefix: (market, limit) for prefix, _, market, limit in CODE_BOARDS}
+        prefixes_of = np.array([code[:3] for code in self.codes])
+        self.markets = np.array([board_markets[p][0] for p in prefixes_of])
+        self.limits = np.array([board_markets[p][1] for p in prefixes_of])
+
+        # 昨收价：对数正态分布，中位数约15元
+        base = np.round(np.exp(rng.normal(np.log(15), 0.8, self.size)), 2)
+        base[:n_known] = [price for _, _, price in KNOWN_STOCKS]
+        self.pre_close = np.maximum(base, 1.0)
+
+        self.volatility = rng.uniform(0.01, 0.04, self.size)          # 日波动率
+        self.drift = rng.normal(0.0002, 0.0005, self.size)            # 日漂移
+        self.avg_volume = np.exp(rng.normal(np.log(1e5), 1.0, self.size))  # 平均成交量（手）
+        self.float_shares = np.exp(rng.normal(np.log(5e8), 1.0, self.size))  # 流通股本（股）
+        self.pe = rng.uniform(5, 80, self.size)
+        self.pb = rng.uniform(0.5, 10, self.size)
+
+        # 行业：已知股票按实际行业，其余随机分配（独立的随机数流，不影响其他参数）
+        industry_rng = np.random.default_rng([self.seed, 4])
+        industry_of = {name: i for i, (_, name) in enumerate(INDUSTRIES)}
+        self.industries = industry_rng.integers(0, len(INDUSTRIES), self.size)
+        self.industries[:n_known] = [industry_of[KNOWN_INDUSTRIES[code]] for code, _, _ in KNOWN_STOCKS]
+
+        self.index_of = {code: i for i, code in enumerate(self.codes)}
+
+    def stock_list(self) -> List[Dict]:
+        """股票列表: [{'code': '000001', 'name': '平安银行', 'market': 'SZ'}, ...]"""
+        return [
+            {'code': code, 'name': name, 'market': market}
+            for code, name, market in zip(self.codes.tolist(), self.names.tolist(), self.markets.tolist())
+        ]
+
+    def industry_members(self, name: str) -> np.ndarray:
+        """行业板块的成分股下标，板块不存在时为空数组"""
+        for i, (_, industry) in enumerate(INDUSTRIES):
+            if industry == name:
+                return np.flatnonzero(self.industries == i)
+        return np.array([], dtype=np.int64)
+
+    def index_members(self, symbol: str) -> np.ndarray:
+        """成分股指数的成分股下标（按流通市值排名取区间），指数不存在时为空数组"""
+        if symbol not in CONSTITUENT_INDICES:
+            return np.array([], dtype=np.int64)
+        _, market, start, stop = CONSTITUENT_INDICES[symbol]
+        candidates = np.arange(self.size) if market is None else np.flatnonzero(self.markets == market)
+        ranked = candidates[np.argsort(-(self.pre_close * self.float_shares)[candidates], kind='stable')]
+        return np.sort(ranked[start:stop])
+
+    # ------------------------------------------------------------------
+    # 日线
+    # ------------------------------------------------------------------
+    def sessions(self) -> np.ndarray:
+        """历史日线的交易日序列（datetime64[D]，升序，仅排除周末）"""
+        last = np.busday_offset(np.datetime64(self.as_of - timedelta(days=1), 'D'), 0, roll='backward')
+        return np.busday_offset(last, -np.arange(self.history_days - 1, -1, -1), roll='backward')
+
+    def trade_dates(self) -> np.ndarray:
+        """交易日历（datetime64[D]，1990-12-19 至今年年底的周一至周五），与 sessions 一致"""
+        days = np.arange(np.datetime64('1990-12-19'), np.datetime64(f"{self.as_of.year + 1}-01-01"))
+        return days[np.is_busday(days)]
+
+    def _history_panel(self) -> Dict[str, np.ndarray]:
+        """批量生成全部股票的日线随机数矩阵（交易日 × 股票），首次使用时生成并缓存"""
+        if self._panel is None:
+            with self._lock:
+                if self._panel is None:
+                    rng = np.random.default_rng([self.seed, 1])
+                    shape = (self.history_days, self.size)
+                    self._panel = {
+                        'sessions': self.sessions(),
+                        'z': rng.standard_normal(shape, dtype=np.float32),
+                        'u': rng.standard_normal(shape, dtype=np.float32),
+                        'dividend': self._dividend_schedule(),
+                    }
+        return self._panel
+
+    def _dividend_schedule(self) -> np.ndarray:
+        """除权除息日的每股分红率矩阵（交易日 × 股票），约七成股票每年分红一次，其余为0"""
+        rng = np.random.default_rng([self.seed, 2])
+        schedule = np.zeros((self.history_days, self.size), dtype=np.float32)
+        payers = np.flatnonzero(rng.random(self.size) < 0.7)
+        first = rng.integers(0, 242, len(payers))
+        for year in range(self.history_days // 242 + 1):
+            rows = first + year * 242 + rng.integers(-10, 11, len(payers))
+            valid = (rows >= 0) & (rows < self.history_days)
+            schedule[rows[valid], payers[valid]] = rng.uniform(0.002, 0.03, int(valid.sum()))
+        return schedule
+
+    def _adjust_factor_matrix(self, cols) -> np.ndarray:
+        """后复权因子（交易日 × 股票），首个交易日为1，每个除权日乘以 (1 + 分红率)"""
+        return np.cumprod(1.0 + self._history_panel()['dividend'][:, cols].astype(np.float64), axis=0)
+
+    def adjust_factors(self, index: int) -> Dict[str, np.ndarray]:
+        """单只股票的后复权因子序列：首个交易日及各除权日的 {'date', 'factor'}"""
+        panel = self._history_panel()
+        factor = self._adjust_factor_matrix(index)
+        rows = np.concatenate([[0], np.flatnonzero(panel['dividend'][1:, index]) + 1])
+        return {'date': panel['sessions'][rows], 'factor': np.round(factor[rows], 8)}
+
+    def session_adjust_factors(self, index: int, start: Optional[date] = None,
+                               end: Optional[date] = None) -> np.ndarray:
+        """单只股票每个交易日的后复权因子，日期范围与 history_arrays 一致"""
+        dates = self._history_panel()['sessions']
+        mask = np.ones(len(dates), dtype=bool)
+        if start is not None:
+            mask &= dates >= np.datetime64(start, 'D')
+        if end is not None:
+            mask &= dates <= np.datetime64(end, 'D')
+        return self._adjust_factor_matrix(index)[mask]
+
+    def history_arrays(self, columns=None, start: Optional[date] = None,
+                       end: Optional[date] = None) -> Dict[str, np.ndarray]:
+        """
+        批量计算日线OHLCV
+        参数:
+            columns: 股票下标（整数数组或切片），默认全部
+            start / end: 日期范围（含）
+        返回: {'date': (T,), 'open': (T, N), 'high', 'low', 'close', 'pre_close', 'volume', 'amount'}
+        """
+        panel = self._history_panel()
+        cols = slice(None) if columns is None else columns
+
+        z = panel['z'][:, cols].astype(np.float64)
+        u = panel['u'][:, cols].astype(np.float64)
+        sigma = self.volatility[cols]
+        returns = self.drift[cols] + sigma * z
+
+        # 以最后一个交易日收盘价等于昨收为锚点，倒推整条收盘价序列
+        cumulative = np.cumsum(returns, axis=0)
+        close = self.pre_close[cols] * np.exp(cumulative - cumulative[-1])
+        prev_close = np.empty_like(close)
+        prev_close[1:] = close[:-1]
+        prev_close[0] = close[0] / np.exp(returns[0])
+
+        open_ = prev_close * np.exp(0.3 * sigma * u)
+        spread = sigma * (0.2 + 0.5 * np.abs(u + z) / 2)
+        high = np.maximum(open_, close) * np.exp(spread)
+        low = np.minimum(open_, close) * np.exp(-spread)
+
+        # 以上为前复权价格，除以相对最新交易日的复权因子得到不复权价格（昨收为除权参考价）
+        factor = self._adjust_factor_matrix(cols)
+        scale = factor[-1] / factor
+        close, prev_close, open_, high, low = (values * scale for values in (close, prev_close, open_, high, low))
+        volume = np.round(self.avg_volume[cols] * np.exp(0.4 * u + 0.5 * np.abs(z)))
+        amount = volume * 100 * (open_ + high + low + close) / 4
+
+        dates = panel['sessions']
+        mask = np.ones(len(dates), dtype=bool)
+        if start is not None:
+            mask &= dates >= np.datetime64(start, 'D')
+        if end is not None:
+            mask &= dates <= np.datetime64(end, 'D')
+
+        return {
+            'date': dates[mask],
+            'open': np.round(open_[mask], 2),
+            'high': np.round(high[mask], 2),
+            'low': np.round(low[mask], 2),
+            'close': np.round(close[mask], 2),
+            'pre_close': np.round(prev_close[mask], 2),
+            'volume': volume[mask].astype(np.int64),
+            'amount': np.round(amount[mask], 2),
+        }
+
+    def hist_dataframe(self, symbol: str, start: Optional[date] = None, end: Optional[date] = None):
+        """与 ak.stock_zh_a_hist(period='daily', adjust='') 结构一致的单只股票日线"""
+        import pandas as pd
+
+        index = self.index_of.get(symbol)
+        if index is None:
+            return pd.DataFrame(columns=HIST_COLUMNS)
+
+        bars = self.history_arrays(index, start, end)
+        pre_close = bars['pre_close']
+        change = bars['close'] - pre_close
+        return pd.DataFrame({
+            '日期': bars['date'].astype(object),
+            '股票代码': symbol,
+            '开盘': bars['open'],
+            '收盘': bars['close'],
+            '最高': bars['high'],
+            '最低': bars['low'],
+            '成交量': bars['volume'],
+            '成交额': bars['amount'],
+            '振幅': np.round((bars['high'] - bars['low']) / pre_close * 100, 2),
+            '涨跌幅': np.round(change / pre_close * 100, 2),
+            '涨跌额': np.round(change, 2),
+            '换手率': np.round(bars['volume'] * 100 / self.float_shares[index] * 100, 2),
+        }, columns=HIST_COLUMNS)
+
+    # ------------------------------------------------------------------
+    # 实时快照
+    # ------------------------------------------------------------------
+    def snapshot_arrays(self, at: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """
+        全市场实时快照（按股票下标排列的数组）
+        当天的分钟走势由 (种子, 日期) 确定：从开盘价出发、收于当天目标涨跌幅的随机游走（布朗桥），
+        快照取 at 时刻已进行的连续竞价分钟处的价格，午间休市和收盘后保持不变，非交易日为收盘行情。
+        最高/最低为开盘以来的极值，成交量、成交额为开盘以来的累计值。同一时间片内返回同一份快照
+        """
+        at = at if at is not None else time.time()
+        tick = int(at // self.snapshot_interval)
+        cached = self._snapshot
+        if cached is not None and cached[0] == tick:
+            return cached[1]
+
+        total = int(self.calendar.session_minutes())
+        moment = datetime.fromtimestamp(at, MARKET_TIMEZONE)
+        if self.calendar.is_session(moment.date()):
+            minute = min(int(self.calendar.elapsed_minutes(moment)), total)
+        else:
+            minute = total
+
+        day_rng = np.random.default_rng([self.seed, 3, self.as_of.toordinal()])
+        sigma = self.volatility
+        pre_close = self.pre_close
+        open_ = np.round(pre_close * np.exp(0.3 * sigma * day_rng.standard_normal(self.size)), 2)
+        target = day_rng.standard_normal(self.size) * sigma
+        volume_scale = np.exp(0.3 * day_rng.standard_normal(self.size))
+        volume_ratio = np.round(np.exp(0.3 * day_rng.standard_normal(self.size)), 2)
+
+        # 分钟走势（对数涨跌幅）：开盘到目标收盘的直线加上两端固定为0的布朗桥
+        steps = np.cumsum(day_rng.standard_normal((total, self.size), dtype=np.float32), axis=0, dtype=np.float64)
+        steps *= sigma * 0.5 / np.sqrt(total)
+        fraction = np.arange(1, total + 1)[:, None] / total
+        start, end = np.log(open_ / pre_close), np.log1p(target)
+        path = start + (end - start) * fraction + steps - fraction * steps[-1]
+        prices = np.round(pre_close * np.exp(np.clip(path[:minute], np.log1p(-self.limits), np.log1p(self.limits))), 2)
+
+        # 成交量按分钟均匀分布，成交额按每分钟价格累计
+        minute_volume = self.avg_volume * volume_scale / total
+        if minute:
+            price = prices[-1]
+            high = np.maximum(open_, prices.max(axis=0))
+            low = np.minimum(open_, prices.min(axis=0))
+            past = prices[minute - 6] if minute > 5 else open_
+        else:
+            price, high, low, past = open_, open_, open_, open_
+        volume = np.round(minute_volume * minute).astype(np.int64)
+        amount = np.round(minute_volume * 100 * prices.sum(axis=0), 2)
+
+        arrays = {
+            'price': price,
+            'change_amount': np.round(price - pre_close, 2),
+            'change_rate': np.round((price - pre_close) / pre_close * 100, 2),
+            'volume': volume,
+            'amount': amount,
+            'amplitude': np.round((high - low) / pre_close * 100, 2),
+            'high': high,
+            'low': low,
+            'open': open_,
+            'pre_close': pre_close,
+            'turnover': np.round(volume * 100 / self.float_shares * 100, 2),
+            'volume_ratio': volume_ratio,
+            'speed': np.round((price - past) / past * 100, 2),  # 五分钟涨速
+        }
+        self._snapshot = (tick, arrays)
+        return arrays
+
+    def quote(self, symbol: str, at: Optional[float] = None) -> Optional[Dict]:
+        """单只股票实时行情，字段与 AKShareService.get_stock_realtime 一致"""
+        index = self.index_of.get(symbol)
+        if index is None:
+            return None
+        snap = self.snapshot_arrays(at)
+        return {
+            'code': symbol,
+            'name': str(self.names[index]),
+            'current_price': float(snap['price'][index]),
+            'change_rate': float(snap['change_rate'][index]),
+            'change_amount': float(snap['change_amount'][index]),
+            'volume': int(snap['volume'][index]),
+            'amount': float(snap['amount'][index]),
+            'high_price': float(snap['high'][index]),
+            'low_price': float(snap['low'][index]),
+            'open_price': float(snap['open'][index]),
+            'pre_close': float(snap['pre_close'][index]),
+            'updated_at': datetime.now(),
+        }
+
+    def spot_dataframe(self, at: Optional[float] = None):
+        """与 ak.stock_zh_a_spot_em() 结构一致的全市场实时行情"""
+        import pandas as pd
+
+        snap = self.snapshot_arrays(at)
+        market_value = snap['price'] * self.float_shares
+        return pd.DataFrame({
+            '序号': np.arange(1, self.size + 1),
+            '代码': self.codes.astype(object),
+            '名称': self.names.astype(object),
+            '最新价': snap['price'],
+            '涨跌幅': snap['change_rate'],
+            '涨跌额': snap['change_amount'],
+            '成交量': snap['volume'].astype(np.float64),
+            '成交额': snap['amount'],
+            '振幅': snap['amplitude'],
+            '最高': snap['high'],
+            '最低': snap['low'],
+            '今开': snap['open'],
+            '昨收': snap['pre_close'],
+            '量比': snap['volume_ratio'],
+            '换手率': snap['turnover'],
+            '市盈率-动态': np.round(self.pe, 2),
+            '市净率': np.round(self.pb, 2),
+            '总市值': np.round(market_value * 1.2),
+            '流通市值': np.round(market_value),
+            '涨速': snap['speed'],
+            '5分钟涨跌': np.round(snap['speed'] / 2, 2),
+            '60日涨跌幅': np.round(snap['change_rate'] * 3, 2),
+            '年初至今涨跌幅': np.round(snap['change_rate'] * 5, 2),
+        }, columns=SPOT_COLUMNS)
+
+    def index_quote(self, symbol: str, at: Optional[float] = None) -> Optional[Dict]:
+        """指数实时行情，涨跌幅取对应市场成分股的平均涨跌幅"""
+        if symbol not in INDICES:
+            return None
+        code, name, base = INDICES[symbol]
+        snap = self.snapshot_arrays(at)
+        market = 'SH' if symbol.startswith('sh') else 'SZ'
+        change_rate = float(np.round(snap['change_rate'][self.markets == market].mean(), 2))
+        current = round(base * (1 + change_rate / 100), 2)
+        return {
+            'code': code,
+            'name': name,
+            'current': current,
+            'change_rate': change_rate,
+            'change_amount': round(current - base, 2),
+            'pre_close': base,
+        }
+
+    def index_dataframe(self, symbol: str, at: Optional[float] = None):
+        """与仓库中 ak.stock_zh_index_spot_em 的用法一致：返回单个指数的一行行情"""
+        import pandas as pd
+
+        quote = self.index_quote(symbol, at)
+        if quote is None:
+            return pd.DataFrame(columns=INDEX_COLUMNS)
+        row = {column: 0.0 for column in INDEX_COLUMNS}
+        row.update({
+            '序号': 1,
+            '代码': quote['code'],
+            '名称': quote['name'],
+            '最新价': quote['current'],
+            '涨跌幅': quote['change_rate'],
+            '涨跌额': quote['change_amount'],
+            '昨收': quote['pre_close'],
+            '今开': quote['pre_close'],
+            '最高': max(quote['current'], quote['pre_close']),
+            '最低': min(quote['current'], quote['pre_close']),
+        })
+        return pd.DataFrame([row], columns=INDEX_COLUMNS)
@@ -15,8 +15,8 @@ class TestView(View):
         """测试GET请求"""
         try:
             # 测试模拟数据服务
-            from .mock_service import MockDataService
-            mock_service = MockDataService()
+            from .registry import get_mock_service
+            mock_service = get_mock_service()
             
             # 获取测试数据
             stocks = mock_service.get_stock_list()
@@ -0,0 +1,320 @@
+"""
+交易日历
+全部交易日以升序的序数日数组保存，下一个/上一个交易日、区间内的交易日都用二分查找得到；
+交易日与交易时段（连续竞价）组合出每次开市、收市的时刻，供缓存、采集进程和历史数据缺口检查使用:
+
+- fresh_since(now, max_age): 在此时刻之后更新的数据仍然有效。开市时为 max_age 秒前（不早于本时段开盘），
+  休市时为最近一次收市：收市后取到的数据一直有效到下次开市，夜间、周末和节假日不再请求上游
+- last_completed_session(now): 最近一个已收市的交易日，当天的日线收市后才计入
+- expected_sessions(start, end, now): 区间内应当已有日线的交易日
+
+交易日来自上游（上交所开市以来至今年年底），保存在 TRADING_CALENDAR_FILE，日期超出文件范围后重新获取；
+获取失败时按周一至周五近似（不含节假日），一小时后重试。本模块只依赖标准库，接口进程加载时不导入numpy
+"""
+import json
+import logging
+import os
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time as dtime, timedelta
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# A股连续竞价时段
+TRADING_SESSIONS = [(dtime(9, 30), dtime(11, 30)), (dtime(13, 0), dtime(15, 0))]
+
+MARKET_TIMEZONE = ZoneInfo('Asia/Shanghai')
+
+# 近似日历的起点，以及已公布日历之后按周一至周五延长的年数
+FALLBACK_FIRST_DAY = date(1990, 12, 19)
+FALLBACK_YEARS_AHEAD = 1
+
+# 日历过期或只能近似时，重新获取的最小间隔（秒）
+REFRESH_RETRY = 3600
+
+
+def weekdays(start: date, end: date) -> List[date]:
+    """[start, end] 内的周一至周五"""
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)
+            if (start + timedelta(days=i)).weekday() < 5]
+
+
+class TradingCalendar:
+    """
+    按交易日序数数组查询的交易日历
+    日期参数为 date；时刻参数为 datetime，带时区的按市场时区换算，不带时区的视为市场当地时间
+    """
+
+    def __init__(self, days: Iterable[date], sessions: Sequence[Tuple[dtime, dtime]] = TRADING_SESSIONS,
+                 approximate: bool = False):
+        ordinals = sorted({day.toordinal() for day in days})
+        if not ordinals:
+            raise ValueError('交易日历为空')
+        # 已公布的日历之后按周一至周五延长，日历未能及时更新时查询仍有结果
+        self.last_day = date.fromordinal(ordinals[-1])
+        extension = weekdays(self.last_day + timedelta(days=1),
+                             date(self.last_day.year + FALLBACK_YEARS_AHEAD, 12, 31))
+        self._days = array('l', ordinals + [day.toordinal() for day in extension])
+        self.sessions = list(sessions)
+        self.approximate = approximate
+        self.loaded_at = time.time()
+
+    def __len__(self):
+        return len(self._days)
+
+    @property
+    def first_day(self) -> date:
+        return date.fromordinal(self._days[0])
+
+    def covers(self, today: Optional[date] = None) -> bool:
+        """日历是否包含今天之后的交易日（否则需要获取新一年的日历）"""
+        return not self.approximate and (today or date.today()) < self.last_day
+
+    def expired(self) -> bool:
+        """日历已不覆盖今天，且距上次加载超过重试间隔"""
+        return not self.covers() and time.time() - self.loaded_at > REFRESH_RETRY
+
+    # ------------------------------------------------------------------
+    # 交易日
+    # ------------------------------------------------------------------
+    def is_session(self, day: date) -> bool:
+        ordinal = day.toordinal()
+        index = bisect_left(self._days, ordinal)
+        return index < len(self._days) and self._days[index] == ordinal
+
+    def next_session(self, day: date) -> date:
+        """day 之后（不含）的第一个交易日，超出日历范围时按周一至周五推算"""
+        index = bisect_right(self._days, day.toordinal())
+        if index < len(self._days):
+            return date.fromordinal(self._days[index])
+        day += timedelta(days=1)
+        while day.weekday() >= 5:
+            day += timedelta(days=1)
+        return day
+
+    def prev_session(self, day: date) -> Optional[date]:
+        """day 之前（不含）的最后一个交易日，早于日历起点时返回None"""
+        index = bisect_left(self._days, day.toordinal())
+        return date.fromordinal(self._days[index - 1]) if index > 0 else None
+
+    def sessions_between(self, start: Optional[date], end: date) -> List[date]:
+        """[start, end] 内的交易日，升序；start 为空表示从日历起点开始"""
+        lo = bisect_left(self._days, start.toordinal()) if start else 0
+        hi = bisect_right(self._days, end.toordinal())
+        return [date.fromordinal(ordinal) for ordinal in self._days[lo:hi]]
+
+    def sessions_back(self, end: date, count: int) -> date:
+        """截至 end（含）的最近 count 个交易日中的第一个"""
+        index = bisect_right(self._days, end.toordinal()) - max(count, 1)
+        return date.fromordinal(self._days[max(index, 0)])
+
+    # ------------------------------------------------------------------
+    # 交易时段
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _local(moment: datetime) -> datetime:
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(MARKET_TIMEZONE).replace(tzinfo=None)
+        return moment
+
+    @staticmethod
+    def _aware(moment: datetime) -> datetime:
+        return moment.replace(tzinfo=MARKET_TIMEZONE)
+
+    def _market_time(self, moment: datetime) -> datetime:
+        return self._aware(self._local(moment))
+
+    def _segments(self, day: date) -> List[Tuple[datetime, datetime]]:
+        return [(datetime.combine(day, start), datetime.combine(day, end)) for start, end in self.sessions]
+
+    def market_date(self, moment: datetime) -> date:
+        """moment 在市场时区的日期"""
+        return self._local(moment).date()
+
+    def is_open(self, moment: datetime) -> bool:
+        """是否处于交易时段（含收盘时刻）"""
+        moment = self._local(moment)
+        if not self.is_session(moment.date()):
+            return False
+        return any(start <= moment <= end for start, end in self._segments(moment.date()))
+
+    def elapsed_minutes(self, moment: datetime) -> float:
+        """moment 所在交易日已进行的连续竞价分钟数（午间休市不计），非交易日为0"""
+        moment = self._local(moment)
+        if not self.is_session(moment.date()):
+            return 0.0
+        return sum(
+            max((min(moment, end) - start).total_seconds(), 0.0) / 60
+            for start, end in self._segments(moment.date())
+        )
+
+    def session_minutes(self) -> float:
+        """每个交易日连续竞价的总分钟数"""
+        return sum((end - start).total_seconds() / 60 for start, end in self._segments(FALLBACK_FIRST_DAY))
+
+    def last_transition(self, moment: datetime) -> Tuple[datetime, bool]:
+        """
+        最近一次开市或收市的时刻（带时区），以及此刻是否开市
+        开市时返回本时段的开盘时刻，休市时返回最近一次收市时刻
+        """
+        local = self._local(moment)
+        day = local.date()
+        if self.is_session(day):
+            for start, end in reversed(self._segments(day)):
+                if local > end:
+                    return self._aware(end), False
+                if local >= start:
+                    return self._aware(start), True
+        previous = self.prev_session(day)
+        if previous is None:
+            return self._aware(datetime.combine(self.first_day, self.sessions[0][0])), False
+        return self._aware(self._segments(previous)[-1][1]), False
+
+    def next_open(self, moment: datetime) -> datetime:
+        """moment 之后的下一次开市时刻（带时区）"""
+        local = self._local(moment)
+        if self.is_session(local.date()):
+            for start, _ in self._segments(local.date()):
+                if start > local:
+                    return self._aware(start)
+        return self._aware(datetime.combine(self.next_session(local.date()), self.sessions[0][0]))
+
+    def fresh_since(self, now: datetime, max_age: float) -> datetime:
+        """在此时刻之后更新的行情仍然有效（带时区）"""
+        transition, is_open = self.last_transition(now)
+        if not is_open:
+            return transition
+        return max(transition, self._market_time(now) - timedelta(seconds=max_age))
+
+    def cache_ttl(self, now: datetime, max_age: float) -> float:
+        """行情缓存的有效秒数：开市时为 max_age，休市时到下次开市"""
+        if self.is_open(now):
+            return max_age
+        return max((self.next_open(now) - self._market_time(now)).total_seconds(), max_age)
+
+    def last_completed_session(self, now: datetime) -> date:
+        """最近一个已收市的交易日"""
+        local = self._local(now)
+        day = local.date()
+        if self.is_session(day) and local > self._segments(day)[-1][1]:
+            return day
+        return self.prev_session(day) or self.first_day
+
+    def expected_sessions(self, start: Optional[date], end: Optional[date], now: datetime,
+                          count: int) -> List[date]:
+        """
+        [start, end] 内应当已有日线的交易日（end 不晚于最近一个已收市的交易日）
+        start 为空时取截至 end 的最近 count 个交易日
+        """
+        last = self.last_completed_session(now)
+        end = min(end, last) if end else last
+        if start is None:
+            start = self.sessions_back(end, count)
+        return self.sessions_between(start, end)
+
+
+def default_history_start(end: date) -> date:
+    """未指定开始日期时历史数据的起始日：截至 end 的最近 HISTORY_DEFAULT_SESSIONS 个交易日中的第一个"""
+    from .registry import get_trading_calendar
+    return get_trading_calendar().sessions_back(end, getattr(settings, 'HISTORY_DEFAULT_SESSIONS', 20))
+
+
+def fallback_calendar(today: Optional[date] = None) -> TradingCalendar:
+    """按周一至周五近似的日历（不含节假日）"""
+    return TradingCalendar(weekdays(FALLBACK_FIRST_DAY, today or date.today()), approximate=True)
+
+
+def _calendar_path() -> Path:
+    return Path(getattr(settings, 'TRADING_CALENDAR_FILE', settings.BASE_DIR / 'trading_calendar.json'))
+
+
+def _read_file(path: Path) -> Optional[List[date]]:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return [date.fromisoformat(day) for day in json.load(f)['days']]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"读取交易日历文件 {path} 失败: {str(e)}")
+        return None
+
+
+def _write_file(path: Path, days: List[date]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(temp, 'w', encoding='utf-8') as f:
+        json.dump({'updated_at': datetime.now().isoformat(timespec='seconds'),
+                   'days': [day.isoformat() for day in days]}, f)
+    os.replace(temp, path)
+
+
+def load_trading_calendar(refresh: bool = False) -> TradingCalendar:
+    """
+    加载交易日历：优先读取本地文件，文件不存在、已过期或 refresh 为真时从上游获取并保存
+    上游获取失败时使用本地文件（即使已过期），都没有时返回周末近似日历
+    """
+    from .registry import get_akshare_service
+
+    path = _calendar_path()
+    saved = None if refresh else _read_file(path)
+    if saved:
+        calendar = TradingCalendar(saved)
+        if calendar.covers():
+            return calendar
+
+    try:
+        days = [date.fromisoformat(day) for day in get_akshare_service().get_trade_dates()]
+    except Exception as e:
+        logger.warning(f"获取交易日历失败: {str(e)}")
+        days = []
+
+    if days:
+        try:
+            _write_file(path, days)
+        except OSError as e:
+            logger.warning(f"保存交易日历文件 {path} 失败: {str(e)}")
+        logger.info(f"交易日历已更新: {days[0]} ~ {days[-1]}，共 {len(days)} 个交易日")
+        return TradingCalendar(days)
+
+    saved = saved or _read_file(path)
+    if saved:
+        return TradingCalendar(saved)
+    logger.warning('没有可用的交易日历，按周一至周五近似')
+    return fallback_calendar()
+
+
+# ----------------------------------------------------------------------
+# 历史数据缺口
+# ----------------------------------------------------------------------
+def _gaps_key(code: str) -> str:
+    return f"history:no_bars:{code}"
+
+
+def history_gaps(code: str, expected: List[date], have: Iterable[date]) -> List[date]:
+    """
+    expected 中本地没有日线、且最近没有向上游确认过无数据（停牌）的交易日，升序
+    """
+    have = set(have)
+    missing = [day for day in expected if day not in have]
+    if not missing:
+        return missing
+    known = cache.get(_gaps_key(code)) or set()
+    return [day for day in missing if day.toordinal() not in known]
+
+
+def mark_gaps_checked(code: str, requested: List[date], fetched: Iterable[date]):
+    """记录向上游补取后仍然没有日线的交易日，HISTORY_GAP_RETRY_TTL 秒内不再补取"""
+    fetched = {date.fromisoformat(str(day)[:10]) for day in fetched}
+    empty = {day.toordinal() for day in requested if day not in fetched}
+    if not empty:
+        return
+    key = _gaps_key(code)
+    known = cache.get(key) or set()
+    cache.set(key, known | empty, timeout=getattr(settings, 'HISTORY_GAP_RETRY_TTL', 3600))
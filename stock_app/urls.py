@@ -1,11 +1,22 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .test_views import TestView
+from .views import (
+    AlertRuleViewSet, BacktestView, CorrelationView, PortfolioViewSet, ReturnsMatrixView, SectorDetailView,
+    SectorListView
+)
+from .async_views import (
+    AsyncMarketOverviewView, AsyncSearchView, AsyncRealtimeView, AsyncHistoryView, AsyncAlertEventsView
+)
 from .simple_views import (
     SimpleMarketView, SimpleStockListView, SimpleSearchView,
-    SimpleStockDetailView, SimpleRealtimeView, SimpleHistoryView
+    SimpleStockDetailView, SimpleRealtimeView, SimpleHistoryView, SimpleIntradayView
 )
 
+router = DefaultRouter()
+router.register('portfolios', PortfolioViewSet)
+router.register('alerts/rules', AlertRuleViewSet)
+
 urlpatterns = [
     # 简化API端点
     path('market/', SimpleMarketView.as_view(), name='market-overview'),
@@ -14,6 +25,26 @@ urlpatterns = [
     path('stocks/<str:code>/', SimpleStockDetailView.as_view(), name='stock-detail'),
     path('stocks/<str:code>/realtime/', SimpleRealtimeView.as_view(), name='stock-realtime'),
     path('stocks/<str:code>/history/', SimpleHistoryView.as_view(), name='stock-history'),
+    path('stocks/<str:code>/intraday/', SimpleIntradayView.as_view(), name='stock-intraday'),
+    
+    # 横截面分析
+    path('analytics/returns/', ReturnsMatrixView.as_view(), name='analytics-returns'),
+    path('analytics/correlation/', CorrelationView.as_view(), name='analytics-correlation'),
+    path('backtest/', BacktestView.as_view(), name='backtest'),
+    
+    # 板块（行业、成分股指数）行情
+    path('sectors/', SectorListView.as_view(), name='sector-list'),
+    path('sectors/<str:code>/', SectorDetailView.as_view(), name='sector-detail'),
+    
+    # 异步API端点（ASGI部署时使用）
+    path('async/market/', AsyncMarketOverviewView.as_view(), name='async-market-overview'),
+    path('async/search/', AsyncSearchView.as_view(), name='async-stock-search'),
+    path('async/stocks/<str:code>/realtime/', AsyncRealtimeView.as_view(), name='async-stock-realtime'),
+    path('async/stocks/<str:code>/history/', AsyncHistoryView.as_view(), name='async-stock-history'),
+    path('alerts/events/', AsyncAlertEventsView.as_view(), name='alert-events'),
+    
+    # 自选组合、价格提醒规则
+    path('', include(router.urls)),
     
     # 测试端点
     path('test/', TestView.as_view(), name='test'),
@@ -2,18 +2,22 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db import models
+from django.db import models, transaction
 from datetime import datetime, timedelta
 import logging
 
-from .models import Stock, StockPrice, StockRealtime
+from .models import AlertRule, Portfolio, Position, Stock, StockPrice, StockRealtime
 from .serializers import (
     StockSerializer, StockPriceSerializer, StockRealtimeSerializer,
-    StockSearchSerializer, MarketOverviewSerializer
+    StockSearchSerializer, MarketOverviewSerializer, PortfolioSerializer, PositionSerializer,
+    AlertRuleSerializer, BacktestRequestSerializer
 )
-from .akshare_service import AKShareService
+from . import metrics
+from .registry import get_akshare_service, get_trading_calendar
+from .renderers import BULK_RENDERER_CLASSES
 
 logger = logging.getLogger(__name__)
 
@@ -40,16 +44,19 @@ class StockViewSet(viewsets.ModelViewSet):
             # 尝试从数据库获取实时数据
             try:
                 realtime_data = stock.realtime
-                # 检查数据是否过期（超过5分钟）
-                if timezone.now() - realtime_data.updated_at > timedelta(minutes=5):
+                # 检查数据是否过期：开市时超过 REALTIME_MAX_AGE 秒，休市时早于最近一次收市
+                fresh_since = get_trading_calendar().fresh_since(timezone.now(), settings.REALTIME_MAX_AGE)
+                if realtime_data.updated_at < fresh_since:
                     raise StockRealtime.DoesNotExist
                 
+                metrics.record_cache('realtime_db', hit=True)
                 serializer = StockRealtimeSerializer(realtime_data)
                 return Response(serializer.data)
                 
             except StockRealtime.DoesNotExist:
+                metrics.record_cache('realtime_db', hit=False)
                 # 从AKShare获取实时数据
-                akshare_service = AKShareService()
+                akshare_service = get_akshare_service()
                 realtime_info = akshare_service.get_stock_realtime(code)
                 
                 if not realtime_info:
@@ -84,9 +91,17 @@ class StockViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
-    @action(detail=True, methods=['get'])
+    @action(detail=True, methods=['get'], renderer_classes=BULK_RENDERER_CLASSES)
     def history(self, request, code=None):
-        """获取股票历史数据"""
+        """获取股票历史数据，adjust=qfq/hfq 返回前复权/后复权价格（默认不复权）"""
+        from .adjust import ADJUST_MODES, adjust_prices
+        from .cold_storage import load_prices
+        from .trading_calendar import history_gaps, mark_gaps_checked
+        
+        adjust = request.query_params.get('adjust', '')
+        if adjust not in ADJUST_MODES:
+            return Response({'error': 'adjust 只支持 qfq、hfq 或留空'}, status=status.HTTP_400_BAD_REQUEST)
+        
         try:
             stock = get_object_or_404(Stock, code=code)
             
@@ -95,34 +110,39 @@ class StockViewSet(viewsets.ModelViewSet):
             start_date = request.query_params.get('start_date')
             end_date = request.query_params.get('end_date')
             
-            # 首先尝试从数据库获取
-            queryset = stock.prices.all()
-            
+            start_date_obj = end_date_obj = None
             if start_date:
                 try:
                     start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-                    queryset = queryset.filter(date__gte=start_date_obj)
                 except ValueError:
                     pass
             
             if end_date:
                 try:
                     end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-                    queryset = queryset.filter(date__lte=end_date_obj)
                 except ValueError:
                     pass
             
-            # 如果数据库中数据不足，从AKShare获取
-            if queryset.count() < 10:
-                akshare_service = AKShareService()
-                
-                # 转换日期格式
-                ak_start_date = start_date.replace('-', '') if start_date else None
-                ak_end_date = end_date.replace('-', '') if end_date else None
-                
-                history_data = akshare_service.get_stock_history(
-                    code, period, ak_start_date, ak_end_date
-                )
+            # 首先从本地获取（数据库中的近期数据与冷存储中的早期数据合并）
+            prices = load_prices(stock, start_date_obj, end_date_obj, limit=100)  # 限制返回100条
+            
+            # 按交易日历检查本地缺少的日线（当天收市前、已确认停牌的交易日不算缺口），只从AKShare补取缺口
+            expected = get_trading_calendar().expected_sessions(
+                start_date_obj, end_date_obj, timezone.now(), settings.HISTORY_DEFAULT_SESSIONS
+            )[-100:]
+            missing = history_gaps(code, expected, [price.date for price in prices])
+            metrics.record_cache('history_db', hit=not missing)
+            if missing:
+                akshare_service = get_akshare_service()
+                try:
+                    history_data = akshare_service.fetch_stock_history(
+                        code, period, missing[0].strftime('%Y%m%d'), missing[-1].strftime('%Y%m%d')
+                    )
+                except Exception as e:
+                    logger.warning(f"补取股票 {code} 历史数据失败，返回本地数据: {str(e)}")
+                    history_data = []
+                else:
+                    mark_gaps_checked(code, missing, [data['date'] for data in history_data])
                 
                 # 批量创建历史数据
                 price_objects = []
@@ -145,16 +165,12 @@ class StockViewSet(viewsets.ModelViewSet):
                 
                 logger.info(f"为股票 {code} 创建了 {len(price_objects)} 条历史数据")
                 
-                # 重新查询数据库
-                queryset = stock.prices.all()
-                if start_date:
-                    start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-                    queryset = queryset.filter(date__gte=start_date_obj)
-                if end_date:
-                    end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-                    queryset = queryset.filter(date__lte=end_date_obj)
+                # 重新查询
+                prices = load_prices(stock, start_date_obj, end_date_obj, limit=100)
             
-            serializer = StockPriceSerializer(queryset[:100], many=True)  # 限制返回100条
+            # 数据库中只有不复权价格，复权价格按复权因子即时换算
+            prices = adjust_prices(stock, prices, adjust)
+            serializer = StockPriceSerializer(prices, many=True)
             return Response(serializer.data)
             
         except Exception as e:
@@ -209,7 +225,7 @@ class StockSearchView(APIView):
                         })
             else:
                 # 从AKShare搜索
-                akshare_service = AKShareService()
+                akshare_service = get_akshare_service()
                 search_results = akshare_service.search_stock(keyword)
                 
                 # 将搜索结果保存到数据库
@@ -241,7 +257,7 @@ class MarketOverviewView(APIView):
     def get(self, request):
         """获取市场概览数据"""
         try:
-            akshare_service = AKShareService()
+            akshare_service = get_akshare_service()
             overview_data = akshare_service.get_market_overview()
             
             serializer = MarketOverviewSerializer(overview_data)
@@ -257,6 +273,7 @@ class MarketOverviewView(APIView):
 
 class StockListView(APIView):
     """股票列表视图"""
+    renderer_classes = BULK_RENDERER_CLASSES
     
     def get(self, request):
         """获取股票列表"""
@@ -264,7 +281,7 @@ class StockListView(APIView):
             # 检查数据库中是否有股票数据
             if Stock.objects.count() < 10:
                 # 从AKShare获取股票列表
-                akshare_service = AKShareService()
+                akshare_service = get_akshare_service()
                 stock_list = akshare_service.get_stock_list()
                 
                 # 批量创建股票记录
@@ -308,3 +325,320 @@ class StockListView(APIView):
                 {'error': '获取股票列表失败'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class PortfolioViewSet(viewsets.ModelViewSet):
+    """
+    自选组合视图集
+    持仓通过 positions 接口增改删，valuation 接口一次返回整个组合的估值
+    """
+    queryset = Portfolio.objects.prefetch_related('positions')
+    serializer_class = PortfolioSerializer
+    
+    @action(detail=True, methods=['post'])
+    def positions(self, request, pk=None):
+        """添加或更新持仓，请求体为单个持仓或持仓列表（数量为0表示只加入自选）"""
+        portfolio = self.get_object()
+        many = isinstance(request.data, list)
+        serializer = PositionSerializer(data=request.data, many=many)
+        serializer.is_valid(raise_exception=True)
+        
+        items = serializer.validated_data if many else [serializer.validated_data]
+        with transaction.atomic():
+            for item in items:
+                Position.objects.update_or_create(
+                    portfolio=portfolio,
+                    stock_code=item['stock_code'],
+                    defaults={key: value for key, value in item.items() if key != 'stock_code'}
+                )
+        
+        # 重新查询，返回新的版本号和持仓
+        return Response(PortfolioSerializer(self.get_object()).data)
+    
+    @action(detail=True, methods=['delete'], url_path=r'positions/(?P<code>\d{6})')
+    def remove_position(self, request, pk=None, code=None):
+        """移除持仓"""
+        portfolio = self.get_object()
+        position = get_object_or_404(Position, portfolio=portfolio, stock_code=code)
+        position.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    @action(detail=True, methods=['get'], renderer_classes=BULK_RENDERER_CLASSES)
+    def valuation(self, request, pk=None):
+        """组合估值：持仓 x 最新价、盈亏和权重，按组合版本缓存"""
+        from .portfolio import get_valuation
+        
+        portfolio = self.get_object()
+        try:
+            valuation = get_valuation(portfolio)
+        except Exception as e:
+            logger.error(f"组合 {pk} 估值失败: {str(e)}")
+            valuation = None
+        
+        if valuation is None:
+            return Response(
+                {'error': '无法获取实时行情'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        return Response(valuation)
+
+
+class AlertRuleViewSet(viewsets.ModelViewSet):
+    """
+    价格提醒规则视图集
+    规则由 collect_intraday 在每次快照刷新时检查，触发记录通过 /api/alerts/events/ 读取
+    """
+    queryset = AlertRule.objects.all()
+    serializer_class = AlertRuleSerializer
+    
+    def get_queryset(self):
+        queryset = AlertRule.objects.all()
+        code = self.request.query_params.get('stock_code')
+        if code:
+            queryset = queryset.filter(stock_code=code)
+        active = self.request.query_params.get('active')
+        if active is not None:
+            queryset = queryset.filter(active=active.lower() == 'true')
+        return queryset
+
+
+def _analytics_params(request, min_window: int = 2):
+    """
+    解析横截面分析的公共参数，返回 (股票代码列表, 窗口, 截止日期)
+    股票集合由 codes=000001,600519,... 或 portfolio={组合id} 指定；window 不小于 min_window；参数不合法时抛出 ValueError
+    """
+    if 'portfolio' in request.query_params:
+        portfolio = get_object_or_404(Portfolio, pk=request.query_params['portfolio'])
+        raw_codes = list(portfolio.positions.order_by('id').values_list('stock_code', flat=True))
+    else:
+        raw_codes = [code.strip() for code in request.query_params.get('codes', '').split(',') if code.strip()]
+    codes = list(dict.fromkeys(raw_codes))
+    if not codes:
+        raise ValueError('需要 codes 或 portfolio 参数')
+    max_symbols = getattr(settings, 'ANALYTICS_MAX_SYMBOLS', 1000)
+    if len(codes) > max_symbols:
+        raise ValueError(f'股票数量不能超过 {max_symbols}')
+
+    max_window = getattr(settings, 'ANALYTICS_MAX_WINDOW', 1000)
+    try:
+        window = int(request.query_params.get('window', 250))
+    except ValueError:
+        raise ValueError('window 应为整数')
+    if not min_window <= window <= max_window:
+        raise ValueError(f'window 应在 {min_window} 到 {max_window} 之间')
+
+    try:
+        end = datetime.strptime(request.query_params['end'], '%Y-%m-%d').date() \
+            if 'end' in request.query_params else timezone.localdate()
+    except ValueError:
+        raise ValueError('end 日期格式应为YYYY-MM-DD')
+    return codes, window, end
+
+
+class ReturnsMatrixView(APIView):
+    """
+    收益率矩阵视图
+    返回一组股票对齐后的日收益率（%），matrix 的行为交易日、列与 codes 对应，无数据为null
+    参数: codes 或 portfolio，window - 交易日数（默认250），end - 截止日期（默认今天）
+    """
+    renderer_classes = BULK_RENDERER_CLASSES
+    
+    def get(self, request):
+        from .analytics import get_returns_matrix, to_nested_list
+        
+        try:
+            codes, window, end = _analytics_params(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            matrix = get_returns_matrix(codes, window, end)
+        except Exception as e:
+            logger.error(f"构造收益率矩阵失败: {str(e)}")
+            return Response({'error': '构造收益率矩阵失败'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        return Response({
+            'codes': codes,
+            'window': window,
+            'dates': [datetime.fromordinal(int(day)).strftime('%Y-%m-%d') for day in matrix.dates.tolist()],
+            'matrix': to_nested_list(matrix.returns * 100, 4),
+        })
+
+
+class CorrelationView(APIView):
+    """
+    相关性分析视图
+    返回一组股票两两之间的相关系数矩阵，以及每只股票的年化波动率、近期滚动波动率和贝塔
+    参数: codes 或 portfolio、window、end 同收益率矩阵；benchmark - 基准股票代码（默认等权平均）；
+          rolling - 滚动波动率的天数（默认20）；covariance=true 时同时返回协方差矩阵
+    window 不大于 analytics.MIN_PERIODS 时相关系数、波动率和贝塔必然为空，返回400
+    """
+    renderer_classes = BULK_RENDERER_CLASSES
+    
+    def get(self, request):
+        from .analytics import BENCHMARK_EQUAL_WEIGHT, MIN_PERIODS, analyze
+        
+        try:
+            codes, window, end = _analytics_params(request, min_window=MIN_PERIODS + 1)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        rolling = request.query_params.get('rolling', '20')
+        rolling = int(rolling) if rolling.isdigit() else 0
+        if not 2 <= rolling <= window:
+            return Response({'error': 'rolling 应在 2 到 window 之间'}, status=status.HTTP_400_BAD_REQUEST)
+        benchmark = request.query_params.get('benchmark') or BENCHMARK_EQUAL_WEIGHT
+        include_covariance = request.query_params.get('covariance', '').lower() == 'true'
+        
+        try:
+            result = analyze(codes, window, end, benchmark=benchmark, rolling=rolling,
+                             include_covariance=include_covariance)
+        except Exception as e:
+            logger.error(f"相关性分析失败: {str(e)}")
+            return Response({'error': '相关性分析失败'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(result)
+
+
+class BacktestView(APIView):
+    """
+    回测视图
+    GET 返回可用策略及默认参数；POST 在区间内的日线上运行策略，返回净值曲线和统计指标，
+    请求中带 sweep 时改为参数扫描，在进程池中并行运行全部参数组合，只返回各组合的统计指标
+    """
+    renderer_classes = BULK_RENDERER_CLASSES
+    
+    def get(self, request):
+        from .backtest import STRATEGIES
+        
+        return Response({
+            'strategies': [
+                {'name': name, 'description': (func.__doc__ or '').strip(), 'params': defaults}
+                for name, (func, defaults) in STRATEGIES.items()
+            ]
+        })
+    
+    def post(self, request):
+        import numpy as np
+        from .analytics import forward_fill, get_close_matrix
+        from .backtest import expand_grid, run_backtest, run_sweep
+        
+        serializer = BacktestRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        if data.get('codes'):
+            codes = list(dict.fromkeys(data['codes']))
+        else:
+            portfolio = get_object_or_404(Portfolio, pk=data['portfolio'])
+            codes = list(portfolio.positions.order_by('id').values_list('stock_code', flat=True))
+            if not codes:
+                return Response({'error': '组合中没有持仓'}, status=status.HTTP_400_BAD_REQUEST)
+        end = data.get('end') or timezone.localdate()
+        start = data.get('start') or end - timedelta(days=365)
+        
+        try:
+            dates, closes = get_close_matrix(codes, start, end)
+        except Exception as e:
+            logger.error(f"加载回测数据失败: {str(e)}")
+            return Response({'error': '加载回测数据失败'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if len(dates) < 2:
+            return Response({'error': '区间内没有足够的日线数据'}, status=status.HTTP_400_BAD_REQUEST)
+        closes = forward_fill(closes)
+        day_labels = [datetime.fromordinal(int(day)).strftime('%Y-%m-%d') for day in dates.tolist()]
+        summary = {
+            'strategy': data['strategy'],
+            'codes': codes,
+            'start': day_labels[0],
+            'end': day_labels[-1],
+            'cost': data['cost'],
+        }
+        
+        if data['sweep']:
+            grid = expand_grid({**{name: [value] for name, value in data['params'].items()}, **data['sweep']})
+            started = timezone.now()
+            results = run_sweep(closes, data['strategy'], grid, data['cost'],
+                                workers=getattr(settings, 'BACKTEST_WORKERS', 1))
+            logger.info(f"参数扫描 {data['strategy']} x {len(grid)} 组，耗时 "
+                        f"{(timezone.now() - started).total_seconds():.2f}s")
+            summary['results'] = [
+                {**item['params'], **(item['stats'] or {}), 'error': item.get('error')} for item in results
+            ]
+            return Response(summary)
+        
+        try:
+            result = run_backtest(closes, data['strategy'], data['params'], data['cost'])
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        summary.update(params=result['params'], stats=result['stats'])
+        summary['results'] = [
+            {'date': day, 'equity': equity, 'return': daily, 'exposure': exposure, 'turnover': turnover}
+            for day, equity, daily, exposure, turnover in zip(
+                day_labels, np.round(result['equity'], 6).tolist(), np.round(result['returns'] * 100, 4).tolist(),
+                np.round(result['exposure'], 4).tolist(), np.round(result['turnover'], 4).tolist()
+            )
+        ]
+        return Response(summary)
+
+
+def _sector_kind(request):
+    """板块类型参数：industry（默认）或 index；不合法时抛出 ValueError"""
+    from .sectors import SECTOR_KINDS
+    
+    kind = request.query_params.get('type', SECTOR_KINDS[0])
+    if kind not in SECTOR_KINDS:
+        raise ValueError(f"type 应为 {' 或 '.join(SECTOR_KINDS)}")
+    return kind
+
+
+class SectorListView(APIView):
+    """
+    板块行情视图
+    按全市场快照汇总每个板块的平均涨跌幅、上涨/下跌家数、成交额和领涨股，按平均涨跌幅降序
+    参数: type - industry（行业，默认）或 index（成分股指数）；leaders - 每个板块返回的领涨股数量（默认3）
+    """
+    renderer_classes = BULK_RENDERER_CLASSES
+    
+    def get(self, request):
+        from .sectors import MAX_LEADERS, get_sector_summary
+        
+        try:
+            kind = _sector_kind(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        leaders = request.query_params.get('leaders', '3')
+        leaders = int(leaders) if leaders.isdigit() else -1
+        if not 0 <= leaders <= MAX_LEADERS:
+            return Response({'error': f"leaders 应在 0 到 {MAX_LEADERS} 之间"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            summary = get_sector_summary(kind, leaders)
+        except Exception as e:
+            logger.error(f"汇总板块行情失败: {str(e)}")
+            return Response({'error': '汇总板块行情失败'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if summary is None:
+            return Response({'error': '无法获取实时行情'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response(summary)
+
+
+class SectorDetailView(APIView):
+    """
+    单个板块视图：板块汇总及全部成分股的行情（按涨跌幅降序）
+    参数: type - 同板块行情视图
+    """
+    renderer_classes = BULK_RENDERER_CLASSES
+    
+    def get(self, request, code):
+        from .sectors import get_sector_detail
+        
+        try:
+            kind = _sector_kind(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            detail = get_sector_detail(kind, code)
+        except Exception as e:
+            logger.error(f"获取板块 {code} 行情失败: {str(e)}")
+            return Response({'error': '获取板块行情失败'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if detail is None:
+            return Response({'error': '板块不存在'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(detail)
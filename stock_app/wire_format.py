@@ -0,0 +1,133 @@
+"""
+数据传输格式
+为历史行情、报价列表等批量数据提供列式JSON和MessagePack二进制编码，
+并根据请求参数 format 或 Accept 头协商输出格式
+"""
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+    msgpack = None
+
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_vary_headers
+
+from . import metrics
+
+FORMAT_JSON = 'json'
+FORMAT_COLUMNAR = 'columnar'
+FORMAT_MSGPACK = 'msgpack'
+
+COLUMNAR_MEDIA_TYPE = 'application/vnd.stock.columnar+json'
+MSGPACK_MEDIA_TYPE = 'application/x-msgpack'
+
+# Accept头中的媒体类型与格式的对应关系
+_MEDIA_TYPE_FORMATS = {
+    COLUMNAR_MEDIA_TYPE: FORMAT_COLUMNAR,
+    MSGPACK_MEDIA_TYPE: FORMAT_MSGPACK,
+    'application/msgpack': FORMAT_MSGPACK,
+}
+
+
+def _plain_value(value):
+    """将Decimal、日期等值转换为紧凑的基础类型"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def to_columnar(rows: Sequence[Dict], constant_fields: Iterable[str] = (),
+                fields: Optional[List[str]] = None) -> Dict:
+    """
+    将行式数据转换为列式结构
+    参数:
+        rows: [{'date': ..., 'close_price': ...}, ...]
+        constant_fields: 每行取值相同的字段（如 stock_code），只在顶层输出一次
+        fields: 指定输出列及顺序，默认取第一行的全部字段
+    返回: {'stock_code': '000001', 'date': [...], 'close_price': [...]}
+    """
+    constant_fields = [f for f in constant_fields]
+    if fields is None:
+        fields = [f for f in rows[0].keys() if f not in constant_fields] if rows else []
+
+    columnar = {}
+    if rows:
+        for field in constant_fields:
+            if field in rows[0]:
+                columnar[field] = _plain_value(rows[0][field])
+
+    for field in fields:
+        columnar[field] = [_plain_value(row.get(field)) for row in rows]
+
+    return columnar
+
+
+def negotiate_format(request) -> str:
+    """
+    根据 ?format= 参数或 Accept 头确定输出格式
+    查询参数优先，未识别时返回普通JSON
+    """
+    requested = request.GET.get('format')
+    if requested:
+        return requested.lower()
+
+    accept = request.META.get('HTTP_ACCEPT', '')
+    for media_range in accept.split(','):
+        media_type = media_range.split(';')[0].strip().lower()
+        if media_type in _MEDIA_TYPE_FORMATS:
+            return _MEDIA_TYPE_FORMATS[media_type]
+    return FORMAT_JSON
+
+
+def pack_msgpack(payload) -> bytes:
+    """MessagePack编码，无法直接编码的值先转换为基础类型"""
+    return msgpack.packb(payload, default=_plain_value, use_bin_type=True)
+
+
+def build_response(request, data, rows_key: Optional[str] = None,
+                   constant_fields: Iterable[str] = (), status: int = 200) -> HttpResponse:
+    """
+    按协商结果构造响应
+    参数:
+        data: 行列表，或包含行列表的字典（此时由 rows_key 指定行所在的键）
+        rows_key: 行列表在 data 中的键名，为空表示 data 本身就是行列表
+        constant_fields: 列式输出时提升到顶层的常量字段
+    普通JSON保持原有的行式结构不变
+    """
+    fmt = negotiate_format(request)
+    rows = data[rows_key] if rows_key else data
+    label = fmt if fmt in (FORMAT_JSON, FORMAT_COLUMNAR, FORMAT_MSGPACK) else 'unsupported'
+
+    with metrics.time_serialization(f'response.{label}', rows=len(rows) if isinstance(rows, list) else 1):
+        if fmt == FORMAT_JSON:
+            response = JsonResponse(data, safe=False, status=status)
+        elif fmt in (FORMAT_COLUMNAR, FORMAT_MSGPACK):
+            if rows_key:
+                payload = dict(data)
+                payload[rows_key] = to_columnar(data[rows_key], constant_fields)
+            else:
+                payload = to_columnar(data, constant_fields)
+
+            if fmt == FORMAT_COLUMNAR:
+                response = JsonResponse(payload, encoder=DjangoJSONEncoder, safe=False,
+                                        status=status, content_type=COLUMNAR_MEDIA_TYPE)
+            elif not MSGPACK_AVAILABLE:
+                response = JsonResponse({'error': 'MessagePack不可用，请安装msgpack'}, status=406)
+            else:
+                response = HttpResponse(pack_msgpack(payload), status=status,
+                                        content_type=MSGPACK_MEDIA_TYPE)
+        else:
+            response = JsonResponse({'error': f'不支持的数据格式: {fmt}'}, status=406)
+
+    patch_vary_headers(response, ['Accept'])
+    return response
@@ -44,7 +44,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'stock_app.middleware.TimingMiddleware',
+    'stock_app.middleware.ProfilingMiddleware',
+    'stock_app.middleware.ReplicaRoutingMiddleware',
+    'stock_app.middleware.DemandTrackingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'stock_app.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,13 +83,57 @@ WSGI_APPLICATION = 'stock_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# DB_ENGINE=postgresql 时从 DB_* 环境变量读取连接参数（docker-compose 中的 db 服务）
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    _primary_db = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DB_NAME', 'stock_db'),
+        'USER': os.environ.get('DB_USER', 'stock_user'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        # 经 PgBouncer 等事务级连接池连接时不能使用服务端游标
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_POOLER', 'false').lower() == 'true',
+    }
+else:
+    _primary_db = {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
     }
+
+# 持久连接（秒），0为每个请求结束后关闭连接，None为不限时；开启时复用前检查连接是否可用
+_primary_db['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60 if DB_ENGINE == 'postgresql' else 0))
+_primary_db['CONN_HEALTH_CHECKS'] = _primary_db['CONN_MAX_AGE'] != 0
+
+DATABASES = {
+    'default': _primary_db,
 }
 
+# 只读副本，逗号分隔：PostgreSQL为 host[:port]，SQLite为数据库文件路径
+# 配置后只读请求的查询由 stock_app.db_router 分配到副本，测试时副本指向主库
+for _index, _replica in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), 1):
+    _replica_db = dict(_primary_db, TEST={'MIRROR': 'default'})
+    if DB_ENGINE == 'postgresql':
+        _host, _, _port = _replica.strip().partition(':')
+        _replica_db.update(HOST=_host, PORT=_port or _primary_db['PORT'])
+    else:
+        _replica_db['NAME'] = _replica.strip()
+    DATABASES[f'replica_{_index}'] = _replica_db
+
+DATABASE_ROUTERS = ['stock_app.db_router.PrimaryReplicaRouter']
+DB_REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))  # 写入后该客户端读主库的时长
+
+# 缓存：配置 REDIS_URL 时多个进程共享（需要安装redis），否则为进程内缓存
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -156,3 +205,99 @@ CORS_ALLOW_ALL_ORIGINS = True  # 开发环境使用，生产环境应该设置
 # AKShare settings
 AKSHARE_TIMEOUT = 30  # 请求超时时间（秒）
 AKSHARE_RETRY_COUNT = 3  # 重试次数
+AKSHARE_POOLED_SESSION = True  # 复用到上游主机的keep-alive连接
+AKSHARE_POOL_CONNECTIONS = 10  # 连接池缓存的主机数
+AKSHARE_POOL_MAXSIZE = 20  # 每个主机保持的最大连接数
+STOCK_SERVICE_WARMUP = True  # 启动时预先创建共享服务实例
+AKSHARE_PRELOAD = False  # 启动时即导入akshare（默认在首次请求上游时导入）
+AKSHARE_RETRY_DELAY = 1  # 重试间隔（秒）
+
+# 上游数据获取后端: akshare / synthetic（合成市场）/ record（录制）/ replay（回放录制数据）
+AKSHARE_BACKEND = os.environ.get('AKSHARE_BACKEND', 'akshare')
+AKSHARE_REPLAY_DIR = Path(os.environ.get('AKSHARE_REPLAY_DIR', BASE_DIR / 'replay_data'))
+AKSHARE_REPLAY_LATENCY = float(os.environ.get('AKSHARE_REPLAY_LATENCY', 0))  # 注入的基础延迟（秒）
+AKSHARE_REPLAY_JITTER = float(os.environ.get('AKSHARE_REPLAY_JITTER', 0))  # 注入的随机抖动（秒）
+AKSHARE_REPLAY_ERROR_RATE = float(os.environ.get('AKSHARE_REPLAY_ERROR_RATE', 0))  # 注入错误的概率
+AKSHARE_REPLAY_THROTTLE = float(os.environ.get('AKSHARE_REPLAY_THROTTLE', 0))  # 每秒允许的调用数，0为不限流
+AKSHARE_REPLAY_THROTTLE_MODE = os.environ.get('AKSHARE_REPLAY_THROTTLE_MODE', 'delay')  # delay 或 error
+AKSHARE_REPLAY_SEED = int(os.environ.get('AKSHARE_REPLAY_SEED', 0))
+
+# 性能指标（/metrics 导出Prometheus格式指标，响应附带 Server-Timing 头）
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+
+# 请求采样分析（结果用 python manage.py profiles 查看）
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))  # 随机采样比例，如0.01
+PROFILING_HEADER = 'HTTP_X_PROFILE'  # 可信IP带 X-Profile 请求头时强制采样
+PROFILING_TRUSTED_IPS = os.environ.get('PROFILING_TRUSTED_IPS', '127.0.0.1').split(',')
+PROFILING_INTERVAL = 0.005  # 调用栈抓取间隔（秒）
+PROFILING_MAX_CONCURRENT = 2  # 同时采样的最大请求数
+PROFILING_DIR = Path(os.environ.get('PROFILING_DIR', BASE_DIR / 'profiles'))
+PROFILING_MAX_FILES = 200  # 结果目录保留的最大文件数，超出时删除最早的
+
+# 分时数据（由 python manage.py collect_intraday 采集，按交易日分区存储）
+INTRADAY_DIR = Path(os.environ.get('INTRADAY_DIR', BASE_DIR / 'intraday_data'))
+INTRADAY_INTERVAL = int(os.environ.get('INTRADAY_INTERVAL', 15))  # 采集间隔（秒）
+INTRADAY_RETENTION_DAYS = int(os.environ.get('INTRADAY_RETENTION_DAYS', 30))  # 分区保留的自然日数
+
+# 历史日线冷热分层（python manage.py compact_prices 把早期数据从数据库移到冷存储）
+PRICE_HOT_DAYS = int(os.environ.get('PRICE_HOT_DAYS', 730))  # 数据库中保留的自然日数
+PRICE_COLD_DIR = Path(os.environ.get('PRICE_COLD_DIR', BASE_DIR / 'price_cold'))
+
+# 组合估值使用的全市场快照在进程内的复用时长（秒），估值结果按该时间片缓存
+SPOT_SNAPSHOT_TTL = int(os.environ.get('SPOT_SNAPSHOT_TTL', 5))
+# collect_intraday 发布、各worker只读映射的共享快照（见 spot_snapshot.py）：该路径是指向最新版本文件的符号链接，
+# 版本文件保存在同一目录，建议放在 /dev/shm 等内存文件系统；
+# 快照在该时长（秒）内有效，过期（采集进程未运行）时各worker自行获取
+SPOT_SNAPSHOT_FILE = Path(os.environ.get('SPOT_SNAPSHOT_FILE', BASE_DIR / 'spot_snapshot.bin'))
+SPOT_SHARED_MAX_AGE = int(os.environ.get('SPOT_SHARED_MAX_AGE', INTRADAY_INTERVAL * 4))
+
+# 价格提醒事件接口长轮询的最长等待时间（秒）
+ALERT_STREAM_MAX_WAIT = 30
+
+# 横截面分析（相关系数、贝塔）单次请求的股票数上限、窗口上限，以及收益率矩阵和结果的缓存时长（秒）
+ANALYTICS_MAX_SYMBOLS = int(os.environ.get('ANALYTICS_MAX_SYMBOLS', 1000))
+ANALYTICS_MAX_WINDOW = 1000
+ANALYTICS_CACHE_TTL = int(os.environ.get('ANALYTICS_CACHE_TTL', 600))
+
+# 回测参数扫描的进程数和单次请求的参数组合上限
+BACKTEST_WORKERS = int(os.environ.get('BACKTEST_WORKERS', min(4, os.cpu_count() or 1)))
+BACKTEST_MAX_SWEEP = 200
+
+# 复权因子在进程缓存中的保存时长（秒），sync_adjust_factors 更新因子时会同时清除缓存
+ADJUST_FACTOR_CACHE_TTL = 86400
+
+# 交易日历文件（从上游获取后保存，见 trading_calendar.py）
+TRADING_CALENDAR_FILE = Path(os.environ.get('TRADING_CALENDAR_FILE', BASE_DIR / 'trading_calendar.json'))
+# 开市期间实时行情的有效期（秒）；休市后收市时取到的行情一直有效到下次开市
+REALTIME_MAX_AGE = int(os.environ.get('REALTIME_MAX_AGE', 300))
+# 未指定开始日期时历史数据的默认交易日数
+HISTORY_DEFAULT_SESSIONS = 20
+# 向上游补取后仍没有日线的交易日（停牌等）在该时长（秒）内不再补取
+HISTORY_GAP_RETRY_TTL = 3600
+
+# 实时行情刷新调度（python manage.py refresh_quotes，见 refresh_scheduler.py）
+# 全局预算（每秒上游请求数）、单只股票的最短/最长刷新间隔（秒）
+REFRESH_BUDGET = float(os.environ.get('REFRESH_BUDGET', 5))
+REFRESH_MIN_INTERVAL = 10
+REFRESH_MAX_INTERVAL = 1800
+# 接口访问量统计：跟踪的股票数上限、合并到共享缓存的间隔（秒）、衰减半衰期（秒）
+DEMAND_TRACKING_ENABLED = os.environ.get('DEMAND_TRACKING_ENABLED', 'true').lower() == 'true'
+DEMAND_TRACKED_SYMBOLS = 1000
+DEMAND_FLUSH_INTERVAL = 10
+DEMAND_HALF_LIFE = 1800
+
+# 板块行情（python manage.py sync_sectors 同步成分股，见 sectors.py）
+# 同步成分股的中证指数代码，默认上证50、沪深300、中证500、中证1000
+SECTOR_INDICES = [code for code in os.environ.get('SECTOR_INDICES', '000016,000300,000905,000852').split(',') if code]
+# 板块成员在进程内的最长复用时长（秒），共享缓存时 sync_sectors 完成后立即生效
+SECTOR_MAP_TTL = 3600
+
+# 模拟数据服务的上游耗时（秒），压测时用于模拟AKShare请求等待
+MOCK_DATA_LATENCY = float(os.environ.get('MOCK_DATA_LATENCY', 0))
+
+# 合成市场配置（模拟数据服务、压测和离线测试使用）
+MOCK_MARKET_SIZE = int(os.environ.get('MOCK_MARKET_SIZE', 5000))  # 股票数量
+MOCK_MARKET_SEED = int(os.environ.get('MOCK_MARKET_SEED', 42))  # 随机种子
+MOCK_MARKET_HISTORY_DAYS = 750  # 日线历史交易日数（约3年）
+MOCK_SNAPSHOT_INTERVAL = 60  # 实时快照时间片（秒），同一时间片内报价不变
@@ -19,10 +19,12 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import TemplateView
+from stock_app.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('stock_app.urls')),
+    path('metrics', metrics_view, name='metrics'),
     path('', TemplateView.as_view(template_name='index.html'), name='home'),
 ]
 